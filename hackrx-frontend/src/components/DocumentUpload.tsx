@@ -8,7 +8,7 @@ import { Button } from '@/components/ui/button';
 import { Progress } from '@/components/ui/progress';
 import { Badge } from '@/components/ui/badge';
 import { Alert, AlertDescription } from '@/components/ui/alert';
-import { uploadDocument } from '@/lib/api';
+import { API_BASE_URL, uploadDocument } from '@/lib/api';
 
 interface UploadedFile {
   file: File;
@@ -22,6 +22,48 @@ interface DocumentUploadProps {
   onUploadSuccess?: (fileId: string, fileName: string) => void;
 }
 
+interface IngestionJob {
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  progress: number;
+  document_id: number | null;
+  error: string | null;
+}
+
+const POLL_INTERVAL_MS = 1000;
+// Stop polling after 10 minutes; the job keeps running server side
+const MAX_POLL_ATTEMPTS = 600;
+
+// Uploads are processed in the background: poll the ingestion job until the document exists
+async function waitForDocument(
+  upload: { document_id?: number | string | null; status_url?: string },
+  onProgress: (progress: number) => void
+): Promise<string> {
+  // Duplicates of an already processed file come back with their document id
+  if (upload.document_id != null) {
+    return String(upload.document_id);
+  }
+  if (!upload.status_url) {
+    throw new Error('Upload response has neither a document id nor a status URL');
+  }
+
+  for (let attempt = 0; attempt < MAX_POLL_ATTEMPTS; attempt++) {
+    const response = await fetch(`${API_BASE_URL}${upload.status_url}`);
+    if (!response.ok) {
+      throw new Error(`Could not check processing status (HTTP ${response.status})`);
+    }
+    const job: IngestionJob = await response.json();
+    if (job.status === 'completed' && job.document_id != null) {
+      return String(job.document_id);
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Document processing failed');
+    }
+    onProgress(job.progress);
+    await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL_MS));
+  }
+  throw new Error('Document is still processing; check the Manage tab again later');
+}
+
 export function DocumentUpload({ onUploadSuccess }: DocumentUploadProps) {
   const [uploadedFiles, setUploadedFiles] = useState<UploadedFile[]>([]);
 
@@ -52,15 +94,26 @@ export function DocumentUpload({ onUploadSuccess }: DocumentUploadProps) {
         
         clearInterval(progressInterval);
         
+        // The upload is in; the rest of the bar tracks the ingestion job
+        const documentId = await waitForDocument(response, progress => {
+          setUploadedFiles(prev => 
+            prev.map(f => 
+              f.file === fileItem.file 
+                ? { ...f, progress: Math.max(f.progress, Math.round(progress * 100)) }
+                : f
+            )
+          );
+        });
+        
         setUploadedFiles(prev => 
           prev.map(f => 
             f.file === fileItem.file 
-              ? { ...f, status: 'success', progress: 100, id: response.document_id }
+              ? { ...f, status: 'success', progress: 100, id: documentId }
               : f
           )
         );
 
-        onUploadSuccess?.(response.document_id, response.filename);
+        onUploadSuccess?.(documentId, response.filename);
       } catch (error) {
         setUploadedFiles(prev => 
           prev.map(f => 
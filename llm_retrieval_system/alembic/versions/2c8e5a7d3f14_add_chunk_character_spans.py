@@ -0,0 +1,30 @@
+"""add chunk character spans
+
+Revision ID: 2c8e5a7d3f14
+Revises: 9a6e3c1d7f52
+Create Date: 2026-10-17 16:41:09.527318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c8e5a7d3f14'
+down_revision: Union[str, None] = '9a6e3c1d7f52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('document_chunks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('start_char', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('end_char', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('document_chunks', schema=None) as batch_op:
+        batch_op.drop_column('end_char')
+        batch_op.drop_column('start_char')
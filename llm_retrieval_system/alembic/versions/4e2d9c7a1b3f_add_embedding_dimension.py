@@ -0,0 +1,28 @@
+"""add embedding dimension
+
+Revision ID: 4e2d9c7a1b3f
+Revises: 1560cd5ae2c1
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e2d9c7a1b3f'
+down_revision: Union[str, None] = '1560cd5ae2c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('embeddings', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dimension', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('embeddings', schema=None) as batch_op:
+        batch_op.drop_column('dimension')
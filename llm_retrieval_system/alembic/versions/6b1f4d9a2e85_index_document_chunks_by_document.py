@@ -0,0 +1,26 @@
+"""index document chunks by document
+
+Revision ID: 6b1f4d9a2e85
+Revises: 2c8e5a7d3f14
+Create Date: 2026-10-17 18:05:33.140627
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b1f4d9a2e85'
+down_revision: Union[str, None] = '2c8e5a7d3f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_document_chunks_document_id_chunk_index', 'document_chunks', ['document_id', 'chunk_index'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_chunks_document_id_chunk_index', table_name='document_chunks')
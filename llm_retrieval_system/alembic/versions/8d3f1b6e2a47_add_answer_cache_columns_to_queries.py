@@ -0,0 +1,40 @@
+"""add answer cache columns to queries
+
+Revision ID: 8d3f1b6e2a47
+Revises: 4e2d9c7a1b3f
+Create Date: 2026-10-17 11:03:27.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f1b6e2a47'
+down_revision: Union[str, None] = '4e2d9c7a1b3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('queries', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('query_embedding', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('model_name', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('document_scope', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('corpus_version', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('source_document_ids', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('hit_count', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_queries_document_scope'), ['document_scope'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('queries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_queries_document_scope'))
+        batch_op.drop_column('hit_count')
+        batch_op.drop_column('source_document_ids')
+        batch_op.drop_column('corpus_version')
+        batch_op.drop_column('document_scope')
+        batch_op.drop_column('model_name')
+        batch_op.drop_column('query_embedding')
@@ -0,0 +1,38 @@
+"""add content hash columns
+
+Revision ID: 9a6e3c1d7f52
+Revises: 5f7c2e9d4b18
+Create Date: 2026-10-17 15:22:48.913304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a6e3c1d7f52'
+down_revision: Union[str, None] = '5f7c2e9d4b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_documents_content_hash'), ['content_hash'], unique=False)
+
+    with op.batch_alter_table('ingestion_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_ingestion_jobs_content_hash'), ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('ingestion_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ingestion_jobs_content_hash'))
+        batch_op.drop_column('content_hash')
+
+    with op.batch_alter_table('documents', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_documents_content_hash'))
+        batch_op.drop_column('content_hash')
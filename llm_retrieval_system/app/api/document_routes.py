@@ -1,17 +1,25 @@
+import asyncio
 import os
 import uuid
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Response
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.core.database import get_db
-from app.models import Document
+from app.core.database import get_async_db
+from app.models import ChunkDeletion, Document, DocumentChunk, Embedding, IngestionJob
 from app.services import DocumentProcessor
+from app.services.vector_index import get_chunk_index
+from app.services.bm25_index import bm25_index
+from app.services.answer_cache import answer_cache
+from app.services.vector_sync import vector_sync
+from app.services.ingestion_service import ingestion_queue, job_to_dict
+from app.services.document_store import FileTooLargeError, commit_blob, remove_blob, stream_to_disk
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -21,15 +29,16 @@ router = APIRouter(prefix="/documents", tags=["documents"])
 # Initialize document processor
 document_processor = DocumentProcessor()
 
-@router.post("/upload", response_model=dict)
+@router.post("/upload", response_model=dict, status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Upload and process a document
+    Upload a document and queue it for processing (202 Accepted)
     
-    Supported formats: PDF, DOCX, DOC, TXT
+    Supported formats: PDF, DOCX, DOC, TXT. Poll GET /documents/jobs/{job_id}
+    for stage and progress; document_id is null until the job has finished.
     """
     logger.info(f"Received file upload: {file.filename}, content_type: {file.content_type}")
     
@@ -40,45 +49,90 @@ async def upload_document(
             detail=f"Unsupported file type. Supported: {document_processor.get_supported_file_types()}"
         )
     
-    # Create unique filename
+    # Reject oversized uploads up front when the client declared the size
+    if file.size is not None and file.size > settings.MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size is {settings.MAX_FILE_SIZE} bytes"
+        )
+    
+    # Stage the upload under a unique name until its hash is known
     file_ext = Path(file.filename).suffix
     unique_filename = f"{uuid.uuid4()}{file_ext}"
     file_path = Path(settings.UPLOAD_FOLDER) / unique_filename
     
     try:
-        # Save uploaded file
+        # Stream the upload to disk in fixed-size chunks, hashing as we go
         logger.info(f"Saving file to: {file_path}")
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        try:
+            size, sha256 = await stream_to_disk(file, file_path, settings.MAX_FILE_SIZE)
+        except FileTooLargeError as e:
+            raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {e.limit} bytes")
         
-        logger.info(f"File saved successfully, size: {len(content)} bytes")
+        logger.info(f"File saved successfully, size: {size} bytes, sha256: {sha256}")
         
-        # Process document
-        logger.info("Starting document processing...")
-        document_data = await document_processor.process_document(
-        str(file_path), 
-        file.filename, 
-        file_ext[1:]  # Remove the dot
-        )
-
-        if not document_data:
-            # Clean up file if processing failed
-            if file_path.exists():
-                os.unlink(file_path)
-            raise HTTPException(status_code=500, detail="Failed to process document")
-
-        logger.info(f"Document processed successfully: ID {document_data['id']}")
+        # Identical bytes were uploaded before: reuse that document, its chunks and embeddings
+        existing = (await db.execute(
+            select(Document.id, Document.filename, Document.file_type)
+            .where(Document.content_hash == sha256)
+            .order_by(Document.id)
+            .limit(1)
+        )).first()
+        if existing:
+            os.unlink(file_path)
+            logger.info(f"{file.filename} duplicates document {existing.id}, skipping processing")
+            return JSONResponse(
+                status_code=200,
+                content={
+                    "message": "Document already uploaded",
+                    "duplicate": True,
+                    "document_id": existing.id,
+                    "filename": existing.filename,
+                    "file_type": existing.file_type,
+                    "size": size,
+                    "sha256": sha256
+                }
+            )
+        
+        # ...or is still being processed: hand back the job already running for it
+        job = (await db.execute(
+            select(IngestionJob)
+            .where(IngestionJob.content_hash == sha256, IngestionJob.status.in_(("queued", "running")))
+            .order_by(IngestionJob.id)
+            .limit(1)
+        )).scalar()
+        if job:
+            os.unlink(file_path)
+            logger.info(f"{file.filename} is already queued as ingestion job {job.id}")
+        else:
+            # Originals live in the content-addressed store under their hash
+            file_path = commit_blob(file_path, sha256)
+            
+            # Queue extract -> chunk -> embed -> index; the client polls the job for progress
+            job = await db.run_sync(
+                ingestion_queue.create_job, str(file_path), file.filename, file_ext[1:], content_hash=sha256  # Remove the dot
+            )
+            ingestion_queue.submit(job.id)
+            logger.info(f"Queued ingestion job {job.id} for {file.filename}")
 
-        return {
-            "message": "Document uploaded and processed successfully",
-            "document_id": document_data["id"],
-            "filename": document_data["filename"],
-            "file_type": document_data["file_type"],
-            "chunks_created": document_data.get("chunks_created", 0)
-        }
+        return JSONResponse(
+            status_code=202,
+            content={
+                "message": "Document accepted for processing",
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": f"{settings.API_V1_STR}/documents/jobs/{job.id}",
+                "document_id": job.document_id,
+                "filename": job.filename,
+                "file_type": job.file_type,
+                "size": size,
+                "sha256": sha256
+            }
+        )
 
         
+    except HTTPException:
+        raise
     except Exception as e:
         # Enhanced error logging
         logger.error(f"Error processing file {file.filename}: {str(e)}")
@@ -86,8 +140,8 @@ async def upload_document(
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
         
-        # Clean up file if something went wrong
-        if file_path.exists():
+        # Clean up the staged file if something went wrong (stored originals are left to their job)
+        if file_path.exists() and file_path.parent == Path(settings.UPLOAD_FOLDER):
             os.unlink(file_path)
         
         # Return more detailed error
@@ -96,58 +150,197 @@ async def upload_document(
             detail=f"Error processing file: {str(e)} (Type: {type(e).__name__})"
         )
 
+# Page size when after_id is given without a limit
+DEFAULT_PAGE_SIZE = 100
+
 @router.get("/", response_model=List[dict])
-async def list_documents(db: Session = Depends(get_db)):
-    """Get list of all uploaded documents"""
-    documents = db.query(Document).all()
+async def list_documents(
+    response: Response,
+    after_id: Optional[int] = Query(None, description="Return documents with an id greater than this"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    List uploaded documents in id order
+    
+    Without after_id or limit every document is returned, as before paging
+    existed. With either, one page is returned and, when more documents
+    follow, the X-Next-After-Id response header holds the after_id for the
+    next page. Chunk counts come from one grouped query over the page;
+    document content and chunk text are never loaded.
+    """
+    page = select(Document.id, Document.filename, Document.file_type, Document.upload_date)
+    if after_id is not None:
+        page = page.where(Document.id > after_id)
+    if after_id is not None and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    page = page.order_by(Document.id)
+    if limit is not None:
+        # One extra row tells whether another page exists
+        page = page.limit(limit + 1)
+    page = page.subquery()
+    
+    rows = (await db.execute(
+        select(page, func.count(DocumentChunk.id).label("chunks_count"))
+        .outerjoin(DocumentChunk, DocumentChunk.document_id == page.c.id)
+        .group_by(page.c.id, page.c.filename, page.c.file_type, page.c.upload_date)
+        .order_by(page.c.id)
+    )).all()
+    
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-After-Id"] = str(rows[-1].id)
     return [
         {
-            "id": doc.id,
-            "filename": doc.filename,
-            "file_type": doc.file_type,
-            "upload_date": doc.upload_date,
-            "chunks_count": len(doc.chunks) if hasattr(doc, 'chunks') else 0
+            "id": row.id,
+            "filename": row.filename,
+            "file_type": row.file_type,
+            "upload_date": row.upload_date,
+            "chunks_count": row.chunks_count
         }
-        for doc in documents
+        for row in rows
     ]
 
+@router.get("/jobs/{job_id}", response_model=dict)
+async def get_ingestion_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Stage, progress and per-stage timings of an ingestion job"""
+    job = await db.get(IngestionJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job_to_dict(job)
+
+# Characters of chunk text returned as a preview when browsing a document
+CHUNK_PREVIEW_CHARS = 100
+
 @router.get("/{document_id}", response_model=dict)
-async def get_document(document_id: int, db: Session = Depends(get_db)):
-    """Get specific document details"""
-    document = db.query(Document).filter(Document.id == document_id).first()
+async def get_document(
+    document_id: int,
+    chunks_after: Optional[int] = Query(None, description="Return chunks with a chunk_index greater than this"),
+    chunks_limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get document details with one page of chunk previews
+    
+    Previews are cut in SQL, so only their first characters leave the
+    database; next_chunks_after is the cursor for the following page. Full
+    chunk text is served by GET /documents/{document_id}/chunks/{chunk_index}.
+    """
+    document = (await db.execute(
+        select(
+            Document.id,
+            Document.filename,
+            Document.file_type,
+            Document.upload_date,
+            func.substr(Document.content, 1, 500).label("content_preview")
+        ).where(Document.id == document_id)
+    )).first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
+    chunks = select(
+        DocumentChunk.id,
+        DocumentChunk.chunk_index,
+        DocumentChunk.start_char,
+        DocumentChunk.end_char,
+        func.substr(DocumentChunk.chunk_text, 1, CHUNK_PREVIEW_CHARS).label("preview"),
+        func.length(DocumentChunk.chunk_text).label("length")
+    ).where(DocumentChunk.document_id == document_id)
+    if chunks_after is not None:
+        chunks = chunks.where(DocumentChunk.chunk_index > chunks_after)
+    # One extra row tells whether another page exists
+    rows = (await db.execute(chunks.order_by(DocumentChunk.chunk_index).limit(chunks_limit + 1))).all()
+    next_chunks_after = rows[chunks_limit - 1].chunk_index if len(rows) > chunks_limit else None
+    
+    chunks_count = (await db.execute(
+        select(func.count(DocumentChunk.id)).where(DocumentChunk.document_id == document_id)
+    )).scalar()
+    
     return {
         "id": document.id,
         "filename": document.filename,
         "file_type": document.file_type,
         "upload_date": document.upload_date,
-        "content_preview": document.content[:500] if document.content else "",
+        "content_preview": document.content_preview or "",
+        "chunks_count": chunks_count,
         "chunks": [
             {
-                "id": chunk.id,
-                "chunk_index": chunk.chunk_index,
-                "text_preview": chunk.chunk_text[:100] + "..." if len(chunk.chunk_text) > 100 else chunk.chunk_text
+                "id": row.id,
+                "chunk_index": row.chunk_index,
+                "start_char": row.start_char,
+                "end_char": row.end_char,
+                "text_preview": row.preview + "..." if row.length > CHUNK_PREVIEW_CHARS else row.preview
             }
-            for chunk in document.chunks
-        ] if hasattr(document, 'chunks') else []
+            for row in rows[:chunks_limit]
+        ],
+        "next_chunks_after": next_chunks_after
+    }
+
+@router.get("/{document_id}/chunks/{chunk_index}", response_model=dict)
+async def get_document_chunk(document_id: int, chunk_index: int, db: AsyncSession = Depends(get_async_db)):
+    """Full text and source span of one chunk"""
+    chunk = (await db.execute(
+        select(
+            DocumentChunk.id,
+            DocumentChunk.chunk_index,
+            DocumentChunk.chunk_text,
+            DocumentChunk.start_char,
+            DocumentChunk.end_char
+        ).where(DocumentChunk.document_id == document_id, DocumentChunk.chunk_index == chunk_index)
+    )).first()
+    if not chunk:
+        raise HTTPException(status_code=404, detail="Chunk not found")
+    
+    return {
+        "id": chunk.id,
+        "document_id": document_id,
+        "chunk_index": chunk.chunk_index,
+        "start_char": chunk.start_char,
+        "end_char": chunk.end_char,
+        "text": chunk.chunk_text
     }
 
+def _drop_from_indexes(document_id: int):
+    """Remove a deleted document from the in-process indexes and persist the vector index"""
+    chunk_index = get_chunk_index()
+    chunk_index.remove_document(document_id)
+    bm25_index.remove_document(document_id)
+    chunk_index.persist()
+
 @router.delete("/{document_id}")
-async def delete_document(document_id: int, db: Session = Depends(get_db)):
+async def delete_document(document_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a document and all associated chunks and embeddings"""
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document = (await db.execute(
+        select(Document.id, Document.filename, Document.content_hash).where(Document.id == document_id)
+    )).first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Get chunks count for response
-    chunks_count = len(document.chunks) if hasattr(document, 'chunks') else 0
+    # Chunk ids name the document's Pinecone vectors ("chunk-{id}")
+    chunk_ids = (await db.execute(select(DocumentChunk.id).where(DocumentChunk.document_id == document_id))).scalars().all()
+    chunks_count = len(chunk_ids)
+    content_hash = document.content_hash
     
     try:
-        # Delete document (cascading deletes will handle chunks and embeddings)
-        db.delete(document)
-        db.commit()
+        # Set-based deletes: embeddings, then chunks, then the document, without loading any of them
+        await db.execute(delete(Embedding).where(Embedding.chunk_id.in_(
+            select(DocumentChunk.id).where(DocumentChunk.document_id == document_id)
+        )))
+        await db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
+        await db.execute(delete(Document).where(Document.id == document_id))
+        if chunk_ids:
+            # Lets other workers drop these chunks from their in-process indexes
+            await db.execute(insert(ChunkDeletion), [{"chunk_id": chunk_id, "document_id": document_id} for chunk_id in chunk_ids])
+        await db.commit()
+        # Index updates, disk and network work stay off the event loop
+        await asyncio.to_thread(_drop_from_indexes, document_id)
+        await asyncio.to_thread(vector_sync.delete_chunks, chunk_ids)
+        await db.run_sync(answer_cache.invalidate_documents, [document_id])
+        # The original is shared by identical uploads; drop it with the last one
+        if content_hash and not (await db.execute(
+            select(Document.id).where(Document.content_hash == content_hash).limit(1)
+        )).first():
+            remove_blob(content_hash)
         
         logger.info(f"Successfully deleted document {document_id} with {chunks_count} chunks")
         
@@ -158,6 +351,6 @@ async def delete_document(document_id: int, db: Session = Depends(get_db)):
             "chunks_deleted": chunks_count
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error deleting document {document_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to delete document: {str(e)}")
@@ -2,13 +2,26 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.services.embedding_service import EmbeddingService
+from app.services.model_registry import model_registry
+from app.services.query_cache import query_embedding_cache
+from app.services.vector_sync import vector_sync
 
 router = APIRouter(prefix="/api/v1/embeddings", tags=["Embeddings"])
 
 @router.post("/generate/{document_id}")
 def generate_embeddings(document_id: int, db: Session = Depends(get_db)):
-    svc = EmbeddingService(db)
+    svc = EmbeddingService(db, registry=model_registry)
     count = svc.generate_for_document(document_id)
     if count == 0:
         raise HTTPException(status_code=404, detail="No chunks found")
     return {"message": "embeddings generated", "vectors": count}
+
+@router.get("/cache/stats")
+def query_cache_stats():
+    """Hit/miss counters of the query embedding cache"""
+    return query_embedding_cache.stats()
+
+@router.get("/pinecone/stats")
+def pinecone_sync_stats():
+    """Upsert/delete totals and recent per-batch latency of the Pinecone sync"""
+    return vector_sync.stats()
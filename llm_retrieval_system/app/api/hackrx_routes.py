@@ -1,10 +1,14 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, Header
 from pydantic import BaseModel
 from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
 from app.services.search_service import SearchService
+from app.services.model_registry import model_registry
 from app.services.llm_service import LLMService
+from app.services.answer_service import answer_questions
 import logging
 
 logger = logging.getLogger(__name__)
@@ -25,7 +29,8 @@ class HackRxResponse(BaseModel):
 async def hackrx_run(
     request: HackRxRequest,
     authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    search_db: Session = Depends(get_db)
 ):
     """
     HackRx submission endpoint - processes documents and answers questions
@@ -41,12 +46,12 @@ async def hackrx_run(
         raise HTTPException(status_code=401, detail="Invalid authorization token")
     
     try:
-        # Initialize services
-        search_service = SearchService(db)
+        # Retrieval runs in a worker thread on its own sync session; the async
+        # session only serves the answer cache queries. Building the search
+        # service may load the embedding model, so that is off the loop too
+        search_service = await asyncio.to_thread(SearchService, search_db, registry=model_registry)
         llm_service = LLMService()
         
-        answers = []
-        
         # Parse document IDs from request.documents if they use document-ID format
         selected_document_ids = []
         for doc_ref in request.documents:
@@ -60,26 +65,16 @@ async def hackrx_run(
         
         logger.info(f"Selected document IDs: {selected_document_ids}")
         
-        # Process each question
-        for question in request.questions:
-            # Perform semantic search with document filtering
-            relevant_chunks = search_service.semantic_search(
-                query=question,
-                top_k=5,
-                document_ids=selected_document_ids if selected_document_ids else None
-            )
-            
-            if not relevant_chunks:
-                answers.append("I could not find relevant information to answer this question.")
-                continue
-            
-            # Generate answer using LLM
-            result = llm_service.generate_answer(
-                query=question,
-                context_chunks=relevant_chunks
-            )
-            
-            answers.append(result["answer"])
+        # Answer from the semantic cache where possible; the rest are retrieved in one batch
+        # and generated concurrently (bounded), keeping question order
+        answers = await answer_questions(
+            db,
+            search_service,
+            llm_service,
+            request.questions,
+            document_ids=selected_document_ids if selected_document_ids else None,
+            top_k=5
+        )
         
         return HackRxResponse(answers=answers)
         
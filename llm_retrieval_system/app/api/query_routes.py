@@ -3,7 +3,9 @@ from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.services.search_service import SearchService
+from app.services.model_registry import model_registry
 from app.services.llm_service import LLMService
+from app.services.answer_cache import answer_cache
 
 router = APIRouter(prefix="/api/v1/query", tags=["Query"])
 
@@ -18,7 +20,7 @@ def ask_question(request: QueryRequest, db: Session = Depends(get_db)):
     """
     try:
         # Search for relevant chunks
-        search_service = SearchService(db)
+        search_service = SearchService(db, registry=model_registry)
         relevant_chunks = search_service.semantic_search(
             query=request.question,
             top_k=request.top_k
@@ -53,7 +55,7 @@ def semantic_search(request: QueryRequest, db: Session = Depends(get_db)):
     """
     Semantic search only (without LLM answer generation)
     """
-    search_service = SearchService(db)
+    search_service = SearchService(db, registry=model_registry)
     results = search_service.semantic_search(
         query=request.question,
         top_k=request.top_k
@@ -64,3 +66,8 @@ def semantic_search(request: QueryRequest, db: Session = Depends(get_db)):
         "results": results,
         "total_results": len(results)
     }
+
+@router.get("/cache/stats")
+def answer_cache_stats():
+    """Hit/miss counters of the semantic answer cache"""
+    return answer_cache.stats()
@@ -22,17 +22,52 @@ class Settings:
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
     OPENAI_MODEL: str = "gpt-4"
     MAX_TOKENS: int = 1000
+    LLM_CONCURRENCY: int = int(os.getenv("LLM_CONCURRENCY", "4"))
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_SIMILARITY: float = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
     
     # Vector Store Settings
     FAISS_INDEX_PATH: str = os.getenv("FAISS_INDEX_PATH", "vector_store")
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "pinecone")  # "pinecone" (local fallback) or "local"
+    PINECONE_UPSERT_BATCH_SIZE: int = int(os.getenv("PINECONE_UPSERT_BATCH_SIZE", "100"))
+    PINECONE_UPSERT_WORKERS: int = int(os.getenv("PINECONE_UPSERT_WORKERS", "4"))
+    PINECONE_MAX_TRIES: int = int(os.getenv("PINECONE_MAX_TRIES", "5"))
+    PINECONE_BACKOFF_SECONDS: float = float(os.getenv("PINECONE_BACKOFF_SECONDS", "0.5"))
+    LOCAL_INDEX_ENGINE: str = os.getenv("LOCAL_INDEX_ENGINE", "numpy")  # "numpy", "faiss" or "mmap"
+    VECTOR_SEGMENT_MAX_COUNT: int = int(os.getenv("VECTOR_SEGMENT_MAX_COUNT", "32"))
+    VECTOR_SEGMENT_MAX_DEAD_RATIO: float = float(os.getenv("VECTOR_SEGMENT_MAX_DEAD_RATIO", "0.3"))
+    FAISS_INDEX_TYPE: str = os.getenv("FAISS_INDEX_TYPE", "flat")  # "flat", "ivf" or "hnsw"
+    FAISS_NLIST: int = int(os.getenv("FAISS_NLIST", "256"))
+    FAISS_NPROBE: int = int(os.getenv("FAISS_NPROBE", "16"))
+    FAISS_HNSW_M: int = int(os.getenv("FAISS_HNSW_M", "32"))
+    FAISS_HNSW_EF_SEARCH: int = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
     EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    LOCAL_EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    WARM_UP_EMBEDDING_MODEL: bool = os.getenv("WARM_UP_EMBEDDING_MODEL", "true").lower() == "true"
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    QUERY_CACHE_PATH: Optional[str] = os.getenv("QUERY_CACHE_PATH")  # SQLite file for a restart-proof tier
+    HYBRID_FUSION: str = os.getenv("HYBRID_FUSION", "weighted")  # "weighted" or "rrf"
+    HYBRID_KEYWORD_WEIGHT: float = float(os.getenv("HYBRID_KEYWORD_WEIGHT", "0.2"))
+    HYBRID_RRF_K: int = int(os.getenv("HYBRID_RRF_K", "60"))
     CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "200"))
+    CHUNKING_MODE: str = os.getenv("CHUNKING_MODE", "chars")  # "chars" or "tokens"
+    CHUNK_TOKENIZER: str = os.getenv("CHUNK_TOKENIZER", "model")  # "model" or a tiktoken encoding name
+    CHUNK_MAX_TOKENS: int = int(os.getenv("CHUNK_MAX_TOKENS", "0"))  # 0 = the embedding model's limit
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
     
     # File Upload Settings
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "52428800"))  # 50MB
     UPLOAD_FOLDER: str = os.getenv("UPLOAD_FOLDER", "documents")
+    DOCUMENT_STORE_PATH: str = os.getenv("DOCUMENT_STORE_PATH", os.path.join(UPLOAD_FOLDER, "store"))  # originals by SHA-256 + extraction cache
     ALLOWED_EXTENSIONS: set = {".pdf", ".docx", ".eml", ".txt"}
+    INGESTION_WORKERS: int = int(os.getenv("INGESTION_WORKERS", "2"))
+    INGESTION_JOB_STALE_SECONDS: int = int(os.getenv("INGESTION_JOB_STALE_SECONDS", "900"))
+    INGESTION_BATCH_SIZE: int = int(os.getenv("INGESTION_BATCH_SIZE", "100"))  # chunks inserted and embedded per commit
+    PDF_EXTRACTION_WORKERS: int = int(os.getenv("PDF_EXTRACTION_WORKERS", "0"))  # 0 = one per CPU core
+    PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
     
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
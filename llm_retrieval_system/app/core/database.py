@@ -1,7 +1,9 @@
 from sqlalchemy import create_engine, MetaData, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator, Optional
+from typing import AsyncGenerator, Generator, Optional
 import logging
 from dotenv import load_dotenv
 
@@ -16,6 +18,18 @@ logger = logging.getLogger(__name__)
 engine: Optional[object] = None
 SessionLocal: Optional[object] = None
 
+# Async counterparts used by the async routes, so queries do not block the event loop
+async_engine: Optional[object] = None
+AsyncSessionLocal: Optional[object] = None
+
+# Async drivers standing in for the sync ones in DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -89,6 +103,63 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+def async_database_url(url: str) -> str:
+    """The same database addressed through its async driver (psycopg2 -> asyncpg, sqlite -> aiosqlite)"""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.drivername)
+    return (url.set(drivername=driver) if driver else url).render_as_string(hide_password=False)
+
+def init_async_database():
+    """Create the async engine and session factory; connections are opened on first use"""
+    global async_engine, AsyncSessionLocal
+    
+    if not settings.USE_DATABASE or not settings.database_url:
+        logger.info("Database disabled - running without async database")
+        return False
+    
+    try:
+        url = async_database_url(settings.database_url)
+        options = {"pool_pre_ping": True, "pool_recycle": 300, "echo": False}
+        if not url.startswith("sqlite"):
+            options.update(pool_size=10, max_overflow=20)
+        async_engine = create_async_engine(url, **options)
+        # Objects stay readable after commit without another round trip
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        logger.info("Async database engine initialized successfully")
+        return True
+    except Exception as e:
+        logger.error(f"Async database initialization failed: {e}")
+        async_engine = None
+        AsyncSessionLocal = None
+        return False
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency to get an async database session
+    
+    Sync services take the session through `await db.run_sync(fn)`, which
+    hands fn a regular Session running on the same connection.
+    """
+    if not AsyncSessionLocal and not init_async_database():
+        logger.error("Async database initialization failed in get_async_db()")
+        raise RuntimeError("Database not available")
+    
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error(f"Database session error: {e}")
+            await db.rollback()
+            raise
+
+async def dispose_async_engine():
+    """Close the async connection pool"""
+    global async_engine, AsyncSessionLocal
+    if async_engine is not None:
+        await async_engine.dispose()
+        async_engine = None
+        AsyncSessionLocal = None
+
 def create_tables():
     """
     Create all tables
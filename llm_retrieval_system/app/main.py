@@ -1,6 +1,8 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import logging
 import sys
 import os
@@ -23,11 +25,19 @@ logger = logging.getLogger(__name__)
 
 # Import config first
 from app.core.config import settings
+from app.core.database import dispose_async_engine
 from app.api.document_routes import router as document_router
 from app.api.embedding_routes import router as embedding_router
 from app.api.query_routes import router as query_router
 from app.api.hackrx_routes import router as hackrx_router
 from app.api.demo_routes import router as demo_router
+from app.services.model_registry import model_registry
+from app.services.vector_index import get_chunk_index
+from app.services.bm25_index import bm25_index
+from app.services.ingestion_service import ingestion_queue
+from app.services.text_extractor import shutdown_pdf_pool
+from app.services.vector_sync import vector_sync
+from app.services import pinecone_service
 
 # Create FastAPI instance
 app = FastAPI(
@@ -77,7 +87,7 @@ async def startup_event():
     if settings.USE_DATABASE:
         logger.info("Database is enabled, attempting initialization...")
         try:
-            from app.core.database import init_database, get_session_local
+            from app.core.database import init_async_database, init_database, get_session_local
             
             # Initialize database
             db_init_success = init_database()
@@ -100,6 +110,10 @@ async def startup_event():
             test_db.close()
             logger.info("✅ Database test session created and closed successfully")
             
+            # Async routes query through their own engine on the async driver
+            if not init_async_database():
+                raise Exception("Async database initialization returned False")
+            
             logger.info("✅ Database setup completed successfully")
             
         except ImportError as e:
@@ -112,23 +126,92 @@ async def startup_event():
     else:
         logger.info("Database disabled in configuration")
     
+    # Load the embedding model once per worker and warm it with a dummy encode
+    if settings.WARM_UP_EMBEDDING_MODEL:
+        loop = asyncio.get_running_loop()
+        warmed = await loop.run_in_executor(None, model_registry.warm_up, settings.LOCAL_EMBEDDING_MODEL)
+        if warmed:
+            logger.info(f"✅ Embedding model {settings.LOCAL_EMBEDDING_MODEL} loaded and warmed")
+        else:
+            logger.warning(f"Embedding model {settings.LOCAL_EMBEDDING_MODEL} unavailable - running in simulation mode")
+    
+    # Connect to Pinecone here rather than at import, off the event loop
+    if settings.VECTOR_BACKEND != "local" and pinecone_service.is_configured():
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, pinecone_service.get_index)
+    
+    # Build (or reload from FAISS_INDEX_PATH) the local chunk index before serving queries
+    if settings.USE_DATABASE:
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, _load_chunk_index)
+        except Exception as e:
+            logger.warning(f"Local chunk index will be built on first search: {e}")
+    
+    # Pick up uploads that were queued or interrupted before the last shutdown
+    if settings.USE_DATABASE:
+        try:
+            resumed = ingestion_queue.resume()
+            if resumed:
+                logger.info(f"Resumed {resumed} ingestion jobs")
+        except Exception as e:
+            logger.warning(f"Could not resume ingestion jobs: {e}")
+    
     logger.info("Startup completed successfully")
 
 
+def _load_chunk_index():
+    """Sync the local vector and keyword indexes with the database"""
+    from app.core.database import get_session_local
+    
+    db = get_session_local()()
+    try:
+        chunk_index = get_chunk_index()
+        chunk_index.refresh(db)
+        logger.info(f"✅ Local chunk index ready with {len(chunk_index)} vectors ({settings.LOCAL_INDEX_ENGINE})")
+        bm25_index.refresh(db)
+        logger.info(f"✅ BM25 keyword index ready with {len(bm25_index)} chunks")
+    finally:
+        db.close()
+
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Shutdown event handler"""
     logger.info("Shutting down DocuMind AI...")
+    ingestion_queue.shutdown()
+    shutdown_pdf_pool()
+    vector_sync.shutdown()
+    get_chunk_index().persist()
+    await dispose_async_engine()
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {
-        "status": "healthy",
+    """Health check endpoint (503 until the embedding model is warm)"""
+    models = model_registry.status()
+    model_state = models.get(settings.LOCAL_EMBEDDING_MODEL, {}).get("state", "not_loaded")
+
+    if model_state == "ready":
+        status = "healthy"
+    elif model_state == "failed":
+        # Searches still work with fallback embeddings, so keep serving
+        status = "degraded"
+    elif not settings.WARM_UP_EMBEDDING_MODEL:
+        # Model is loaded lazily on first use
+        status = "healthy"
+    else:
+        status = "starting"
+
+    body = {
+        "status": status,
         "service": settings.PROJECT_NAME,
         "version": settings.VERSION,
-        "database_enabled": settings.USE_DATABASE
+        "database_enabled": settings.USE_DATABASE,
+        "embedding_model": settings.LOCAL_EMBEDDING_MODEL,
+        "embedding_model_ready": model_registry.is_ready(settings.LOCAL_EMBEDDING_MODEL),
+        "models": models
     }
+    return JSONResponse(status_code=503 if status == "starting" else 200, content=body)
 
 @app.get("/")
 async def root():
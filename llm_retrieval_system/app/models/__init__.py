@@ -2,5 +2,7 @@ from .document import Document
 from .document_chunk import DocumentChunk
 from .embedding import Embedding
 from .query import Query
+from .ingestion_job import IngestionJob
+from .chunk_deletion import ChunkDeletion
 
-__all__ = ["Document", "DocumentChunk", "Embedding", "Query"]
+__all__ = ["Document", "DocumentChunk", "Embedding", "Query", "IngestionJob", "ChunkDeletion"]
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class ChunkDeletion(Base):
+    """Append-only log of deleted chunks; in-process indexes replay it instead of recounting tables"""
+    __tablename__ = "chunk_deletions"
+    # Ids must never be reused, or a reader could skip an entry it has not seen
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    chunk_id = Column(Integer, nullable=False)
+    document_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ChunkDeletion(id={self.id}, chunk_id={self.chunk_id})>"
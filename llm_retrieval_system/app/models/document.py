@@ -11,6 +11,7 @@ class Document(Base):
     file_type = Column(String(50), nullable=False)
     content = Column(Text, nullable=True)
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the original file
 
     # Add cascade delete relationship
     chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan")
@@ -1,14 +1,23 @@
-from sqlalchemy import Column, Integer, ForeignKey, Text
+from sqlalchemy import Column, Integer, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 class DocumentChunk(Base):
     __tablename__ = "document_chunks"
+    __table_args__ = (
+        # Per-document counts and chunk pages without scanning the table
+        Index("ix_document_chunks_document_id_chunk_index", "document_id", "chunk_index"),
+        # Readers track the highest id they have seen; SQLite must not reuse ids
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(Integer, ForeignKey('documents.id', ondelete='CASCADE'), nullable=False)
     chunk_index = Column(Integer, nullable=False)
     chunk_text = Column(Text, nullable=False)
+    # [start_char, end_char) span of chunk_text in the document's extracted text
+    start_char = Column(Integer, nullable=True)
+    end_char = Column(Integer, nullable=True)
 
     # Add back_populates relationship
     document = relationship("Document", back_populates="chunks")
@@ -5,11 +5,14 @@ from app.core.database import Base
 
 class Embedding(Base):
     __tablename__ = "embeddings"
+    # Readers track the highest id they have seen; SQLite must not reuse ids
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     chunk_id = Column(Integer, ForeignKey("document_chunks.id", ondelete="CASCADE"), nullable=False)
     pinecone_id = Column(String(64), unique=True, nullable=False)
-    vector_data = Column(LargeBinary, nullable=True)  # Make this nullable
+    vector_data = Column(LargeBinary, nullable=True)  # Packed little-endian float32
+    dimension = Column(Integer, nullable=True)
     model_name = Column(String(100), default="text-embedding-ada-002")
     status = Column(String(20), default="completed")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
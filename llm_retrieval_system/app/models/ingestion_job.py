@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, JSON, ForeignKey
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="SET NULL"), nullable=True)
+    filename = Column(String(255), nullable=False)
+    file_type = Column(String(50), nullable=False)
+    file_path = Column(String(1024), nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)
+    status = Column(String(20), default="queued", index=True)  # queued, running, completed, failed
+    stage = Column(String(20), default="queued")  # queued, extract, chunk, embed, index, done
+    progress = Column(Float, default=0.0)
+    chunks_created = Column(Integer, nullable=True)
+    embeddings_created = Column(Integer, nullable=True)
+    timings = Column(JSON, nullable=True)  # stage -> seconds
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<IngestionJob(id={self.id}, status='{self.status}', stage='{self.stage}')>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, LargeBinary
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -9,3 +9,11 @@ class Query(Base):
     query_text = Column(Text, nullable=False)
     response = Column(Text, nullable=True)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Semantic answer cache
+    query_embedding = Column(LargeBinary, nullable=True)  # Packed little-endian float32
+    model_name = Column(String(100), nullable=True)
+    document_scope = Column(String(255), nullable=True, index=True)  # "*" or ",1,3,"
+    corpus_version = Column(String(64), nullable=True)
+    source_document_ids = Column(Text, nullable=True)  # ",1,3,"
+    hit_count = Column(Integer, default=0)
@@ -1,5 +1,19 @@
-from .document_processor import DocumentProcessor
-from .text_extractor import TextExtractor  
-from .chunking_service import ChunkingService
+from importlib import import_module
+
+# Resolved on first access (PEP 562), so importing one service module does not
+# pull in the extractors and their PDF/DOCX libraries
+_EXPORTS = {
+    "DocumentProcessor": ".document_processor",
+    "TextExtractor": ".text_extractor",
+    "ChunkingService": ".chunking_service",
+}
 
 __all__ = ["DocumentProcessor", "TextExtractor", "ChunkingService"]
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,261 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Document, DocumentChunk, Embedding, Query
+from app.services.vector_index import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+ALL_DOCUMENTS = "*"
+
+
+def is_cacheable(result: Dict) -> bool:
+    """Only real model answers are cached, never fallback, timeout or error text"""
+    return result.get("model") not in (None, "fallback") and not result.get("error")
+
+
+def document_scope(document_ids: Optional[Iterable[int]]) -> str:
+    """Canonical key for the documents a question was restricted to"""
+    if not document_ids:
+        return ALL_DOCUMENTS
+    scope = "," + ",".join(str(i) for i in sorted(set(int(i) for i in document_ids))) + ","
+    if len(scope) > 255:
+        return "sha1:" + hashlib.sha1(scope.encode()).hexdigest()
+    return scope
+
+
+def corpus_version(db: Session, document_ids: Optional[Iterable[int]]) -> Optional[str]:
+    """
+    Version of the documents in scope: count and highest id, plus chunk and embedding counts
+
+    Any delete or upload inside the scope changes it, and so does every chunk
+    or embedding batch an ingest commits after its document row, so answers
+    drawn from a half-ingested document are not served once it completes.
+    Returns None when the scope holds no documents (answers would come from
+    demo content).
+    """
+    documents = db.query(func.count(Document.id), func.max(Document.id))
+    chunks = db.query(func.count(DocumentChunk.id))
+    embeddings = db.query(func.count(Embedding.id)).join(DocumentChunk, Embedding.chunk_id == DocumentChunk.id)
+    if document_ids:
+        document_ids = list(document_ids)
+        documents = documents.filter(Document.id.in_(document_ids))
+        chunks = chunks.filter(DocumentChunk.document_id.in_(document_ids))
+        embeddings = embeddings.filter(DocumentChunk.document_id.in_(document_ids))
+    count, max_id = documents.one()
+    if not count:
+        return None
+    return f"{count}:{max_id}:{chunks.scalar()}:{embeddings.scalar()}"
+
+
+class AnswerCache:
+    """
+    Semantic cache of LLM answers persisted in the queries table
+
+    A cached answer is reused when a new question's embedding is at least
+    `threshold` cosine-similar to a stored one with the same embedding model,
+    document scope and corpus version. Buckets of recent entries are kept in
+    memory; a cold bucket is loaded from the database on first use.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (model, scope, version) -> {"ids", "vectors", "answers", "sources"}
+        self._buckets: "OrderedDict[Tuple[str, str, str], Dict]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- hot layer ----------
+    def _bucket(self, db: Session, key: Tuple[str, str, str]) -> Dict:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._buckets.move_to_end(key)
+                return bucket
+
+        model_name, scope, version = key
+        rows = (
+            db.query(Query.id, Query.query_embedding, Query.response, Query.source_document_ids)
+            .filter(
+                Query.model_name == model_name,
+                Query.document_scope == scope,
+                Query.corpus_version == version,
+                Query.query_embedding.isnot(None),
+            )
+            .order_by(Query.id.desc())
+            .limit(self.max_entries)
+            .all()
+        )
+        bucket = {"ids": [], "vectors": [], "answers": [], "sources": []}
+        for row in rows:
+            self._append(bucket, row.id, np.frombuffer(row.query_embedding, dtype="<f4"), row.response, row.source_document_ids)
+
+        with self._lock:
+            # Another request may have loaded the same bucket meanwhile
+            existing = self._buckets.get(key)
+            if existing is not None:
+                return existing
+            self._buckets[key] = bucket
+            self._size += len(bucket["ids"])
+            self._evict()
+            return bucket
+
+    @staticmethod
+    def _append(bucket: Dict, query_id: int, vector: np.ndarray, answer: str, sources: Optional[str]):
+        bucket["ids"].append(query_id)
+        bucket["vectors"].append(vector)
+        bucket["answers"].append(answer)
+        bucket["sources"].append({int(i) for i in (sources or "").split(",") if i})
+        bucket.pop("matrix", None)
+
+    def _evict(self):
+        """Drop least recently used buckets until the hot layer fits (caller holds the lock)"""
+        while self._size > self.max_entries and len(self._buckets) > 1:
+            _, bucket = self._buckets.popitem(last=False)
+            self._size -= len(bucket["ids"])
+
+    # ---------- cache API ----------
+    def lookup(self, db: Session, model_name: str, query_vector, document_ids: Optional[List[int]] = None) -> Optional[Dict]:
+        """Return {"query_id", "answer", "similarity"} for a close enough cached question, else None"""
+        return self.lookup_many(db, model_name, normalize_rows(query_vector), document_ids)[0]
+
+    def lookup_many(self, db: Session, model_name: str, query_vectors, document_ids: Optional[List[int]] = None) -> List[Optional[Dict]]:
+        """
+        lookup() for several questions sharing one document scope, scored with one matrix product
+
+        Hit counters are updated but not committed; that is left to the caller.
+        """
+        queries = normalize_rows(query_vectors)
+        version = corpus_version(db, document_ids)
+        if version is None:
+            return [None] * len(queries)
+
+        bucket = self._bucket(db, (model_name, document_scope(document_ids), version))
+        hits: List[Optional[Dict]] = [None] * len(queries)
+        with self._lock:
+            if bucket["ids"]:
+                matrix = bucket.get("matrix")
+                if matrix is None:
+                    matrix = bucket["matrix"] = normalize_rows(np.vstack(bucket["vectors"]))
+                scores = queries @ matrix.T
+                for i, query_scores in enumerate(scores):
+                    best = int(np.argmax(query_scores))
+                    if queries[i].any() and query_scores[best] >= self.threshold:
+                        hits[i] = {
+                            "query_id": bucket["ids"][best],
+                            "answer": bucket["answers"][best],
+                            "similarity": float(query_scores[best]),
+                        }
+            found = sum(hit is not None for hit in hits)
+            self.hits += found
+            self.misses += len(hits) - found
+
+        hit_ids = [hit["query_id"] for hit in hits if hit is not None]
+        if hit_ids:
+            # Counted in one statement; the caller's transaction decides when it lands.
+            # A row hit by several questions is counted once per lookup.
+            db.query(Query).filter(Query.id.in_(set(hit_ids))).update(
+                {Query.hit_count: func.coalesce(Query.hit_count, 0) + 1}, synchronize_session=False
+            )
+        return hits
+
+    def store(
+        self,
+        db: Session,
+        model_name: str,
+        question: str,
+        query_vector,
+        answer: str,
+        document_ids: Optional[List[int]] = None,
+        source_document_ids: Iterable[int] = (),
+        version: Optional[str] = None,
+    ) -> Optional[int]:
+        """
+        Persist an answer and add it to the hot layer; returns the queries row id
+
+        `version` is the corpus version read before retrieving the answer's
+        context; it defaults to the current one.
+        """
+        if version is None:
+            version = corpus_version(db, document_ids)
+        vector = np.asarray(query_vector, dtype=np.float32).ravel()
+        if version is None or not vector.any():
+            return None
+
+        sources = sorted(set(int(i) for i in source_document_ids))
+        sources_text = "," + ",".join(str(i) for i in sources) + "," if sources else None
+        row = Query(
+            query_text=question,
+            response=answer,
+            query_embedding=np.ascontiguousarray(vector, dtype="<f4").tobytes(),
+            model_name=model_name,
+            document_scope=document_scope(document_ids),
+            corpus_version=version,
+            source_document_ids=sources_text,
+            hit_count=0,
+        )
+        db.add(row)
+        db.commit()
+
+        key = (model_name, row.document_scope, version)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._append(bucket, row.id, vector, answer, sources_text)
+                self._size += 1
+                self._evict()
+        return row.id
+
+    def invalidate_documents(self, db: Session, document_ids: Iterable[int]) -> int:
+        """Drop every cached answer that drew on any of the given documents"""
+        document_ids = {int(i) for i in document_ids}
+        if not document_ids:
+            return 0
+
+        removed = (
+            db.query(Query)
+            .filter(or_(*(Query.source_document_ids.like(f"%,{i},%") for i in document_ids)))
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+
+        with self._lock:
+            for key in list(self._buckets):
+                bucket = self._buckets[key]
+                if any(sources & document_ids for sources in bucket["sources"]):
+                    del self._buckets[key]
+                    self._size -= len(bucket["ids"])
+        if removed:
+            logger.info(f"Invalidated {removed} cached answers for documents {sorted(document_ids)}")
+        return removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": settings.ANSWER_CACHE_ENABLED,
+                "threshold": self.threshold,
+                "hot_entries": self._size,
+                "hot_buckets": len(self._buckets),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Shared cache for the whole process
+answer_cache = AnswerCache(
+    threshold=settings.ANSWER_CACHE_SIMILARITY,
+    max_entries=settings.ANSWER_CACHE_SIZE,
+)
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.services.answer_cache import answer_cache, corpus_version, is_cacheable
+
+logger = logging.getLogger(__name__)
+
+NO_CONTEXT_ANSWER = "I could not find relevant information to answer this question."
+TIMEOUT_ANSWER = "I could not answer this question in time. Please try again."
+
+# LLM calls get their own threads so a stuck call never ties up the default
+# executor that asyncio.to_thread shares with the rest of the app
+_llm_executors: Dict[int, ThreadPoolExecutor] = {}
+_llm_executors_lock = threading.Lock()
+
+
+def _llm_executor(workers: int) -> ThreadPoolExecutor:
+    with _llm_executors_lock:
+        if workers not in _llm_executors:
+            _llm_executors[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm")
+        return _llm_executors[workers]
+
+
+async def generate_answers(
+    llm_service,
+    items: Sequence[Tuple[str, List[Dict]]],
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Answer several (question, context chunks) pairs concurrently
+
+    Each blocking generate_answer call runs on a dedicated pool of
+    `concurrency` threads so the event loop stays free. Every question gets
+    `timeout` seconds from the start of the batch, covering both the wait
+    for a slot and the call itself, so hung calls cannot stall the questions
+    queued behind them. A timed-out call keeps its slot until its thread
+    actually returns, so slow calls cannot push more than `concurrency`
+    requests at the LLM. Results come back in input order, and a timed-out or
+    failed question yields a fallback answer instead of failing the batch.
+    """
+    concurrency = max(1, concurrency or settings.LLM_CONCURRENCY)
+    timeout = timeout or settings.LLM_TIMEOUT_SECONDS
+    loop = asyncio.get_running_loop()
+    executor = _llm_executor(concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    deadline = loop.time() + timeout
+
+    def release_slot(_):
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            pass  # The loop has closed; nobody is waiting for the slot
+
+    async def answer(position: int, question: str, context_chunks: List[Dict]) -> Dict:
+        if not context_chunks:
+            return {"answer": NO_CONTEXT_ANSWER, "model": None, "tokens_used": 0}
+
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=deadline - loop.time())
+        except asyncio.TimeoutError:
+            logger.warning(f"Question {position} got no LLM slot within {timeout}s")
+            return {"answer": TIMEOUT_ANSWER, "model": None, "tokens_used": 0}
+        started = time.perf_counter()
+        future = executor.submit(llm_service.generate_answer, query=question, context_chunks=context_chunks)
+        # The slot is freed when the thread finishes, not when we stop waiting
+        future.add_done_callback(release_slot)
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=deadline - loop.time())
+        except asyncio.TimeoutError:
+            # The worker thread cannot be interrupted; its result is simply discarded
+            logger.warning(f"Answer generation for question {position} timed out after {timeout}s")
+            return {"answer": TIMEOUT_ANSWER, "model": None, "tokens_used": 0}
+        except Exception as e:
+            logger.error(f"Answer generation for question {position} failed: {e}")
+            return {
+                "answer": f"I encountered an error while processing your question: {str(e)}",
+                "model": None,
+                "tokens_used": 0,
+            }
+        logger.info(f"Answered question {position} in {time.perf_counter() - started:.2f}s")
+        return result
+
+    return await asyncio.gather(*(
+        answer(position, question, context_chunks)
+        for position, (question, context_chunks) in enumerate(items)
+    ))
+
+
+async def _in_session(db, fn: Callable, *args, **kwargs):
+    """Call fn(session, ...) with a sync Session; an AsyncSession runs it through run_sync"""
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return fn(db, *args, **kwargs)
+
+
+async def answer_questions(
+    db,
+    search_service,
+    llm_service,
+    questions: List[str],
+    document_ids: Optional[List[int]] = None,
+    top_k: int = 5,
+) -> List[str]:
+    """
+    Answer questions, serving near-duplicates from the semantic answer cache
+
+    Only cache misses are retrieved (in one batch) and sent to the LLM; fresh
+    model answers are written back to the cache with their source documents.
+
+    `db` serves the short answer cache queries and may be an AsyncSession.
+    Query encoding and retrieval (Pinecone calls, vector and BM25 scoring,
+    index backfill) run in worker threads, so the event loop stays free;
+    search_service must therefore hold its own sync Session, not db's.
+    """
+    embedding_service = search_service.embedding_service
+    answers: List[Optional[str]] = [None] * len(questions)
+
+    question_vectors = None
+    if questions:
+        # Also fills the query embedding cache that the search below reads from
+        vectors = await asyncio.to_thread(embedding_service.embed_queries, list(questions))
+        if settings.ANSWER_CACHE_ENABLED:
+            question_vectors = vectors
+            hits = await _in_session(db, answer_cache.lookup_many, embedding_service.model_name, question_vectors, document_ids)
+            # Keep the hit counters even when every answer comes from the cache
+            await _in_session(db, lambda session: session.commit())
+            for i, hit in enumerate(hits):
+                if hit is not None:
+                    answers[i] = hit["answer"]
+            logger.info(f"Answer cache served {sum(hit is not None for hit in hits)} of {len(questions)} questions")
+
+    pending = [i for i, answer in enumerate(answers) if answer is None]
+    if pending:
+        version = None
+        if question_vectors is not None:
+            # Read before retrieval: chunks an ingest commits meanwhile change it
+            version = await _in_session(db, corpus_version, document_ids)
+        chunks_per_question = await asyncio.to_thread(
+            search_service.batch_semantic_search,
+            queries=[questions[i] for i in pending],
+            top_k=top_k,
+            document_ids=document_ids,
+        )
+        results = await generate_answers(
+            llm_service,
+            [(questions[i], chunks) for i, chunks in zip(pending, chunks_per_question)]
+        )
+        for i, chunks, result in zip(pending, chunks_per_question, results):
+            answers[i] = result["answer"]
+            if question_vectors is not None and is_cacheable(result):
+                await _in_session(
+                    db,
+                    answer_cache.store,
+                    embedding_service.model_name,
+                    questions[i],
+                    question_vectors[i],
+                    result["answer"],
+                    document_ids=document_ids,
+                    source_document_ids=[chunk["document_id"] for chunk in chunks],
+                    version=version,
+                )
+
+    return answers
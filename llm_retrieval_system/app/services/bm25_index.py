@@ -0,0 +1,192 @@
+import heapq
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import ChunkDeletion, DocumentChunk
+from app.services.id_watermark import IdWatermark
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'from', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'under'}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens with stopwords removed"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Incremental inverted index with Okapi BM25 scoring over chunks
+
+    Postings map term -> {chunk_id: term frequency}; scoring a query only
+    touches the postings of its terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._chunk_terms: Dict[int, Tuple[str, ...]] = {}
+        self._chunk_docs: Dict[int, int] = {}
+        self._doc_chunks: Dict[int, Set[int]] = {}
+        self._total_length = 0
+        self._chunk_mark = IdWatermark()
+        self._deletion_mark = IdWatermark()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    # ---------- writes ----------
+    def add(self, chunk_id: int, document_id: int, text: str):
+        """Index (or re-index) one chunk"""
+        counts = Counter(tokenize(text))
+        with self._lock:
+            if chunk_id in self._lengths:
+                self.remove_chunks([chunk_id])
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[chunk_id] = tf
+            length = sum(counts.values())
+            self._lengths[chunk_id] = length
+            self._total_length += length
+            self._chunk_terms[chunk_id] = tuple(counts)
+            self._chunk_docs[chunk_id] = document_id
+            self._doc_chunks.setdefault(document_id, set()).add(chunk_id)
+
+    def remove_chunks(self, chunk_ids: Iterable[int]) -> int:
+        """Drop chunks and their postings"""
+        removed = 0
+        with self._lock:
+            for chunk_id in chunk_ids:
+                if chunk_id not in self._lengths:
+                    continue
+                for term in self._chunk_terms.pop(chunk_id):
+                    postings = self._postings[term]
+                    del postings[chunk_id]
+                    if not postings:
+                        del self._postings[term]
+                self._total_length -= self._lengths.pop(chunk_id)
+                document_id = self._chunk_docs.pop(chunk_id)
+                siblings = self._doc_chunks.get(document_id)
+                if siblings is not None:
+                    siblings.discard(chunk_id)
+                    if not siblings:
+                        del self._doc_chunks[document_id]
+                removed += 1
+        return removed
+
+    def remove_document(self, document_id: int) -> int:
+        """Drop every chunk belonging to a document"""
+        with self._lock:
+            return self.remove_chunks(list(self._doc_chunks.get(document_id, ())))
+
+    # ---------- reads ----------
+    def search(self, query: str, top_k: int = 10, document_ids: Optional[List[int]] = None) -> List[Tuple[int, int, float]]:
+        """
+        BM25-score chunks containing any query term
+
+        Returns (chunk_id, document_id, score) tuples, best first.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            total = len(self._lengths)
+            if not terms or total == 0:
+                return []
+
+            allowed = None
+            if document_ids:
+                allowed = set()
+                for document_id in document_ids:
+                    allowed.update(self._doc_chunks.get(document_id, ()))
+                if not allowed:
+                    return []
+
+            avg_length = self._total_length / total
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    if allowed is not None and chunk_id not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [(chunk_id, self._chunk_docs[chunk_id], score) for chunk_id, score in best]
+
+    # ---------- database sync ----------
+    def _load_rows(self, db: Session) -> int:
+        """Index chunks not read yet, including ones an older transaction committed late"""
+        rows = (
+            db.query(DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.chunk_text)
+            .filter(self._chunk_mark.pending(DocumentChunk.id))
+            .order_by(DocumentChunk.id)
+            .all()
+        )
+        with self._lock:
+            for row in rows:
+                self.add(row.id, row.document_id, row.chunk_text)
+            self._chunk_mark.advance(row.id for row in rows)
+        return len(rows)
+
+    def _apply_deletions(self, db: Session) -> int:
+        """Drop chunks deleted since the last sync, as recorded in the deletion log"""
+        rows = (
+            db.query(ChunkDeletion.id, ChunkDeletion.chunk_id)
+            .filter(self._deletion_mark.pending(ChunkDeletion.id))
+            .order_by(ChunkDeletion.id)
+            .all()
+        )
+        with self._lock:
+            removed = self.remove_chunks([row.chunk_id for row in rows])
+            self._deletion_mark.advance(row.id for row in rows)
+        return removed
+
+    def load_from_db(self, db: Session) -> int:
+        """(Re)build the index from every stored chunk"""
+        with self._lock:
+            self._reset()
+            # Read first, then replay: deletions logged while loading still apply
+            deletion_id = db.query(func.max(ChunkDeletion.id)).scalar() or 0
+            loaded = self._load_rows(db)
+            self._deletion_mark = IdWatermark(deletion_id)
+            self._apply_deletions(db)
+            self.loaded = True
+            logger.info(f"BM25 index loaded with {loaded} chunks and {len(self._postings)} terms")
+            return loaded
+
+    def refresh(self, db: Session) -> int:
+        """
+        Drop chunks deleted elsewhere and index chunks committed since the last sync
+
+        Both are primary-key range reads. Ids skipped because their
+        transaction had not committed yet are re-read until they appear.
+        """
+        if not self.loaded:
+            return self.load_from_db(db)
+
+        with self._lock:
+            self._apply_deletions(db)
+            return self._load_rows(db)
+
+
+# Shared index for the whole process
+bm25_index = BM25Index()
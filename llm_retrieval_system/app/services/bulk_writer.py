@@ -0,0 +1,83 @@
+import io
+import logging
+from typing import Dict, List, NamedTuple, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models import DocumentChunk, Embedding
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_COLUMNS = ("chunk_id", "pinecone_id", "vector_data", "dimension", "model_name", "status")
+
+
+class StoredChunk(NamedTuple):
+    """The chunk fields embedding needs, without a full ORM object"""
+    id: int
+    document_id: int
+    chunk_index: int
+    chunk_text: str
+
+
+def insert_chunks(db: Session, rows: Sequence[Dict]) -> List[int]:
+    """
+    Insert document_chunks rows with one executemany; returns their ids in row order
+
+    Runs inside the session's transaction but bypasses the identity map; the
+    caller commits.
+    """
+    if not rows:
+        return []
+    table = DocumentChunk.__table__
+    result = db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), list(rows))
+    return [row.id for row in result]
+
+
+def insert_embeddings(db: Session, rows: Sequence[Dict]) -> int:
+    """
+    Insert embeddings rows (keys: EMBEDDING_COLUMNS) inside the session's transaction
+
+    On PostgreSQL with psycopg2 the rows are streamed with COPY; otherwise
+    they go in as one executemany. The caller commits.
+    """
+    if not rows:
+        return 0
+    connection = db.connection()
+    if connection.dialect.name == "postgresql" and _copy_rows(connection, Embedding.__tablename__, EMBEDDING_COLUMNS, rows):
+        return len(rows)
+    db.execute(insert(Embedding.__table__), list(rows))
+    return len(rows)
+
+
+def _copy_value(value) -> str:
+    """One field in COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # bytea hex input; the backslash itself is escaped in the COPY stream
+        return "\\\\x" + bytes(value).hex()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_rows(connection, table: str, columns: Sequence[str], rows: Sequence[Dict]) -> bool:
+    """COPY rows through the DBAPI connection; False when the driver has no copy_expert"""
+    cursor = connection.connection.cursor()
+    try:
+        if not hasattr(cursor, "copy_expert"):
+            return False
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_value(row[column]) for column in columns))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+        return True
+    finally:
+        cursor.close()
@@ -0,0 +1,85 @@
+import logging
+from typing import List, Optional, Sequence
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Token budget used with tiktoken encodings when CHUNK_MAX_TOKENS is not set
+DEFAULT_TIKTOKEN_MAX_TOKENS = 512
+
+
+class ModelTokenizer:
+    """Token offsets from the embedding model's own (fast) tokenizer"""
+
+    def __init__(self, tokenizer, max_tokens: int, batch_size: int = 64):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.batch_size = batch_size
+
+    def token_starts(self, texts: Sequence[str]) -> List[List[int]]:
+        """Start offset of every token in each text, tokenized in one batched call"""
+        encoded = self.tokenizer(
+            list(texts),
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+        )
+        return [[start for start, _ in offsets] for offsets in encoded["offset_mapping"]]
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        encoded = self.tokenizer(list(texts), add_special_tokens=False, return_attention_mask=False, return_token_type_ids=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+
+class TiktokenTokenizer:
+    """Token offsets from a tiktoken encoding, for chunks sized to an LLM budget"""
+
+    def __init__(self, encoding, max_tokens: int, batch_size: int = 64):
+        self.encoding = encoding
+        self.max_tokens = max_tokens
+        self.batch_size = batch_size
+
+    def token_starts(self, texts: Sequence[str]) -> List[List[int]]:
+        """Start offset of every token in each text; encoding is batched across threads by tiktoken"""
+        return [
+            self.encoding.decode_with_offsets(tokens)[1]
+            for tokens in self.encoding.encode_ordinary_batch(list(texts))
+        ]
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(list(texts))]
+
+
+def load_chunk_tokenizer(spec: Optional[str] = None, registry=None):
+    """
+    Tokenizer for token-mode chunking, or None when it cannot be loaded
+
+    `spec` is "model" for the embedding model's tokenizer (chunks then fit its
+    max sequence length) or the name of a tiktoken encoding such as
+    "cl100k_base".
+    """
+    spec = spec or settings.CHUNK_TOKENIZER
+    max_tokens = settings.CHUNK_MAX_TOKENS or None
+
+    if spec == "model":
+        from app.services.model_registry import model_registry
+
+        model = (registry or model_registry).get(settings.LOCAL_EMBEDDING_MODEL)
+        tokenizer = getattr(model, "tokenizer", None)
+        if tokenizer is None or not getattr(tokenizer, "is_fast", False):
+            logger.warning(f"No fast tokenizer available for {settings.LOCAL_EMBEDDING_MODEL}")
+            return None
+        # Longer inputs are truncated by the model, special tokens included
+        limit = model.max_seq_length - tokenizer.num_special_tokens_to_add()
+        return ModelTokenizer(tokenizer, min(max_tokens or limit, limit))
+
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(spec)
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding {spec}: {e}")
+        return None
+    return TiktokenTokenizer(encoding, max_tokens or DEFAULT_TIKTOKEN_MAX_TOKENS)
@@ -1,15 +1,82 @@
 import logging
-from typing import List
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
 import re
 
 logger = logging.getLogger(__name__)
 
+# Sentence punctuation and the whitespace after it
+_SENTENCE_BOUNDARY = re.compile(r'[.!?]\s+')
+_NON_SPACE = re.compile(r'\S')
+
+
+def _tail(items: List[int], count: int) -> List[int]:
+    """The last `count` items (none for count <= 0)"""
+    return items[max(len(items) - count, 0):] if count > 0 else []
+
+
+class Chunk(NamedTuple):
+    """A chunk's [start, end) character span in the source text, and its text"""
+    start: int
+    end: int
+    text: str
+
+
+class _Window:
+    """The part of a streamed text still needed, starting at absolute offset `base`"""
+    
+    __slots__ = ("text", "base", "pinned")
+    
+    def __init__(self):
+        self.text = ""
+        self.base = 0
+        self.pinned = None  # Earliest offset the chunk builder still needs
+    
+    def slice(self, start: int, end: int) -> str:
+        return self.text[start - self.base:end - self.base]
+    
+    def next_non_space(self, offset: int) -> int:
+        """First non-whitespace offset at or after `offset` (end of window if none)"""
+        match = _NON_SPACE.search(self.text, offset - self.base)
+        return match.start() + self.base if match else self.base + len(self.text)
+    
+    def discard_before(self, offset: int):
+        # Only worth a copy once most of the window is stale
+        drop = offset - self.base
+        if drop > 4096 and drop * 2 > len(self.text):
+            self.text = self.text[drop:]
+            self.base = offset
+
+
 class ChunkingService:
     """Service for splitting text into chunks for embedding"""
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        tokenizer=None,
+        max_tokens: Optional[int] = None,
+        overlap_tokens: int = 0,
+    ):
+        """
+        Chunks are measured in characters, or in tokens when a tokenizer is given
+        
+        Args:
+            chunk_size: Maximum characters per chunk
+            chunk_overlap: Characters repeated from the end of the previous chunk
+            tokenizer: Optional ChunkTokenizer (see app.services.chunk_tokenizer)
+            max_tokens: Maximum tokens per chunk in token mode (default: the tokenizer's limit)
+            overlap_tokens: Tokens repeated from the end of the previous chunk in token mode
+        """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens or (tokenizer.max_tokens if tokenizer is not None else None)
+        self.overlap_tokens = min(overlap_tokens, self.max_tokens - 1) if self.max_tokens else 0
+    
+    @property
+    def mode(self) -> str:
+        return "tokens" if self.tokenizer is not None else "chars"
     
     def chunk_text(self, text: str) -> List[str]:
         """
@@ -21,74 +88,185 @@ class ChunkingService:
         Returns:
             List of text chunks
         """
-        if not text or len(text.strip()) == 0:
+        return [text[start:end] for start, end in self.chunk_spans(text)]
+    
+    def chunk_spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Split text into overlapping chunks given as [start, end) offsets into it
+        
+        Works on offsets alone; text[start:end] is the chunk's text.
+        """
+        if not text or not text.strip():
             return []
+        return list(self._iter_spans([text], _Window()))
+    
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[Chunk]:
+        """
+        Chunk a stream of text pieces without joining them first
         
-        # Clean and normalize text
-        text = self._clean_text(text)
+        The pieces are read as one concatenated text (a page, a paragraph or an
+        arbitrary block each), and chunks are yielded as soon as they are
+        complete, with their offsets into that text. Only the unfinished
+        sentences and chunk are held in memory, and the spans are the same as
+        chunk_spans() on the joined text.
         
-        # Try sentence-based chunking first
-        chunks = self._sentence_based_chunking(text)
+        Args:
+            pieces: Consecutive parts of the text
+            
+        Returns:
+            Iterator over chunks
+        """
+        window = _Window()
+        for start, end in self._iter_spans(pieces, window):
+            # A chunk's text is only sliced out once it is complete
+            yield Chunk(start, end, window.slice(start, end))
+    
+    def _iter_spans(self, pieces: Iterable[str], window: _Window) -> Iterator[Tuple[int, int]]:
+        sentences = self._iter_sentences(pieces, window)
+        if self.tokenizer is not None:
+            return self._pack_by_tokens(sentences, window)
+        return self._pack_by_chars(sentences, window)
+    
+    def _iter_sentences(self, pieces: Iterable[str], window: _Window) -> Iterator[Tuple[int, int]]:
+        """Single pass over the text, yielding sentence spans as their ends are seen"""
+        # A run of text without sentence punctuation is cut here so the window stays bounded
+        max_sentence = max(self.chunk_size * 10, 100_000)
+        sentence_start = None  # Start of the sentence being read
+        scan = 0  # Where to resume looking for a sentence boundary
         
-        # If chunks are too large, use character-based chunking
-        final_chunks = []
-        for chunk in chunks:
-            if len(chunk) <= self.chunk_size:
-                final_chunks.append(chunk)
-            else:
-                final_chunks.extend(self._character_based_chunking(chunk))
+        def sentences(final: bool) -> Iterator[Tuple[int, int]]:
+            nonlocal sentence_start, scan
+            end_of_text = window.base + len(window.text)
+            while True:
+                if sentence_start is None:
+                    sentence_start = scan = window.next_non_space(scan)
+                    if sentence_start == end_of_text:
+                        sentence_start = None
+                        return
+                match = _SENTENCE_BOUNDARY.search(window.text, scan - window.base)
+                if match is None or (match.end() == len(window.text) and not final):
+                    # The boundary, or the whitespace after it, may continue in the next piece
+                    scan = window.base + (match.start() if match else max(len(window.text) - 1, 0))
+                    scan = max(scan, sentence_start)
+                    if final:
+                        yield sentence_start, window.base + len(window.text.rstrip())
+                        sentence_start = None
+                    elif end_of_text - sentence_start > max_sentence:
+                        yield sentence_start, end_of_text
+                        sentence_start, scan = None, end_of_text
+                    return
+                yield sentence_start, window.base + match.start() + 1
+                sentence_start, scan = None, window.base + match.end()
         
-        return [chunk.strip() for chunk in final_chunks if chunk.strip()]
-    
-    def _clean_text(self, text: str) -> str:
-        """Clean and normalize text"""
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Remove excessive newlines
-        text = re.sub(r'\n\s*\n', '\n\n', text)
-        return text.strip()
-    
-    def _sentence_based_chunking(self, text: str) -> List[str]:
-        """Split text by sentences, respecting chunk size"""
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        chunks = []
-        current_chunk = ""
+        for piece in pieces:
+            if not piece:
+                continue
+            window.text += piece
+            yield from sentences(final=False)
+            keep = [offset for offset in (scan, sentence_start, window.pinned) if offset is not None]
+            window.discard_before(min(keep))
         
-        for sentence in sentences:
-            # If adding this sentence would exceed chunk size
-            if len(current_chunk) + len(sentence) > self.chunk_size and current_chunk:
-                chunks.append(current_chunk)
-                # Start new chunk with overlap
-                current_chunk = self._get_overlap_text(current_chunk) + sentence
+        yield from sentences(final=True)
+    
+    # ---------- character mode ----------
+    def _pack_by_chars(self, sentences: Iterator[Tuple[int, int]], window: _Window) -> Iterator[Tuple[int, int]]:
+        """
+        Group sentences into chunks of at most chunk_size characters, each new
+        chunk starting chunk_overlap characters before the end of the previous one
+        """
+        chunk = None  # [start, end) of the chunk being built
+        for start, end in sentences:
+            if chunk is None:
+                chunk = (start, end)
+            elif end - chunk[0] > self.chunk_size:
+                # Adding this sentence would exceed chunk size
+                yield from self._split(chunk, window)
+                # Start new chunk with overlap, trimmed so the sentence still fits
+                overlap_start = max(chunk[1] - self.chunk_overlap, end - self.chunk_size)
+                if self.chunk_overlap and chunk[0] < overlap_start < start:
+                    start = min(window.next_non_space(overlap_start), start)
+                chunk = (start, end)
             else:
-                current_chunk += (" " if current_chunk else "") + sentence
-        
-        # Add the last chunk
-        if current_chunk:
-            chunks.append(current_chunk)
+                chunk = (chunk[0], end)
+            window.pinned = chunk[0]
         
-        return chunks
+        if chunk is not None:
+            yield from self._split(chunk, window)
     
-    def _character_based_chunking(self, text: str) -> List[str]:
-        """Split text by character count with overlap"""
-        chunks = []
-        start = 0
+    def _split(self, span: Tuple[int, int], window: _Window) -> Iterator[Tuple[int, int]]:
+        """Emit a chunk, cutting one longer than chunk_size by character count with overlap"""
+        start, end = span
+        if end - start <= self.chunk_size:
+            yield start, end
+            return
         
-        while start < len(text):
-            end = start + self.chunk_size
-            chunk = text[start:end]
-            if chunk.strip():
-                chunks.append(chunk)
-            start = end - self.chunk_overlap
-            
-            # Prevent infinite loop
-            if start >= end:
+        step = self.chunk_size - self.chunk_overlap
+        if step <= 0:
+            step = self.chunk_size
+        for piece_start in range(start, end, step):
+            piece_end = min(piece_start + self.chunk_size, end)
+            text = window.slice(piece_start, piece_end)
+            stripped = text.strip()
+            if stripped:
+                lead = len(text) - len(text.lstrip())
+                yield piece_start + lead, piece_start + lead + len(stripped)
+            if piece_end == end:
                 break
+    
+    # ---------- token mode ----------
+    def _pack_by_tokens(self, sentences: Iterator[Tuple[int, int]], window: _Window) -> Iterator[Tuple[int, int]]:
+        """
+        Group sentences into chunks of at most max_tokens tokens, each new chunk
+        repeating the last overlap_tokens tokens of the previous one
+        
+        Sentences are tokenized in batches; a sentence longer than the budget
+        is cut at token boundaries.
+        """
+        batch_size = getattr(self.tokenizer, "batch_size", 64)
+        # Start offsets of the tokens in the chunk being built, and where it ends
+        tokens: List[int] = []
+        chunk_end = 0
+        fresh = False  # Whether the chunk holds more than the overlap
         
-        return chunks
+        def pack(batch: List[Tuple[int, int]]) -> Iterator[Tuple[int, int]]:
+            nonlocal tokens, chunk_end, fresh
+            token_starts = self.tokenizer.token_starts([window.slice(start, end) for start, end in batch])
+            for (start, end), starts in zip(batch, token_starts):
+                starts = [start + offset for offset in starts] or [start]
+                if len(tokens) + len(starts) > self.max_tokens and fresh:
+                    yield self._trim(tokens[0], chunk_end, window)
+                    tokens, fresh = _tail(tokens, self.overlap_tokens), False
+                if len(tokens) + len(starts) > self.max_tokens and len(starts) <= self.max_tokens:
+                    # Trim the overlap so the sentence fits
+                    tokens = _tail(tokens, self.max_tokens - len(starts))
+                if len(tokens) + len(starts) <= self.max_tokens:
+                    tokens, chunk_end, fresh = tokens + starts, end, True
+                    continue
+                # Longer than a whole chunk: cut by token count with overlap
+                step = max(self.max_tokens - self.overlap_tokens, 1)
+                for first in range(0, len(starts), step):
+                    last = first + self.max_tokens
+                    yield self._trim(starts[first], starts[last] if last < len(starts) else end, window)
+                    if last >= len(starts):
+                        break
+                tokens = _tail(starts, self.overlap_tokens)
+                chunk_end, fresh = end, False
+        
+        batch: List[Tuple[int, int]] = []
+        for sentence in sentences:
+            batch.append(sentence)
+            window.pinned = tokens[0] if tokens else batch[0][0]
+            if len(batch) >= batch_size:
+                yield from pack(batch)
+                batch = []
+        if batch:
+            yield from pack(batch)
+        if fresh:
+            yield self._trim(tokens[0], chunk_end, window)
     
-    def _get_overlap_text(self, text: str) -> str:
-        """Get the last part of text for overlap"""
-        if len(text) <= self.chunk_overlap:
-            return text
-        return text[-self.chunk_overlap:]
+    @staticmethod
+    def _trim(start: int, end: int, window: _Window) -> Tuple[int, int]:
+        """Shrink a span to exclude surrounding whitespace"""
+        text = window.slice(start, end)
+        lead = len(text) - len(text.lstrip())
+        return start + lead, start + len(text.rstrip())
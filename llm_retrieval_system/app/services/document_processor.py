@@ -1,16 +1,28 @@
 import logging
 import os
+import threading
+from itertools import chain, islice
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 import traceback
 
+from sqlalchemy import func
+
 from app.core.config import settings
 from app.models import Document, DocumentChunk
 from app.services.text_extractor import TextExtractor
 from app.services.chunking_service import ChunkingService
+from app.services.chunk_tokenizer import load_chunk_tokenizer
+from app.services.bm25_index import bm25_index
+from app.services.answer_cache import answer_cache
+from app.services.document_store import ExtractionWriter, iter_extraction
+from app.services.bulk_writer import StoredChunk, insert_chunks
 
 logger = logging.getLogger(__name__)
 
+# Characters of extracted text kept on the Document row as a preview
+PREVIEW_CHARS = 10000
+
 class DocumentProcessor:
     """Service for processing uploaded documents"""
     
@@ -23,20 +35,255 @@ class DocumentProcessor:
         except Exception as e:
             logger.error(f"Failed to initialize TextExtractor: {e}")
             self.text_extractor = None
-            
+        
+        # Built on first use: token mode may load the embedding model, which
+        # must not happen when the routes module is imported
+        self._chunking_service = None
+        self._chunking_loaded = False
+        self._chunking_lock = threading.Lock()
+    
+    @property
+    def chunking_service(self) -> Optional[ChunkingService]:
+        """The ChunkingService, resolving the token-mode tokenizer on first access"""
+        if not self._chunking_loaded:
+            with self._chunking_lock:
+                if not self._chunking_loaded:
+                    self._chunking_service = self._create_chunking_service()
+                    self._chunking_loaded = True
+        return self._chunking_service
+    
+    @chunking_service.setter
+    def chunking_service(self, service: Optional[ChunkingService]):
+        self._chunking_service = service
+        self._chunking_loaded = True
+    
+    def _create_chunking_service(self) -> Optional[ChunkingService]:
         try:
-            self.chunking_service = ChunkingService(
+            tokenizer = None
+            if settings.CHUNKING_MODE == "tokens":
+                tokenizer = load_chunk_tokenizer()
+                if tokenizer is None:
+                    logger.warning("Token-aware chunking unavailable, chunking by characters")
+            service = ChunkingService(
                 chunk_size=settings.CHUNK_SIZE,
-                chunk_overlap=settings.CHUNK_OVERLAP
+                chunk_overlap=settings.CHUNK_OVERLAP,
+                tokenizer=tokenizer,
+                overlap_tokens=settings.CHUNK_OVERLAP_TOKENS
             )
-            logger.info("ChunkingService initialized successfully")
+            logger.info(f"ChunkingService initialized successfully ({service.mode} mode)")
+            return service
         except Exception as e:
             logger.error(f"Failed to initialize ChunkingService: {e}")
-            self.chunking_service = None
+            return None
+    
+    # ---------- pipeline stages ----------
+    def stream_text(
+        self,
+        file_path: str,
+        filename: str,
+        file_type: str,
+        content_hash: Optional[str] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Optional[Iterator[str]]:
+        """
+        Extract stage as a stream of text pieces, or None when the file has no text
+        
+        With a content hash, text already extracted from identical bytes by the
+        same extractor version is streamed back from the extraction cache;
+        otherwise the cache entry is written as the pieces go by.
+        `progress(done, total)` reports how much of the source has been read.
+        """
+        if self.text_extractor is None:
+            logger.error("TextExtractor is not initialized")
+            return None
+        
+        pieces = self._iter_text(file_path, filename, file_type, content_hash, progress)
+        # Look ahead to the first real text so empty files fail before anything is stored;
+        # leading whitespace is kept so chunk offsets match the extracted text
+        seen = []
+        for piece in pieces:
+            seen.append(piece)
+            if piece.strip():
+                return chain(seen, pieces)
+        logger.error(f"No text extracted from {filename}")
+        return None
+    
+    def _iter_text(self, file_path, filename, file_type, content_hash, progress) -> Iterator[str]:
+        if content_hash:
+            cached = iter_extraction(content_hash, file_type, TextExtractor.VERSION, progress=progress)
+            if cached is not None:
+                logger.info(f"Using cached extraction for {filename}")
+                yield from cached
+                return
+        
+        logger.info(f"Extracting text from {filename}")
+        pieces = self.text_extractor.iter_text(file_path, file_type, progress=progress)
+        if not content_hash:
+            yield from pieces
+            return
+        with ExtractionWriter(content_hash, file_type, TextExtractor.VERSION) as cache:
+            for piece in pieces:
+                cache.write(piece)
+                yield piece
+    
+    def create_document(self, db, filename: str, file_type: str, content_hash: Optional[str] = None) -> Document:
+        """Stage a Document row (flushed, not committed); ingest() fills in the text preview"""
+        document = Document(
+            filename=filename,
+            file_type=file_type,
+            content="",
+            content_hash=content_hash
+        )
+        db.add(document)
+        db.flush()
+        return document
+    
+    def invalidate_previous_copies(self, db, document: Document):
+        """A re-upload replaces earlier copies as a source; drop answers built on them"""
+        previous_ids = [
+            row.id for row in db.query(Document.id)
+            .filter(Document.filename == document.filename, Document.id != document.id)
+            .all()
+        ]
+        if previous_ids:
+            answer_cache.invalidate_documents(db, previous_ids)
+    
+    def ingest(
+        self,
+        db,
+        document: Document,
+        pieces: Iterable[str],
+        embed: bool = True,
+        batch_size: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Tuple[int, int]:
+        """
+        Chunk (and embed) stage over a stream of text, in fixed-size batches
+        
+        Each batch of chunks is inserted and embedded in one commit before the
+        next batch is cut, so memory stays flat however long the document is
+        and its first chunks are searchable while the rest is still being
+        extracted. Chunking is deterministic, so chunks stored by an
+        interrupted earlier run are skipped rather than stored twice. If
+        embedding fails, the remaining chunks are stored without vectors for
+        the embed stage (or search) to backfill.
+        
+        `progress(chunks, embeddings)` is called after each committed batch.
+        Returns the number of chunks and embeddings stored by this call.
+        """
+        if self.chunking_service is None:
+            raise RuntimeError("ChunkingService is not initialized")
+        
+        embedding_service = None
+        if embed:
+            from app.services.embedding_service import EmbeddingService
+            embedding_service = EmbeddingService(db)
+        
+        batch_size = batch_size or settings.INGESTION_BATCH_SIZE
+        already_stored = (
+            db.query(func.count(DocumentChunk.id))
+            .filter(DocumentChunk.document_id == document.id)
+            .scalar()
+        )
+        preview = []
+        
+        def tap(pieces):
+            # Keep the start of the text for the document preview
+            kept = 0
+            for piece in pieces:
+                if kept < PREVIEW_CHARS:
+                    preview.append(piece[:PREVIEW_CHARS - kept])
+                    kept += len(preview[-1])
+                yield piece
+        
+        document_id = document.id
+        saved_preview = None
+        stored = embedded = 0
+        position = 0
+        logger.info(f"Chunking text for document {document_id}")
+        chunks = self.chunking_service.iter_chunks(tap(pieces))
+        while True:
+            batch = list(islice(chunks, batch_size))
+            if not batch:
+                break
+            first_index, position = position, position + len(batch)
+            pending = [(first_index + offset, chunk) for offset, chunk in enumerate(batch) if first_index + offset >= already_stored]
+            if not pending:
+                continue
+            
+            rows = [
+                {
+                    "document_id": document_id,
+                    "chunk_index": i,
+                    "chunk_text": chunk.text,
+                    "start_char": chunk.start,
+                    "end_char": chunk.end
+                }
+                for i, chunk in pending
+            ]
+            while True:
+                if saved_preview is None or len(saved_preview) < PREVIEW_CHARS:
+                    saved_preview = "".join(preview).strip()
+                    document.content = saved_preview
+                try:
+                    # Chunks and their embeddings are bulk-inserted in one transaction
+                    chunk_ids = insert_chunks(db, rows)
+                    stored_chunks = vectors = None
+                    if embedding_service is not None:
+                        stored_chunks = [StoredChunk(chunk_id, document_id, row["chunk_index"], row["chunk_text"]) for chunk_id, row in zip(chunk_ids, rows)]
+                        vectors = embedding_service.embed_chunks(stored_chunks, batch_size=len(rows))
+                    db.commit()
+                    if stored_chunks:
+                        # Pinecone only sees batches that committed
+                        embedding_service.sync_vectors(stored_chunks, vectors)
+                    break
+                except Exception as e:
+                    db.rollback()
+                    if embedding_service is None:
+                        raise
+                    # Keep ingesting; vectors for the rest are backfilled later
+                    logger.error(f"Embedding failed for document {document_id}, search will backfill: {e}")
+                    embedding_service = None
+                    saved_preview = None
+            
+            stored += len(rows)
+            if embedding_service is not None:
+                embedded += len(rows)
+            if progress:
+                progress(stored, embedded)
+        
+        # The stream may have ended before the preview was saved in full
+        final_preview = "".join(preview).strip()
+        if final_preview != saved_preview:
+            document.content = final_preview
+            db.commit()
+        
+        logger.info(f"{stored} chunks and {embedded} embeddings stored for document {document_id}")
+        return stored, embedded
+    
+    def embed(self, db, document_id: int, progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """Embed stage: embed every chunk of the document that has no vector yet"""
+        from app.services.embedding_service import EmbeddingService
+        
+        return EmbeddingService(db).generate_for_document(document_id, progress=progress)
+    
+    def index(self, db):
+        """Index stage: bring the in-process keyword and vector indexes up to date"""
+        from app.services.vector_index import get_chunk_index
+        
+        if bm25_index.loaded:
+            bm25_index.refresh(db)
+        chunk_index = get_chunk_index()
+        if chunk_index.loaded:
+            chunk_index.refresh(db)
+            chunk_index.persist()
     
     async def process_document(self, file_path: str, filename: str, file_type: str) -> Optional[dict]:
         """
-        Process uploaded document: extract text, chunk, and store in database
+        Process uploaded document inline: extract text, chunk, embed and store in database
+        
+        Uploads through the API go through the ingestion job queue instead,
+        which runs the same stages in a worker pool.
         
         Args:
             file_path: Path to uploaded file
@@ -49,25 +296,11 @@ class DocumentProcessor:
         try:
             logger.info(f"Processing document: {filename}")
             
-            # Check if services are available
-            if self.text_extractor is None:
-                logger.error("TextExtractor is not initialized")
-                return None
-                
-            if self.chunking_service is None:
-                logger.error("ChunkingService is not initialized") 
+            # Text is streamed from the extractor straight into chunking
+            pieces = self.stream_text(file_path, filename, file_type)
+            if pieces is None:
                 return None
             
-            # Extract text from document
-            logger.info(f"Extracting text from {filename}")
-            text_content = self.text_extractor.extract_text(file_path, file_type)
-            
-            if not text_content:
-                logger.error(f"No text extracted from {filename}")
-                return None
-            
-            logger.info(f"Text extracted successfully: {len(text_content)} characters")
-            
             # Import SessionLocal fresh to ensure it's initialized
             from app.core.database import get_session_local
             SessionLocal = get_session_local()
@@ -79,12 +312,7 @@ class DocumentProcessor:
             # Create document record
             db = SessionLocal()
             try:
-                document = Document(
-                    filename=filename,
-                    file_type=file_type,
-                    content=text_content[:10000]  # Store first 10k chars for preview
-                )
-                db.add(document)
+                document = self.create_document(db, filename, file_type)
                 db.commit()
                 db.refresh(document)
                 
@@ -97,32 +325,25 @@ class DocumentProcessor:
                 }
                 
                 logger.info(f"Document saved to database with ID: {document.id}")
+                self.invalidate_previous_copies(db, document)
                 
-                # Chunk the text
-                logger.info(f"Chunking text from {filename}")
-                chunks = self.chunking_service.chunk_text(text_content)
-                
-                logger.info(f"Text chunked into {len(chunks)} chunks")
+                # Chunks are stored and embedded batch by batch as the text streams in
+                chunks_created, embedded = self.ingest(db, document, pieces)
+                if embedded < chunks_created:
+                    try:
+                        embedded += self.embed(db, document_data["id"])
+                    except Exception as e:
+                        db.rollback()
+                        logger.error(f"Embedding failed for document {document_data['id']}, search will backfill: {e}")
+                document_data["embeddings_created"] = embedded
                 
-                # Store chunks
-                chunk_objects = []
-                for i, chunk_text in enumerate(chunks):
-                    chunk = DocumentChunk(
-                        document_id=document.id,
-                        chunk_index=i,
-                        chunk_text=chunk_text
-                    )
-                    chunk_objects.append(chunk)
-                
-                if chunk_objects:
-                    db.add_all(chunk_objects)
-                    db.commit()
-                    logger.info(f"{len(chunk_objects)} chunks saved to database")
+                # Postings for the new chunks go straight into the keyword index
+                self.index(db)
                 
                 # Add chunk count to document data
-                document_data["chunks_created"] = len(chunks)
+                document_data["chunks_created"] = chunks_created
                 
-                logger.info(f"Successfully processed {filename}: {len(chunks)} chunks created")
+                logger.info(f"Successfully processed {filename}: {chunks_created} chunks created")
                 return document_data
                 
             finally:
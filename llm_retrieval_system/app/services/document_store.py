@@ -0,0 +1,167 @@
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple
+
+import aiofiles
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Uploads are copied to disk in pieces of this size, so memory stays flat
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Cached extractions are streamed back in blocks of this many characters
+EXTRACTION_BLOCK_SIZE = 64 * 1024
+
+
+def blob_path(content_hash: str) -> Path:
+    """Where the original file with this SHA-256 lives in the content-addressed store"""
+    return Path(settings.DOCUMENT_STORE_PATH) / "objects" / content_hash[:2] / content_hash
+
+
+def commit_blob(staged_path: Path, content_hash: str) -> Path:
+    """Move a fully written upload into the store under its hash (identical bytes just replace)"""
+    target = blob_path(content_hash)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(staged_path, target)
+    return target
+
+
+def remove_blob(content_hash: str):
+    """Delete a stored original; callers make sure no document still references it"""
+    blob_path(content_hash).unlink(missing_ok=True)
+
+
+def _extraction_path(content_hash: str, file_type: str, extractor_version: str) -> Path:
+    return Path(settings.DOCUMENT_STORE_PATH) / "extracted" / content_hash[:2] / f"{content_hash}.{file_type.lower()}.v{extractor_version}.txt.gz"
+
+
+def iter_extraction(
+    content_hash: str,
+    file_type: str,
+    extractor_version: str,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Optional[Iterator[str]]:
+    """
+    Stream cached extracted text in blocks, or None when it is not cached
+
+    `progress(done, total)` reports compressed bytes read. An entry found to be
+    corrupt while reading is deleted before the error is raised, so the next
+    attempt extracts again.
+    """
+    path = _extraction_path(content_hash, file_type, extractor_version)
+    if not path.exists():
+        return None
+
+    def blocks() -> Iterator[str]:
+        total = path.stat().st_size
+        try:
+            with open(path, "rb") as raw, gzip.open(raw, "rt", encoding="utf-8") as f:
+                for block in iter(lambda: f.read(EXTRACTION_BLOCK_SIZE), ""):
+                    yield block
+                    if progress:
+                        progress(raw.tell(), total)
+        except (OSError, EOFError, UnicodeDecodeError) as e:
+            logger.warning(f"Removing unreadable extraction cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            raise
+
+    return blocks()
+
+
+class ExtractionWriter:
+    """
+    Write extracted text to the cache piece by piece
+
+    Used as a context manager; the entry only appears if the block exits
+    without an error. Failing to write the cache is logged, never raised.
+    """
+
+    def __init__(self, content_hash: str, file_type: str, extractor_version: str):
+        self.path = _extraction_path(content_hash, file_type, extractor_version)
+        self._partial = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.part")
+        self._file = None
+
+    def __enter__(self) -> "ExtractionWriter":
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = gzip.open(self._partial, "wt", encoding="utf-8", compresslevel=6)
+        except OSError as e:
+            logger.warning(f"Could not open extraction cache entry {self.path}: {e}")
+        return self
+
+    def write(self, text: str):
+        if self._file is None:
+            return
+        try:
+            self._file.write(text)
+        except OSError as e:
+            logger.warning(f"Could not write extraction cache entry {self.path}: {e}")
+            self._abandon()
+
+    def _abandon(self):
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        self._file = None
+        self._partial.unlink(missing_ok=True)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._file is None:
+            return False
+        if exc_type is not None:
+            self._abandon()
+            return False
+        try:
+            self._file.close()
+            os.replace(self._partial, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save extraction cache entry {self.path}: {e}")
+            self._partial.unlink(missing_ok=True)
+        self._file = None
+        return False
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size limit"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"File exceeds the maximum upload size of {limit} bytes")
+        self.limit = limit
+
+
+async def stream_to_disk(source, destination: Path, max_size: int, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[int, str]:
+    """
+    Copy an uploaded file to `destination` in fixed-size chunks
+
+    The SHA-256 is computed while copying. Data goes to a ".part" file that is
+    renamed into place only once complete; on any error (including
+    FileTooLargeError, raised as soon as the limit is crossed) it is removed.
+
+    Returns (size in bytes, sha256 hex digest).
+    """
+    destination = Path(destination)
+    partial = destination.with_name(destination.name + ".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(partial, "wb") as out:
+            while True:
+                chunk = await source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(max_size)
+                digest.update(chunk)
+                await out.write(chunk)
+        os.replace(partial, destination)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    return size, digest.hexdigest()
@@ -1,87 +1,175 @@
 import os, logging, backoff
-from typing import List
+import numpy as np
+from typing import Callable, List, Optional
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
-from app.services.pinecone_service import upsert_vectors
+from app.core.config import settings
+from app.services.vector_sync import vector_sync
+from app.services.model_registry import ModelRegistry, model_registry
+from app.services.vector_index import get_chunk_index
+from app.services.query_cache import QueryEmbeddingCache, normalize_query, query_embedding_cache
+from app.services.bulk_writer import insert_embeddings
 from app.models import DocumentChunk, Embedding
 
-# Use sentence-transformers for embeddings instead of OpenAI
-from sentence_transformers import SentenceTransformer
-
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Embedding vectors are stored as contiguous little-endian float32
+VECTOR_DTYPE = np.dtype("<f4")
+FALLBACK_DIMENSION = 384
+
+def pack_vector(vector) -> bytes:
+    """Pack a vector into little-endian float32 bytes for Embedding.vector_data"""
+    return np.ascontiguousarray(vector, dtype=VECTOR_DTYPE).tobytes()
+
+def unpack_vector(data: bytes) -> np.ndarray:
+    """Zero-copy view of packed Embedding.vector_data (read-only)"""
+    return np.frombuffer(data, dtype=VECTOR_DTYPE)
+
+class EmbeddingUnavailableError(RuntimeError):
+    """Raised instead of storing placeholder vectors when the model cannot encode"""
+
 class EmbeddingService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, registry: Optional[ModelRegistry] = None, query_cache: Optional[QueryEmbeddingCache] = None):
         self.db = db
-        # Use a free, local embedding model
-        self.model_name = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
-        try:
-            # Try loading the model with fallback
-            logger.info(f"Loading sentence transformer model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
-            logger.info(f"Successfully loaded embedding model: {self.model_name}")
-        except Exception as e:
-            logger.warning(f"Failed to load embedding model {self.model_name}: {e}")
-            logger.info("Embedding service will run in simulation mode")
-            self.model = None
+        self.query_cache = query_cache or query_embedding_cache
+        # Use a free, local embedding model, shared across requests via the registry
+        self.registry = registry or model_registry
+        self.model_name = settings.LOCAL_EMBEDDING_MODEL
+        self.model = self.registry.get(self.model_name)
 
-    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings using sentence-transformers (free, local)."""
+    def _encode(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Run the model; None when it is unavailable or encoding fails."""
         if not self.model:
             logger.error("Embedding model not available")
-            return [[0.0] * 384 for _ in texts]  # Return dummy embeddings
-            
+            return None
+
         try:
             embeddings = self.model.encode(texts, convert_to_tensor=False)
-            return embeddings.tolist()
+            return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
         except Exception as e:
             logger.error(f"Embedding generation error: {e}")
-            return [[0.0] * 384 for _ in texts]  # Return dummy embeddings
+            return None
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Encode texts into a float32 matrix of shape (len(texts), dim)."""
+        vectors = self._encode(texts)
+        if vectors is None:
+            return np.zeros((len(texts), FALLBACK_DIMENSION), dtype=np.float32)  # Dummy embeddings
+        return vectors
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Encode search queries, serving repeats from the query embedding cache
+
+        Only cache misses (deduplicated) reach the model; fallback vectors are
+        never cached.
+        """
+        cached = [self.query_cache.get(self.model_name, query) for query in queries]
+        missing = {}
+        for query, vec in zip(queries, cached):
+            if vec is None:
+                missing.setdefault(normalize_query(query), query)
+        if missing:
+            vectors = self._encode(list(missing.values()))
+            if vectors is None:
+                return self.embed(queries)
+            fresh = dict(zip(missing, vectors))
+            for query, vec in zip(missing.values(), vectors):
+                self.query_cache.put(self.model_name, query, vec)
+            cached = [fresh[normalize_query(query)] if vec is None else vec for query, vec in zip(queries, cached)]
+        return np.vstack(cached) if cached else np.zeros((0, FALLBACK_DIMENSION), dtype=np.float32)
+
+    def embed_chunks(self, chunks: List[DocumentChunk], batch_size: int = 100) -> np.ndarray:
+        """
+        Embed chunks in batches and bulk-insert Embedding rows holding the packed vectors
+
+        Chunks may be ORM objects or any rows with id, document_id, chunk_index
+        and chunk_text. The caller owns the transaction; rows are inserted but
+        not committed, and nothing is sent to Pinecone: call sync_vectors()
+        once the transaction has committed. Returns the vectors in chunk order.
+
+        Raises EmbeddingUnavailableError rather than storing fallback vectors,
+        so the chunks stay unembedded and the backfill picks them up later.
+        """
+        if not chunks:
+            return np.zeros((0, FALLBACK_DIMENSION), dtype=np.float32)
+
+        batches = []
+        for i in range(0, len(chunks), batch_size):
+            batch = chunks[i : i + batch_size]
+            vectors = self._encode([c.chunk_text for c in batch])
+            if vectors is None:
+                raise EmbeddingUnavailableError(f"Could not embed {len(batch)} chunks with {self.model_name}")
+
+            rows = [
+                {
+                    "chunk_id": chunk.id,
+                    "pinecone_id": f"chunk-{chunk.id}",
+                    "vector_data": pack_vector(vec),
+                    "dimension": int(vec.shape[0]),
+                    "model_name": self.model_name,
+                    "status": "completed",
+                }
+                for chunk, vec in zip(batch, vectors)
+            ]
+            insert_embeddings(self.db, rows)
+            batches.append(vectors)
+
+        return np.vstack(batches)
+
+    def sync_vectors(self, chunks: List[DocumentChunk], vectors: np.ndarray) -> bool:
+        """
+        Upsert committed chunk vectors to Pinecone (a no-op when it is not configured)
+
+        Kept out of embed_chunks so retries and backoff never run while the
+        caller's transaction is open, and a rolled-back batch is never sent.
+        """
+        payload = [
+            {
+                "id": f"chunk-{chunk.id}",
+                "values": vec.tolist(),
+                "metadata": {
+                    "document_id": chunk.document_id,
+                    "chunk_index": chunk.chunk_index,
+                },
+            }
+            for chunk, vec in zip(chunks, vectors)
+        ]
+        return vector_sync.upsert(payload)
 
     # ---------- public API ----------
-    def generate_for_document(self, doc_id: int, batch_size: int = 100) -> int:
-        """Generate and store embeddings for all chunks of a document."""
-        chunks: List[DocumentChunk] = (
-            self.db.query(DocumentChunk)
-            .filter(DocumentChunk.document_id == doc_id)
+    def generate_for_document(self, doc_id: int, batch_size: int = 100, progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """
+        Generate and store embeddings for all not-yet-embedded chunks of a document.
+
+        `progress(done, total)` is called after each committed batch.
+        """
+        chunks = (
+            self.db.query(DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.chunk_index, DocumentChunk.chunk_text)
+            .outerjoin(Embedding, DocumentChunk.id == Embedding.chunk_id)
+            .filter(DocumentChunk.document_id == doc_id, Embedding.id.is_(None))
             .order_by(DocumentChunk.chunk_index)
             .all()
         )
         if not chunks:
-            logger.warning(f"No chunks found for document {doc_id}")
+            logger.warning(f"No chunks without embeddings found for document {doc_id}")
             return 0
 
+        chunk_index = get_chunk_index()
         total = 0
         for i in range(0, len(chunks), batch_size):
             batch = chunks[i : i + batch_size]
-            vectors = self._embed_batch([c.chunk_text for c in batch])
-
-            pine_payload = []
-            for chunk, vec in zip(batch, vectors):
-                pine_id = f"chunk-{chunk.id}"
-                pine_payload.append(
-                    {
-                        "id": pine_id,
-                        "values": vec,
-                        "metadata": {
-                            "document_id": chunk.document_id,
-                            "chunk_index": chunk.chunk_index,
-                        },
-                    }
-                )
-                # ORM row
-                emb = Embedding(
-                    chunk_id=chunk.id,
-                    pinecone_id=pine_id,
-                    model_name=MODEL,
-                    status="completed",
-                )
-                self.db.add(emb)
-
-            upsert_vectors(pine_payload)
+            vectors = self.embed_chunks(batch, batch_size=batch_size)
             self.db.commit()
+            self.sync_vectors(batch, vectors)
+            # Keep the local search index in step with what was just committed
+            if chunk_index.loaded:
+                chunk_index.refresh(self.db)
             total += len(batch)
-            logger.info(f"Upserted {len(batch)} vectors for doc {doc_id}")
+            logger.info(f"Stored {len(batch)} embeddings for doc {doc_id}")
+            if progress:
+                progress(total, len(chunks))
 
+        chunk_index.persist()
         return total
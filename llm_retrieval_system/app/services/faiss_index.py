@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import faiss
+import numpy as np
+
+from app.core.config import settings
+from app.services.id_watermark import IdWatermark
+from app.services.vector_index import BaseChunkIndex, normalize_rows
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "chunks.faiss"
+IDS_FILE = "chunks.ids.npz"
+META_FILE = "chunks.meta.json"
+
+# IVF needs a reasonable number of points per centroid before training is meaningful
+IVF_MIN_POINTS_PER_LIST = 39
+
+# HNSW cannot delete in place; rebuild once this share of the graph is tombstoned
+HNSW_COMPACT_RATIO = 0.25
+
+
+class FaissVectorIndex(BaseChunkIndex):
+    """
+    Persistent approximate nearest-neighbour index over chunk embeddings
+
+    Vector ids are DocumentChunk.id. Supports "flat" (exact), "ivf" and "hnsw"
+    index types; vectors are normalized so inner product equals cosine.
+    An IVF index is served as flat until enough vectors exist to train it.
+    """
+
+    def __init__(self, directory: str, index_type: Optional[str] = None):
+        super().__init__()
+        self.directory = Path(directory)
+        self.index_type = (index_type or settings.FAISS_INDEX_TYPE).lower()
+        if self.index_type not in ("flat", "ivf", "hnsw"):
+            raise ValueError(f"Unknown FAISS index type: {self.index_type}")
+        self._reset(dimension=None)
+
+    # ---------- construction ----------
+    def _reset(self, dimension: Optional[int]):
+        self.dimension = dimension
+        self._index = self._build(dimension, "hnsw" if self.index_type == "hnsw" else "flat") if dimension else None
+        self._trained_type = "hnsw" if self.index_type == "hnsw" else "flat"
+        self._chunk_docs: Dict[int, int] = {}
+        self._doc_chunks: Dict[int, Set[int]] = {}
+        self._tombstones: Set[int] = set()
+
+    def _build(self, dimension: int, kind: str, train_vectors: Optional[np.ndarray] = None):
+        if kind == "ivf":
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFFlat(quantizer, dimension, settings.FAISS_NLIST, faiss.METRIC_INNER_PRODUCT)
+            index.train(train_vectors)
+            # Keep the quantizer alive alongside the index
+            index.own_fields = True
+            quantizer.this.disown()
+            return index
+        if kind == "hnsw":
+            inner = faiss.IndexHNSWFlat(dimension, settings.FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            inner.hnsw.efSearch = settings.FAISS_HNSW_EF_SEARCH
+        else:
+            inner = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIDMap2(inner)
+        index.own_fields = True
+        inner.this.disown()
+        return index
+
+    def _all_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, vectors) for everything held by an IDMap-based index"""
+        ids = faiss.vector_to_array(self._index.id_map).astype(np.int64)
+        vectors = self._index.index.reconstruct_n(0, self._index.ntotal)
+        return ids, vectors
+
+    def _rebuild(self, kind: str):
+        """Rebuild the underlying index without tombstoned ids, optionally switching kind"""
+        ids, vectors = self._all_vectors()
+        if self._tombstones:
+            keep = ~np.isin(ids, np.fromiter(self._tombstones, dtype=np.int64))
+            ids, vectors = ids[keep], vectors[keep]
+            self._tombstones.clear()
+        self._index = self._build(self.dimension, kind, train_vectors=vectors if kind == "ivf" else None)
+        self._trained_type = kind
+        if len(ids):
+            self._index.add_with_ids(vectors, ids)
+        logger.info(f"Rebuilt FAISS {kind} index with {len(ids)} vectors")
+
+    def __len__(self) -> int:
+        if self._index is None:
+            return 0
+        return self._index.ntotal - len(self._tombstones)
+
+    # ---------- writes ----------
+    def add(self, chunk_ids: Iterable[int], document_ids: Iterable[int], vectors) -> int:
+        """Add (or replace) vectors for the given chunks"""
+        chunk_ids = np.asarray(list(chunk_ids), dtype=np.int64)
+        document_ids = np.asarray(list(document_ids), dtype=np.int64)
+        if chunk_ids.size == 0:
+            return 0
+        matrix = normalize_rows(vectors)
+
+        with self._lock:
+            if self.dimension is None:
+                self._reset(dimension=matrix.shape[1])
+            if matrix.shape[1] != self.dimension:
+                logger.warning(
+                    f"Skipping {len(chunk_ids)} vectors of dimension {matrix.shape[1]} "
+                    f"(index dimension is {self.dimension})"
+                )
+                return 0
+
+            self.remove_chunks(chunk_ids)
+            if self._tombstones.intersection(chunk_ids.tolist()):
+                # A tombstoned id is coming back; purge the old copy so the filter does not hide it
+                self._rebuild(self._trained_type)
+
+            self._index.add_with_ids(matrix, chunk_ids)
+            for chunk_id, document_id in zip(chunk_ids.tolist(), document_ids.tolist()):
+                self._chunk_docs[chunk_id] = document_id
+                self._doc_chunks.setdefault(document_id, set()).add(chunk_id)
+
+            if (
+                self.index_type == "ivf"
+                and self._trained_type == "flat"
+                and self._index.ntotal >= settings.FAISS_NLIST * IVF_MIN_POINTS_PER_LIST
+            ):
+                self._rebuild("ivf")
+            return len(chunk_ids)
+
+    def remove_chunks(self, chunk_ids: Iterable[int]) -> int:
+        """Drop the given chunks from the index"""
+        with self._lock:
+            present = [int(c) for c in chunk_ids if int(c) in self._chunk_docs]
+            if not present:
+                return 0
+
+            for chunk_id in present:
+                document_id = self._chunk_docs.pop(chunk_id)
+                siblings = self._doc_chunks.get(document_id)
+                if siblings is not None:
+                    siblings.discard(chunk_id)
+                    if not siblings:
+                        del self._doc_chunks[document_id]
+
+            if self._trained_type == "hnsw":
+                self._tombstones.update(present)
+                if len(self._tombstones) > HNSW_COMPACT_RATIO * self._index.ntotal:
+                    self._rebuild("hnsw")
+            else:
+                self._index.remove_ids(faiss.IDSelectorBatch(np.asarray(present, dtype=np.int64)))
+            return len(present)
+
+    def remove_document(self, document_id: int) -> int:
+        """Drop every chunk belonging to a document"""
+        with self._lock:
+            return self.remove_chunks(list(self._doc_chunks.get(document_id, ())))
+
+    # ---------- reads ----------
+    def _search_params(self, selector):
+        if self._trained_type == "ivf":
+            return faiss.SearchParametersIVF(sel=selector, nprobe=settings.FAISS_NPROBE)
+        if self._trained_type == "hnsw":
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=settings.FAISS_HNSW_EF_SEARCH)
+        return faiss.SearchParameters(sel=selector)
+
+    def search_batch(self, query_vectors, top_k: int = 10, document_ids: Optional[List[int]] = None) -> List[List[Tuple[int, int, float]]]:
+        """
+        Nearest chunks for several queries in one FAISS call
+
+        Returns one list of (chunk_id, document_id, cosine score) tuples per
+        query, best first.
+        """
+        queries = normalize_rows(query_vectors)
+        empty = [[] for _ in queries]
+        with self._lock:
+            if self._index is None or len(self) == 0:
+                return empty
+            if queries.shape[1] != self.dimension:
+                logger.warning(f"Query dimension {queries.shape[1]} does not match index dimension {self.dimension}")
+                return empty
+
+            selector = None
+            if document_ids:
+                allowed = set()
+                for document_id in document_ids:
+                    allowed.update(self._doc_chunks.get(document_id, ()))
+                if not allowed:
+                    return empty
+                selector = faiss.IDSelectorBatch(np.fromiter(allowed, dtype=np.int64))
+            elif self._tombstones:
+                selector = faiss.IDSelectorNot(
+                    faiss.IDSelectorBatch(np.fromiter(self._tombstones, dtype=np.int64))
+                )
+
+            k = min(top_k, len(self))
+            if selector is None:
+                scores, ids = self._index.search(queries, k)
+            else:
+                scores, ids = self._index.search(queries, k, params=self._search_params(selector))
+
+            return [
+                [
+                    (int(chunk_id), self._chunk_docs[int(chunk_id)], float(score))
+                    for chunk_id, score in zip(row_ids, row_scores)
+                    if chunk_id != -1 and int(chunk_id) in self._chunk_docs
+                ]
+                for row_ids, row_scores in zip(ids, scores)
+            ]
+
+    # ---------- persistence ----------
+    def persist(self):
+        """Atomically write the index and its id maps under the index directory"""
+        with self._lock:
+            if self._index is None:
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+            chunk_ids = np.fromiter(self._chunk_docs.keys(), dtype=np.int64, count=len(self._chunk_docs))
+            document_ids = np.fromiter(self._chunk_docs.values(), dtype=np.int64, count=len(self._chunk_docs))
+            tombstones = np.fromiter(self._tombstones, dtype=np.int64, count=len(self._tombstones))
+
+            faiss.write_index(self._index, str(self.directory / f"{INDEX_FILE}.tmp"))
+            with open(self.directory / f"{IDS_FILE}.tmp", "wb") as f:
+                np.savez(f, chunk_ids=chunk_ids, document_ids=document_ids, tombstones=tombstones)
+            with open(self.directory / f"{META_FILE}.tmp", "w") as f:
+                json.dump({
+                    "index_type": self.index_type,
+                    "trained_type": self._trained_type,
+                    "dimension": self.dimension,
+                    "last_embedding_id": self._embedding_mark.last_id,
+                    "embedding_gaps": self._embedding_mark.gaps,
+                    "last_deletion_id": self._deletion_mark.last_id,
+                    "deletion_gaps": self._deletion_mark.gaps,
+                }, f)
+
+            # Metadata goes last: a reader never sees a manifest newer than its index
+            os.replace(self.directory / f"{INDEX_FILE}.tmp", self.directory / INDEX_FILE)
+            os.replace(self.directory / f"{IDS_FILE}.tmp", self.directory / IDS_FILE)
+            os.replace(self.directory / f"{META_FILE}.tmp", self.directory / META_FILE)
+            logger.info(f"Persisted FAISS index with {len(self)} vectors to {self.directory}")
+
+    @classmethod
+    def open(cls, directory: str, index_type: Optional[str] = None) -> "FaissVectorIndex":
+        """Reload a persisted index, or return an empty one to be built from the database"""
+        instance = cls(directory, index_type)
+        meta_path = instance.directory / META_FILE
+        if not meta_path.exists():
+            return instance
+
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("index_type") != instance.index_type:
+                logger.info(f"Persisted FAISS index is {meta.get('index_type')}, rebuilding as {instance.index_type}")
+                return instance
+
+            index = faiss.read_index(str(instance.directory / INDEX_FILE))
+            with np.load(instance.directory / IDS_FILE) as ids:
+                chunk_ids, document_ids, tombstones = ids["chunk_ids"], ids["document_ids"], ids["tombstones"]
+        except Exception as e:
+            logger.warning(f"Could not reload FAISS index from {directory}, rebuilding: {e}")
+            return instance
+
+        with instance._lock:
+            instance._reset(dimension=meta["dimension"])
+            instance._index = index
+            instance._trained_type = meta["trained_type"]
+            # Gaps survive the restart, so a batch that commits late is still picked up
+            instance._embedding_mark = IdWatermark(meta["last_embedding_id"], meta.get("embedding_gaps"))
+            instance._deletion_mark = IdWatermark(meta.get("last_deletion_id", 0), meta.get("deletion_gaps"))
+            instance._tombstones = set(tombstones.tolist())
+            for chunk_id, document_id in zip(chunk_ids.tolist(), document_ids.tolist()):
+                instance._chunk_docs[chunk_id] = document_id
+                instance._doc_chunks.setdefault(document_id, set()).add(chunk_id)
+            # Rows embedded after this snapshot are picked up by refresh()
+            instance.loaded = True
+
+        logger.info(f"Reloaded FAISS {instance._trained_type} index with {len(instance)} vectors from {directory}")
+        return instance
@@ -0,0 +1,65 @@
+import time
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import or_
+
+# Skipped ids are re-read for this long: an ingest batch still open then
+# commits them late. Gaps older than this were rolled back or deleted.
+GAP_TIMEOUT_SECONDS = 600
+# Highest gaps kept; holes left by long-deleted rows are the oldest ids
+MAX_GAPS = 256
+
+
+def _uncovered(low: int, high: int, ids: List[int]) -> Iterator[Tuple[int, int]]:
+    """Sub-ranges of [low, high] holding none of the (sorted) ids"""
+    start = low
+    for i in ids[bisect_left(ids, low):bisect_right(ids, high)]:
+        if i > start:
+            yield start, i - 1
+        start = i + 1
+    if start <= high:
+        yield start, high
+
+
+class IdWatermark:
+    """
+    Sync position over an autoincrement id column that tolerates out-of-order commits
+
+    Ids are handed out at insert but become visible at commit, so a sync can
+    read id 120 while a slower transaction has yet to commit 101-119. Ids
+    skipped that way are kept as gaps and re-read by every sync until they
+    show up or time out.
+    """
+
+    def __init__(self, last_id: int = 0, gaps: Optional[Iterable] = None, timeout: float = GAP_TIMEOUT_SECONDS):
+        self.last_id = last_id
+        self.gaps: List[List] = [list(gap) for gap in gaps or []]  # [low, high, first seen (epoch seconds)]
+        self.timeout = timeout
+
+    def pending(self, column):
+        """SQL condition matching ids not read yet: above the mark or inside a gap"""
+        return or_(column > self.last_id, *(column.between(low, high) for low, high, _ in self.gaps))
+
+    def advance(self, ids: Iterable[int], now: Optional[float] = None):
+        """Record the ids a sync just read and drop gaps that timed out"""
+        now = time.time() if now is None else now
+        ids = sorted(set(ids))
+        gaps = [[low, high, seen] for old_low, old_high, seen in self.gaps for low, high in _uncovered(old_low, old_high, ids)]
+        if ids and ids[-1] > self.last_id:
+            gaps.extend([low, high, now] for low, high in _uncovered(self.last_id + 1, ids[-1], ids))
+            self.last_id = ids[-1]
+        gaps = [gap for gap in gaps if now - gap[2] < self.timeout]
+        self.gaps = sorted(gaps)[-MAX_GAPS:]
+
+    def merge(self, other: "IdWatermark") -> "IdWatermark":
+        """Position covering every id read by either mark"""
+        last_id = max(self.last_id, other.last_id)
+        # An id is still unread only if neither mark has read it
+        unread = [
+            (max(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]))
+            for a in self.gaps + [[self.last_id + 1, last_id, float("inf")]]
+            for b in other.gaps + [[other.last_id + 1, last_id, float("inf")]]
+            if max(a[0], b[0]) <= min(a[1], b[1])
+        ]
+        return IdWatermark(last_id, [gap for gap in unread if gap[2] != float("inf")], self.timeout)
@@ -0,0 +1,320 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Document, DocumentChunk, Embedding, IngestionJob
+from app.services.document_processor import DocumentProcessor
+from app.services.document_store import remove_blob
+
+logger = logging.getLogger(__name__)
+
+# Share of overall progress each stage accounts for. "ingest" streams
+# extract -> chunk -> embed in batches; "embed" only backfills vectors it missed.
+STAGE_WEIGHTS = {"ingest": 0.9, "embed": 0.05, "index": 0.05}
+STAGES = tuple(STAGE_WEIGHTS)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def job_to_dict(job: IngestionJob) -> Dict:
+    """API representation of a job"""
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": round(job.progress or 0.0, 3),
+        "document_id": job.document_id,
+        "filename": job.filename,
+        "content_hash": job.content_hash,
+        "chunks_created": job.chunks_created,
+        "embeddings_created": job.embeddings_created,
+        "timings": job.timings or {},
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class IngestionQueue:
+    """
+    Bounded worker pool streaming uploads through extract -> chunk -> embed -> index
+
+    Jobs live in the ingestion_jobs table. A worker claims a queued job with a
+    conditional update, so several app processes can share the table; jobs
+    left queued, or running with a stale heartbeat after a crash, are picked
+    up again by resume().
+    """
+
+    def __init__(
+        self,
+        processor: Optional[DocumentProcessor] = None,
+        max_workers: Optional[int] = None,
+        session_factory: Optional[Callable[[], Session]] = None,
+    ):
+        self.processor = processor
+        self.max_workers = max_workers or settings.INGESTION_WORKERS
+        self._session_factory = session_factory
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _session(self) -> Session:
+        if self._session_factory is None:
+            from app.core.database import get_session_local
+
+            return get_session_local()()
+        return self._session_factory()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingest")
+            return self._executor
+
+    # ---------- queue API ----------
+    def create_job(self, db: Session, file_path: str, filename: str, file_type: str, content_hash: Optional[str] = None) -> IngestionJob:
+        """Record a queued job for an uploaded file"""
+        job = IngestionJob(
+            filename=filename,
+            file_type=file_type,
+            file_path=str(file_path),
+            content_hash=content_hash,
+            status="queued",
+            stage="queued",
+            progress=0.0,
+            timings={},
+            attempts=0,
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def submit(self, job_id: int):
+        """Hand a queued job to the worker pool"""
+        self._pool().submit(self.run_job, job_id)
+
+    def resume(self) -> int:
+        """Requeue jobs orphaned by a restart and submit every queued job"""
+        db = self._session()
+        try:
+            stale_before = _now() - timedelta(seconds=settings.INGESTION_JOB_STALE_SECONDS)
+            requeued = (
+                db.query(IngestionJob)
+                .filter(
+                    IngestionJob.status == "running",
+                    or_(IngestionJob.heartbeat_at.is_(None), IngestionJob.heartbeat_at < stale_before),
+                )
+                .update({IngestionJob.status: "queued"}, synchronize_session=False)
+            )
+            db.commit()
+            if requeued:
+                logger.info(f"Requeued {requeued} interrupted ingestion jobs")
+
+            job_ids = [
+                row.id for row in db.query(IngestionJob.id)
+                .filter(IngestionJob.status == "queued")
+                .order_by(IngestionJob.id)
+                .all()
+            ]
+        finally:
+            db.close()
+
+        for job_id in job_ids:
+            self.submit(job_id)
+        return len(job_ids)
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting work; unfinished jobs are resumed on next startup"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+
+    # ---------- worker ----------
+    def _claim(self, db: Session, job_id: int) -> bool:
+        claimed = (
+            db.query(IngestionJob)
+            .filter(IngestionJob.id == job_id, IngestionJob.status == "queued")
+            .update({
+                IngestionJob.status: "running",
+                IngestionJob.started_at: _now(),
+                IngestionJob.heartbeat_at: _now(),
+                IngestionJob.error: None,
+                IngestionJob.attempts: IngestionJob.attempts + 1,
+            }, synchronize_session=False)
+        )
+        db.commit()
+        return claimed == 1
+
+    def _enter_stage(self, db: Session, job: IngestionJob, stage: str):
+        job.stage = stage
+        job.progress = sum(STAGE_WEIGHTS[s] for s in STAGES[:STAGES.index(stage)])
+        job.heartbeat_at = _now()
+        db.commit()
+
+    def _finish_stage(self, db: Session, job: IngestionJob, stage: str, started: float):
+        # Reassign so the JSON column is flagged as changed
+        job.timings = {**(job.timings or {}), stage: round(time.perf_counter() - started, 3)}
+        job.progress = sum(STAGE_WEIGHTS[s] for s in STAGES[:STAGES.index(stage) + 1])
+        job.heartbeat_at = _now()
+        db.commit()
+
+    def _discard_upload(self, db: Session, job: IngestionJob):
+        """Remove a failed job's file unless a document or another job still uses the same bytes"""
+        if job.content_hash:
+            in_use = (
+                db.query(Document.id).filter(Document.content_hash == job.content_hash).first()
+                or db.query(IngestionJob.id).filter(
+                    IngestionJob.content_hash == job.content_hash,
+                    IngestionJob.id != job.id,
+                    IngestionJob.status.in_(("queued", "running")),
+                ).first()
+            )
+            if not in_use:
+                remove_blob(job.content_hash)
+        elif Path(job.file_path).exists():
+            os.unlink(job.file_path)
+
+    @staticmethod
+    def _count_chunks(db: Session, document_id: int) -> Tuple[int, int]:
+        """(chunks, chunks with an embedding) stored for a document"""
+        chunks, embedded = (
+            db.query(func.count(DocumentChunk.id), func.count(Embedding.id))
+            .outerjoin(Embedding, Embedding.chunk_id == DocumentChunk.id)
+            .filter(DocumentChunk.document_id == document_id)
+            .one()
+        )
+        return chunks, embedded
+
+    def run_job(self, job_id: int) -> bool:
+        """Run (or resume) a job through the remaining stages; returns True on success"""
+        if self.processor is None:
+            self.processor = DocumentProcessor()
+        db = self._session()
+        try:
+            if not self._claim(db, job_id):
+                logger.info(f"Ingestion job {job_id} already claimed or finished")
+                return False
+            job = db.query(IngestionJob).filter(IngestionJob.id == job_id).one()
+            logger.info(f"Running ingestion job {job_id} for {job.filename} from stage {job.stage}")
+
+            try:
+                self._run_stages(db, job)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Ingestion job {job_id} failed in stage {job.stage}: {e}")
+                job.status = "failed"
+                job.error = str(e)
+                job.finished_at = _now()
+                db.commit()
+                if job.document_id is None:
+                    self._discard_upload(db, job)
+                return False
+
+            job.status = "completed"
+            job.stage = "done"
+            job.progress = 1.0
+            job.finished_at = _now()
+            db.commit()
+            logger.info(f"Ingestion job {job_id} completed: document {job.document_id}, timings {job.timings}")
+            return True
+        finally:
+            db.close()
+
+    def _run_stages(self, db: Session, job: IngestionJob):
+        processor = self.processor
+        resume_at = STAGES.index(job.stage) if job.stage in STAGES else 0
+
+        if job.document_id is None and job.content_hash:
+            # An identical upload may have finished while this one was queued
+            duplicate = (
+                db.query(Document.id)
+                .filter(Document.content_hash == job.content_hash)
+                .order_by(Document.id)
+                .first()
+            )
+            if duplicate is not None:
+                logger.info(f"Ingestion job {job.id} duplicates document {duplicate.id}, reusing it")
+                job.document_id = duplicate.id
+                job.chunks_created = 0
+                job.embeddings_created = 0
+                db.commit()
+                return
+
+        if resume_at <= STAGES.index("ingest"):
+            # Text is re-read from the start (from the extraction cache once one
+            # full pass succeeded); chunks an interrupted run stored are skipped
+            self._enter_stage(db, job, "ingest")
+            started = time.perf_counter()
+            read = [0.0]
+
+            def track(done: int, total: int):
+                read[0] = done / max(total, 1)
+
+            pieces = processor.stream_text(job.file_path, job.filename, job.file_type, content_hash=job.content_hash, progress=track)
+            if pieces is None:
+                raise ValueError(f"No text could be extracted from {job.filename}")
+            if job.document_id is None:
+                document = processor.create_document(db, job.filename, job.file_type, content_hash=job.content_hash)
+                job.document_id = document.id
+                db.commit()
+                processor.invalidate_previous_copies(db, document)
+            else:
+                document = db.get(Document, job.document_id)
+                if document is None:
+                    raise ValueError(f"Document {job.document_id} was deleted during ingestion")
+            previous_chunks = job.chunks_created or 0
+            previous_embeddings = job.embeddings_created or 0
+
+            def stored(chunks: int, embeddings: int):
+                job.chunks_created = previous_chunks + chunks
+                job.embeddings_created = previous_embeddings + embeddings
+                job.progress = STAGE_WEIGHTS["ingest"] * read[0]
+                job.heartbeat_at = _now()
+                db.commit()
+
+            processor.ingest(db, document, pieces, progress=stored)
+            # Counted afresh: a crash can lose the last progress update
+            job.chunks_created, job.embeddings_created = self._count_chunks(db, job.document_id)
+            self._finish_stage(db, job, "ingest", started)
+
+        if resume_at <= STAGES.index("embed") and (job.embeddings_created or 0) < (job.chunks_created or 0):
+            self._enter_stage(db, job, "embed")
+            started = time.perf_counter()
+            base = job.progress
+
+            def report(done: int, total: int):
+                job.progress = base + STAGE_WEIGHTS["embed"] * done / max(total, 1)
+                job.heartbeat_at = _now()
+                db.commit()
+
+            try:
+                job.embeddings_created = (job.embeddings_created or 0) + processor.embed(db, job.document_id, progress=report)
+            except Exception as e:
+                # Search backfills missing embeddings, so the document stays usable
+                db.rollback()
+                logger.error(f"Embedding failed for document {job.document_id}, search will backfill: {e}")
+                job.error = f"Embedding failed: {e}"
+            self._finish_stage(db, job, "embed", started)
+
+        self._enter_stage(db, job, "index")
+        started = time.perf_counter()
+        processor.index(db)
+        self._finish_stage(db, job, "index", started)
+
+
+# Shared queue for the whole process
+ingestion_queue = IngestionQueue()
@@ -1,6 +1,5 @@
-import os, logging
+import os, logging, threading
 from typing import List, Dict
-import google.generativeai as genai
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,8 +7,20 @@ logger = logging.getLogger(__name__)
 
 # Configure Gemini
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY and GEMINI_API_KEY != "your_gemini_api_key_here":
-    genai.configure(api_key=GEMINI_API_KEY)
+
+_genai = None
+_genai_lock = threading.Lock()
+
+def get_genai():
+    """google.generativeai, imported and configured on first use rather than at app import"""
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            import google.generativeai as genai
+            
+            genai.configure(api_key=GEMINI_API_KEY)
+            _genai = genai
+        return _genai
 
 class LLMService:
     def __init__(self):
@@ -26,7 +37,7 @@ class LLMService:
         if GEMINI_API_KEY and GEMINI_API_KEY != "your_gemini_api_key_here":
             for model_name in model_names:
                 try:
-                    self.model = genai.GenerativeModel(model_name)
+                    self.model = get_genai().GenerativeModel(model_name)
                     self.model_name = model_name
                     logger.info(f"Successfully initialized Gemini model: {self.model_name}")
                     break
@@ -93,5 +104,6 @@ Answer:"""
             return {
                 "answer": f"I encountered an error while processing your question: {str(e)}",
                 "model": self.model_name,
-                "tokens_used": 0
+                "tokens_used": 0,
+                "error": True
             }
\ No newline at end of file
@@ -0,0 +1,101 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Process-wide, thread-safe cache of SentenceTransformer models keyed by name"""
+
+    def __init__(self):
+        self._models: Dict[str, object] = {}
+        self._status: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._model_locks: Dict[str, threading.Lock] = {}
+
+    def _lock_for(self, model_name: str) -> threading.Lock:
+        with self._lock:
+            if model_name not in self._model_locks:
+                self._model_locks[model_name] = threading.Lock()
+            return self._model_locks[model_name]
+
+    def get(self, model_name: Optional[str] = None):
+        """
+        Return the loaded model, loading it on first use
+
+        Returns None if the model cannot be loaded (callers fall back to
+        simulation mode, as before).
+        """
+        model_name = model_name or settings.LOCAL_EMBEDDING_MODEL
+        if model_name in self._models:
+            return self._models[model_name]
+
+        # One loader per model name; concurrent callers wait for it instead of
+        # loading their own copy
+        with self._lock_for(model_name):
+            if model_name in self._models:
+                return self._models[model_name]
+            if self._status.get(model_name, {}).get("state") == "failed":
+                return None
+
+            self._status[model_name] = {"state": "loading", "warm": False}
+            started = time.perf_counter()
+            try:
+                from sentence_transformers import SentenceTransformer
+
+                logger.info(f"Loading sentence transformer model: {model_name}")
+                model = SentenceTransformer(model_name)
+            except Exception as e:
+                logger.warning(f"Failed to load embedding model {model_name}: {e}")
+                logger.info("Embedding service will run in simulation mode")
+                self._status[model_name] = {"state": "failed", "warm": False, "error": str(e)}
+                return None
+
+            self._models[model_name] = model
+            self._status[model_name] = {
+                "state": "loaded",
+                "warm": False,
+                "load_seconds": round(time.perf_counter() - started, 3),
+            }
+            logger.info(f"Successfully loaded embedding model: {model_name}")
+            return model
+
+    def warm_up(self, model_name: Optional[str] = None) -> bool:
+        """Load the model and run a dummy encode so the first request is not slow"""
+        model_name = model_name or settings.LOCAL_EMBEDDING_MODEL
+        model = self.get(model_name)
+        if model is None:
+            return False
+
+        try:
+            started = time.perf_counter()
+            model.encode(["warm-up"], convert_to_tensor=False)
+            self._status[model_name].update(
+                state="ready",
+                warm=True,
+                warmup_seconds=round(time.perf_counter() - started, 3),
+            )
+            logger.info(f"Embedding model {model_name} warmed up")
+            return True
+        except Exception as e:
+            logger.error(f"Warm-up encode failed for {model_name}: {e}")
+            # A model that cannot encode will not become ready on its own
+            self._status[model_name].update(state="failed", warm=False, error=str(e))
+            return False
+
+    def is_ready(self, model_name: Optional[str] = None) -> bool:
+        """True once the model has been loaded and warmed"""
+        model_name = model_name or settings.LOCAL_EMBEDDING_MODEL
+        return self._status.get(model_name, {}).get("warm", False)
+
+    def status(self) -> Dict[str, dict]:
+        """Snapshot of per-model load state for health reporting"""
+        return {name: dict(info) for name, info in self._status.items()}
+
+
+# Shared registry for the whole process
+model_registry = ModelRegistry()
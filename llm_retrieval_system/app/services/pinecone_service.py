@@ -1,6 +1,5 @@
-import os, logging
+import os, logging, threading
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -9,57 +8,79 @@ logger = logging.getLogger(__name__)
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "hackathon-document-index")
 DIM = int(os.getenv("EMBEDDING_DIMENSION", 1536))
+# Vectors are written to and queried from this namespace ("" is Pinecone's default)
+NAMESPACE = os.getenv("PINECONE_NAMESPACE", "")
 
-# Initialize Pinecone client only if API key is available
-pc = None
-index = None
+# The client is created on first use (or in the startup hook), never at import
+_index = None
+_initialized = False
+_init_lock = threading.Lock()
 
-if PINECONE_API_KEY and PINECONE_API_KEY != "your_pinecone_api_key_here":
-    try:
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-        
-        # Create index if it doesn't exist (Updated SDK syntax)
-        existing_indexes = [idx.name for idx in pc.list_indexes()]
-        if INDEX_NAME not in existing_indexes:
-            pc.create_index(
-                name=INDEX_NAME,
-                dimension=DIM,
-                metric="cosine",
-                spec=ServerlessSpec(
-                    cloud="aws",
-                    region="us-west-2"  # Best for India
-                )
-            )
-            logger.info(f"Created Pinecone index: {INDEX_NAME}")
-        
-        index = pc.Index(INDEX_NAME)
-        logger.info("Pinecone client initialized successfully")
-    except Exception as e:
-        logger.warning(f"Failed to initialize Pinecone: {e}")
-        logger.info("Pinecone functionality will be disabled")
-else:
-    logger.info("Pinecone API key not configured - Pinecone functionality disabled")
+def is_configured():
+    return bool(PINECONE_API_KEY) and PINECONE_API_KEY != "your_pinecone_api_key_here"
 
-def upsert_vectors(vectors):
-    """vectors = [{'id': 'chunk-1', 'values': [...], 'metadata': {...}}, ...]"""
-    if index is None:
-        logger.warning("Pinecone not initialized - cannot upsert vectors")
-        return False
-    
-    try:
-        index.upsert(vectors)
-        return True
-    except Exception as e:
-        logger.error(f"Failed to upsert vectors: {e}")
-        return False
+def get_index():
+    """The Pinecone index, connecting (and creating it if missing) on first call; None when disabled"""
+    global _index, _initialized
+    if _initialized:
+        return _index
+    with _init_lock:
+        if _initialized:
+            return _index
+        if not is_configured():
+            logger.info("Pinecone API key not configured - Pinecone functionality disabled")
+        else:
+            try:
+                from pinecone import Pinecone, ServerlessSpec
+                
+                pc = Pinecone(api_key=PINECONE_API_KEY)
+                
+                # Create index if it doesn't exist (Updated SDK syntax)
+                existing_indexes = [idx.name for idx in pc.list_indexes()]
+                if INDEX_NAME not in existing_indexes:
+                    pc.create_index(
+                        name=INDEX_NAME,
+                        dimension=DIM,
+                        metric="cosine",
+                        spec=ServerlessSpec(
+                            cloud="aws",
+                            region="us-west-2"  # Best for India
+                        )
+                    )
+                    logger.info(f"Created Pinecone index: {INDEX_NAME}")
+                
+                _index = pc.Index(INDEX_NAME)
+                logger.info("Pinecone client initialized successfully")
+            except Exception as e:
+                logger.warning(f"Failed to initialize Pinecone: {e}")
+                logger.info("Pinecone functionality will be disabled")
+        _initialized = True
+        return _index
+
+def document_filter(document_ids):
+    """Metadata filter restricting a query to the given documents, or None for all"""
+    if not document_ids:
+        return None
+    return {"document_id": {"$in": sorted({int(i) for i in document_ids})}}
+
+# Writes and deletes go through app.services.vector_sync (batched, retried)
 
-def query_vector(vector, top_k=10, metadata_filter=None):
+def query_vector(vector, top_k=10, metadata_filter=None, namespace=None):
+    """Nearest vectors; metadata_filter (see document_filter) is applied by Pinecone before ranking"""
+    index = get_index()
     if index is None:
         logger.warning("Pinecone not initialized - cannot query vectors")
         return {"matches": []}
     
     try:
-        return index.query(vector=vector, top_k=top_k, filter=metadata_filter or {}, include_metadata=True)
+        kwargs = {"filter": metadata_filter} if metadata_filter else {}
+        return index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=True,
+            namespace=NAMESPACE if namespace is None else namespace,
+            **kwargs
+        )
     except Exception as e:
         logger.error(f"Failed to query vectors: {e}")
         return {"matches": []}
@@ -0,0 +1,147 @@
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Cache key form of a query: NFKC, case-folded, whitespace collapsed"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded, thread-safe LRU cache of query vectors keyed by (model, normalized text)
+
+    An optional SQLite file acts as a second tier that survives restarts;
+    vectors found there are promoted back into memory.
+    """
+
+    def __init__(self, max_entries: int = 1024, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.disk_path = disk_path or None
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ---------- disk tier ----------
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Open the disk tier on first use (caller holds the lock)"""
+        if self._disk is None and self.disk_path:
+            try:
+                Path(self.disk_path).parent.mkdir(parents=True, exist_ok=True)
+                self._disk = sqlite3.connect(self.disk_path, check_same_thread=False)
+                self._disk.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    "model_name TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL, "
+                    "PRIMARY KEY (model_name, query))"
+                )
+                self._disk.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Query embedding disk cache disabled ({self.disk_path}): {e}")
+                self.disk_path = None
+                self._disk = None
+        return self._disk
+
+    def _read_disk(self, key: Tuple[str, str]) -> Optional[np.ndarray]:
+        disk = self._connection()
+        if disk is None:
+            return None
+        try:
+            row = disk.execute(
+                "SELECT vector FROM query_embeddings WHERE model_name = ? AND query = ?", key
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Query embedding disk cache read failed: {e}")
+            return None
+        return np.frombuffer(row[0], dtype="<f4") if row else None
+
+    def _write_disk(self, key: Tuple[str, str], vector: np.ndarray):
+        disk = self._connection()
+        if disk is None:
+            return
+        try:
+            disk.execute(
+                "INSERT OR REPLACE INTO query_embeddings (model_name, query, vector) VALUES (?, ?, ?)",
+                (*key, np.ascontiguousarray(vector, dtype="<f4").tobytes()),
+            )
+            disk.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Query embedding disk cache write failed: {e}")
+
+    # ---------- cache API ----------
+    def _remember(self, key: Tuple[str, str], vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, model_name: str, query: str) -> Optional[np.ndarray]:
+        """Cached vector for the query, or None (counted as a miss)"""
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            vector = self._read_disk(key)
+            if vector is not None:
+                self._remember(key, vector)
+                self.disk_hits += 1
+                return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, model_name: str, query: str, vector):
+        """Store a query vector in memory and, if configured, on disk"""
+        key = (model_name, normalize_query(query))
+        vector = np.array(vector, dtype=np.float32)
+        # Shared between callers, so hand out read-only arrays
+        vector.setflags(write=False)
+        with self._lock:
+            self._remember(key, vector)
+            self._write_disk(key, vector)
+
+    def clear(self):
+        """Drop the in-memory tier and reset the counters (the disk tier is kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "disk_path": self.disk_path,
+            }
+
+
+# Shared cache for the whole process
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=settings.QUERY_CACHE_SIZE,
+    disk_path=settings.QUERY_CACHE_PATH,
+)
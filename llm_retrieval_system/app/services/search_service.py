@@ -1,31 +1,55 @@
 import os, logging
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
 from app.services.embedding_service import EmbeddingService
-from app.services.pinecone_service import query_vector as search_pinecone  # Rename import
+from app.services.model_registry import ModelRegistry
+from app.services.vector_index import get_chunk_index
+from app.services.bm25_index import BM25Index, bm25_index
+from app.core.config import settings
+from app.services.pinecone_service import document_filter, query_vector as search_pinecone  # Rename import
 from app.models import DocumentChunk, Document, Embedding
 
 logger = logging.getLogger(__name__)
 
-def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
-    """Calculate cosine similarity between two vectors"""
-    vec1_np = np.array(vec1)
-    vec2_np = np.array(vec2)
-    
-    dot_product = np.dot(vec1_np, vec2_np)
-    norm1 = np.linalg.norm(vec1_np)
-    norm2 = np.linalg.norm(vec2_np)
+# Candidates taken from each retriever per requested result before fusion
+HYBRID_CANDIDATE_FACTOR = 4
+
+def fuse_rankings(dense: List[Tuple[int, int, float]], sparse: List[Tuple[int, int, float]]) -> List[Tuple[int, float, float, float]]:
+    """
+    Fuse dense (cosine) and BM25 rankings
+
+    Returns (chunk_id, fused score, semantic score, keyword score) tuples, best
+    first. "weighted" mixes cosine with max-normalized BM25; "rrf" sums
+    reciprocal ranks.
+    """
+    semantic = {chunk_id: score for chunk_id, _, score in dense}
+    keyword = {chunk_id: score for chunk_id, _, score in sparse}
     
-    if norm1 == 0 or norm2 == 0:
-        return 0.0
+    if settings.HYBRID_FUSION == "rrf":
+        k = settings.HYBRID_RRF_K
+        fused = {}
+        for ranking in (dense, sparse):
+            for rank, (chunk_id, _, _) in enumerate(ranking, start=1):
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    else:
+        weight = settings.HYBRID_KEYWORD_WEIGHT
+        max_keyword = max(keyword.values(), default=0.0) or 1.0
+        fused = {
+            chunk_id: (1 - weight) * semantic.get(chunk_id, 0.0) + weight * keyword.get(chunk_id, 0.0) / max_keyword
+            for chunk_id in semantic.keys() | keyword.keys()
+        }
     
-    return float(dot_product / (norm1 * norm2))
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return [
+        (chunk_id, score, semantic.get(chunk_id, 0.0), keyword.get(chunk_id, 0.0))
+        for chunk_id, score in ranked
+    ]
 
 class SearchService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, registry: Optional[ModelRegistry] = None):
         self.db = db
-        self.embedding_service = EmbeddingService(db)
+        self.embedding_service = EmbeddingService(db, registry=registry)
 
     def semantic_search(self, query: str, top_k: int = 10, document_ids: List[int] = None) -> List[Dict]:
         """
@@ -39,131 +63,209 @@ class SearchService:
         Returns:
             List of relevant chunks with metadata
         """
-        # Generate embedding for query
-        query_embedding = self.embedding_service._embed_batch([query])[0]  # Renamed variable
+        return self.batch_semantic_search([query], top_k=top_k, document_ids=document_ids)[0]
+
+    def batch_semantic_search(self, queries: List[str], top_k: int = 10, document_ids: List[int] = None) -> List[List[Dict]]:
+        """
+        Perform semantic search for several queries at once
         
-        # Search Pinecone
-        results = search_pinecone(query_embedding, top_k=top_k)  # Use renamed function
+        All queries are embedded in one call, the local indexes are synced once
+        and scored with a single query matrix, and the winning chunks of every
+        query are loaded in one database round trip.
         
-        # Handle both Pinecone object and dict format
-        if hasattr(results, 'matches'):
-            matches = results.matches
-        else:
-            matches = results.get('matches', [])
+        Args:
+            queries: Search query strings
+            top_k: Maximum number of results to return per query
+            document_ids: Optional list of document IDs to restrict search to
         
-        # If no Pinecone matches, fallback to semantic search using local embeddings
-        if not matches:
-            logger.info("No Pinecone matches found, using semantic search with local embeddings")
-            
-            # Build base query to get chunks with embeddings
-            base_query = (
-                self.db.query(DocumentChunk, Document, Embedding)
-                .join(Document, DocumentChunk.document_id == Document.id)
-                .outerjoin(Embedding, DocumentChunk.id == Embedding.chunk_id)
-            )
-            
-            # Apply document ID filter if provided
-            if document_ids:
-                base_query = base_query.filter(Document.id.in_(document_ids))
-                logger.info(f"Filtering search to documents: {document_ids}")
+        Returns:
+            One list of relevant chunks with metadata per query, in query order
+        """
+        if not queries:
+            return []
+        
+        # Generate embeddings for every query in one encode call (repeats come from the query cache)
+        query_embeddings = self.embedding_service.embed_queries(list(queries))
+        results: List[Optional[List[Dict]]] = [None] * len(queries)
+        
+        # Search Pinecone unless the local index is configured as the primary backend
+        if settings.VECTOR_BACKEND != "local":
+            # Filtered inside Pinecone, so top_k is spent only on the requested documents
+            metadata_filter = document_filter(document_ids)
+            matches_per_query = []
+            for query_embedding in query_embeddings:
+                pinecone_results = search_pinecone(query_embedding.tolist(), top_k=top_k, metadata_filter=metadata_filter)  # Use renamed function
+                
+                # Handle both Pinecone object and dict format
+                if hasattr(pinecone_results, 'matches'):
+                    matches_per_query.append(pinecone_results.matches)
+                else:
+                    matches_per_query.append(pinecone_results.get('matches', []))
+            results = self._enrich_pinecone_matches(matches_per_query)
+        
+        # Queries without Pinecone matches are answered from the local chunk index (NumPy or FAISS)
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            logger.info(f"No Pinecone matches found for {len(pending)} of {len(queries)} queries, using local hybrid search")
+            for i, query_results in zip(pending, self._local_hybrid_search(
+                [queries[i] for i in pending], query_embeddings[pending], top_k, document_ids
+            )):
+                results[i] = query_results
+        
+        # Only return demo content if NO documents exist in database
+        for i, query_results in enumerate(results):
+            if query_results is None:
+                logger.info("No documents found in database, returning demo content")
+                results[i] = self._demo_results(queries[i])
+        
+        return results
+
+    def _local_hybrid_search(self, queries: List[str], query_embeddings: np.ndarray, top_k: int, document_ids: Optional[List[int]]) -> List[Optional[List[Dict]]]:
+        """
+        Fused dense + BM25 search over the local indexes
+        
+        Returns one result list per query, or None where nothing matched.
+        """
+        chunk_index = self._sync_local_index()
+        keyword_index = self._sync_keyword_index()
+        
+        if document_ids:
+            logger.info(f"Filtering search to documents: {document_ids}")
+        
+        # Dense and BM25 candidates are fused; only the winners' text is loaded afterwards
+        candidate_count = top_k * HYBRID_CANDIDATE_FACTOR
+        dense_rankings = chunk_index.search_batch(query_embeddings, top_k=candidate_count, document_ids=document_ids)
+        winners_per_query = []
+        for query, dense in zip(queries, dense_rankings):
+            sparse = keyword_index.search(query, top_k=candidate_count, document_ids=document_ids)
+            winners_per_query.append(fuse_rankings(dense, sparse)[:top_k])
+        
+        rows = self._fetch_chunks(list({
+            chunk_id for winners in winners_per_query for chunk_id, _, _, _ in winners
+        }))
+        
+        results = []
+        for winners in winners_per_query:
+            if not winners:
+                results.append(None)
+                continue
             
-            # Get all chunks (we'll score them semantically)
-            db_chunks = base_query.all()
+            top_results = []
+            for chunk_id, final_score, semantic_score, keyword_score in winners:
+                row = rows.get(chunk_id)
+                if row is None:
+                    # Deleted since the index was last synced
+                    continue
+                top_results.append({
+                    **row,
+                    "score": float(final_score),
+                    "semantic_score": float(semantic_score),
+                    "keyword_score": float(keyword_score)
+                })
             
-            if db_chunks:
-                logger.info(f"Found {len(db_chunks)} chunks to score semantically")
-                
-                # Score chunks using semantic similarity with embeddings
-                scored_chunks = []
-                chunks_without_embeddings = 0
-                
-                for chunk, doc, embedding in db_chunks:
-                    # Try to get embedding vector from database
-                    chunk_embedding = None
-                    
-                    # If embedding exists in DB, try to use it
-                    if embedding and hasattr(embedding, 'vector_data') and embedding.vector_data:
-                        chunk_embedding = embedding.vector_data
+            top_scores = [f"{r['score']:.3f}" for r in top_results[:3]]
+            logger.info(f"Returning top {len(top_results)} results with scores: {top_scores} ({settings.HYBRID_FUSION} fusion)")
+            results.append(top_results)
+        
+        return results
+
+    def _demo_results(self, query: str) -> List[Dict]:
+        return [{
+            "chunk_id": 1,
+            "chunk_text": f"Sample document content related to: {query}. This is a demonstration of the RAG system working with Gemini AI. In a real scenario, this would be actual document content retrieved from the vector database.",
+            "document_id": 1,
+            "score": 0.8,
+            "document_filename": "demo_policy_document.pdf"
+        }]
+
+    def _enrich_pinecone_matches(self, matches_per_query) -> List[Optional[List[Dict]]]:
+        """
+        Attach chunk text and filename to the Pinecone matches of several queries
+        
+        Every matched chunk is loaded in one query; results keep match order.
+        Returns one list per query, or None where no match is still stored.
+        """
+        parsed = []
+        for matches in matches_per_query:
+            scored = []
+            for match in matches or []:
+                try:
+                    if isinstance(match, dict):
+                        match_id, score = match["id"], match["score"]
                     else:
-                        # Generate embedding on-the-fly for this chunk
-                        try:
-                            chunk_embedding = self.embedding_service._embed_batch([chunk.chunk_text])[0]
-                            chunks_without_embeddings += 1
-                        except Exception as e:
-                            logger.warning(f"Could not generate embedding for chunk {chunk.id}: {e}")
-                            continue
-                    
-                    # Calculate semantic similarity
-                    if chunk_embedding:
-                        similarity_score = cosine_similarity(query_embedding, chunk_embedding)
-                        
-                        # Also add keyword bonus for exact matches
-                        query_lower = query.lower()
-                        chunk_text_lower = chunk.chunk_text.lower()
-                        keyword_bonus = 0.0
-                        
-                        # Check for exact phrase match
-                        if query_lower in chunk_text_lower:
-                            keyword_bonus = 0.15
-                        else:
-                            # Check for individual important words (filter stopwords)
-                            stopwords = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'from', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'under'}
-                            query_words = [w for w in query_lower.split() if w not in stopwords and len(w) > 2]
-                            
-                            if query_words:
-                                word_matches = sum(1 for word in query_words if word in chunk_text_lower)
-                                keyword_bonus = (word_matches / len(query_words)) * 0.1
-                        
-                        final_score = similarity_score + keyword_bonus
-                        
-                        scored_chunks.append({
-                            "chunk_id": chunk.id,
-                            "chunk_text": chunk.chunk_text,
-                            "document_id": chunk.document_id,
-                            "score": float(final_score),
-                            "document_filename": doc.filename,
-                            "semantic_score": float(similarity_score),
-                            "keyword_bonus": float(keyword_bonus)
-                        })
-                
-                if chunks_without_embeddings > 0:
-                    logger.info(f"Generated {chunks_without_embeddings} embeddings on-the-fly")
-                
-                # Sort by final score (semantic + keyword bonus)
-                scored_chunks.sort(key=lambda x: x["score"], reverse=True)
-                
-                top_results = scored_chunks[:top_k]
-                logger.info(f"Returning top {len(top_results)} results with scores: {[f'{r['score']:.3f}' for r in top_results[:3]]}")
-                
-                return top_results
-            
-            # Only return demo content if NO documents exist in database
-            logger.info("No documents found in database, returning demo content")
-            return [{
-                "chunk_id": 1,
-                "chunk_text": f"Sample document content related to: {query}. This is a demonstration of the RAG system working with Gemini AI. In a real scenario, this would be actual document content retrieved from the vector database.",
-                "document_id": 1,
-                "score": 0.8,
-                "document_filename": "demo_policy_document.pdf"
-            }]
-        
-        # Enrich with database info (for when we have real indexed documents)
-        enriched_results = []
-        for match in matches:
-            try:
-                chunk_id = int(match.id.replace('chunk-', ''))
-                chunk = self.db.query(DocumentChunk).filter(DocumentChunk.id == chunk_id).first()
-                
-                if chunk:
-                    enriched_results.append({
-                        "chunk_id": chunk.id,
-                        "chunk_text": chunk.chunk_text,
-                        "document_id": chunk.document_id,
-                        "score": match.score,
-                        "document_filename": chunk.document.filename
-                    })
-            except (ValueError, AttributeError) as e:
-                logger.warning(f"Error processing match: {e}")
-                continue
+                        match_id, score = match.id, match.score
+                    scored.append((int(match_id.replace('chunk-', '')), float(score)))
+                except (KeyError, ValueError, AttributeError, TypeError) as e:
+                    logger.warning(f"Error processing match: {e}")
+            parsed.append(scored)
+        
+        rows = self._fetch_chunks(list({chunk_id for scored in parsed for chunk_id, _ in scored}))
         
-        return enriched_results
+        results = []
+        for scored in parsed:
+            # Chunks deleted since they were upserted are skipped
+            enriched = [{**rows[chunk_id], "score": score} for chunk_id, score in scored if chunk_id in rows]
+            results.append(enriched or None)
+        return results
+
+    def _sync_local_index(self):
+        """Load the chunk index on first use, pick up rows written elsewhere, and backfill old chunks"""
+        chunk_index = get_chunk_index()
+        first_load = not chunk_index.loaded
+        chunk_index.refresh(self.db)
+        if not first_load:
+            # Ingestion keeps the index current after the initial load
+            return chunk_index
+        
+        missing = (
+            self.db.query(DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.chunk_index, DocumentChunk.chunk_text)
+            .outerjoin(Embedding, DocumentChunk.id == Embedding.chunk_id)
+            .filter(Embedding.id.is_(None))
+            .all()
+        )
+        if missing:
+            try:
+                vectors = self.embedding_service.embed_chunks(missing)
+                self.db.commit()
+                self.embedding_service.sync_vectors(missing, vectors)
+                chunk_index.refresh(self.db)
+                logger.info(f"Backfilled {len(missing)} missing chunk embeddings")
+            except Exception as e:
+                self.db.rollback()
+                logger.warning(f"Could not backfill embeddings for {len(missing)} chunks: {e}")
+        return chunk_index
+
+    def _sync_keyword_index(self) -> BM25Index:
+        """Load the BM25 index on first use and pick up chunks written elsewhere"""
+        bm25_index.refresh(self.db)
+        return bm25_index
+
+    def _fetch_chunks(self, chunk_ids: List[int]) -> Dict[int, Dict]:
+        """Load text, span and filename for the given chunks in a single query"""
+        if not chunk_ids:
+            return {}
+        rows = (
+            self.db.query(
+                DocumentChunk.id,
+                DocumentChunk.chunk_text,
+                DocumentChunk.document_id,
+                DocumentChunk.start_char,
+                DocumentChunk.end_char,
+                Document.filename
+            )
+            .join(Document, DocumentChunk.document_id == Document.id)
+            .filter(DocumentChunk.id.in_(chunk_ids))
+            .all()
+        )
+        return {
+            row.id: {
+                "chunk_id": row.id,
+                "chunk_text": row.chunk_text,
+                "document_id": row.document_id,
+                "document_filename": row.filename,
+                # Citation: where the chunk sits in the document's extracted text
+                "start_char": row.start_char,
+                "end_char": row.end_char
+            }
+            for row in rows
+        }
@@ -1,14 +1,84 @@
+import codecs
 import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from multiprocessing import get_context
 from pathlib import Path
-from typing import Optional, List
-import PyPDF2
-from docx import Document as DocxDocument
+from typing import Callable, Iterator, Optional, List, Tuple
+
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Text files are streamed in blocks of this many characters
+TEXT_BLOCK_SIZE = 64 * 1024
+
+ProgressCallback = Callable[[int, int], None]
+
+_pdf_pool_lock = threading.Lock()
+_pdf_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _iter_page_range(file_path: str, start: int, end: int) -> Iterator[Tuple[int, str]]:
+    import PyPDF2  # Imported on first extraction, keeping app startup light
+    
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        for number in range(start, end):
+            page_text = reader.pages[number].extract_text()
+            if page_text:
+                yield number + 1, page_text
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) of a PDF; runs inside pool workers, so it opens the file itself"""
+    return list(_iter_page_range(file_path, start, end))
+
+
+def _text_file_encoding(file_path: str) -> str:
+    """utf-8 if the whole file decodes as UTF-8, else cp1252 (checked block by block)"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(TEXT_BLOCK_SIZE), b''):
+                decoder.decode(block)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return 'cp1252'
+    return 'utf-8'
+
+
+def _pdf_worker_count() -> int:
+    return settings.PDF_EXTRACTION_WORKERS or os.cpu_count() or 1
+
+
+def _pdf_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool shared by all extractions, created on first use"""
+    global _pdf_executor
+    with _pdf_pool_lock:
+        if _pdf_executor is None:
+            # spawn: forking a process that runs ingestion threads is not safe
+            _pdf_executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+        return _pdf_executor
+
+
+def shutdown_pdf_pool():
+    """Stop the PDF worker processes (a new pool is started on next use)"""
+    global _pdf_executor
+    with _pdf_pool_lock:
+        if _pdf_executor is not None:
+            _pdf_executor.shutdown(wait=False, cancel_futures=True)
+            _pdf_executor = None
+
+
 class TextExtractor:
     """Service for extracting text from various document formats"""
     
+    # Bump whenever extraction output changes so cached extractions are not reused
+    VERSION = "1"
+    
     @staticmethod
     def extract_text(file_path: str, file_type: str) -> Optional[str]:
         """
@@ -36,27 +106,126 @@ class TextExtractor:
             logger.error(f"Error extracting text from {file_path}: {e}")
             return None
     
+    @staticmethod
+    def iter_text(file_path: str, file_type: str, progress: Optional[ProgressCallback] = None) -> Iterator[str]:
+        """
+        Stream the text of a document piece by piece
+        
+        Pieces are PDF pages, DOCX paragraphs or blocks of a text file; joined
+        they give the same text as extract_text() (up to surrounding
+        whitespace), but only one piece needs to be in memory at a time.
+        `progress(done, total)` reports how much of the source has been read.
+        Unlike extract_text(), errors are raised.
+        
+        Args:
+            file_path: Path to the uploaded file
+            file_type: Type of file (pdf, docx, txt)
+            progress: Optional callback for pages, paragraphs or bytes read
+            
+        Returns:
+            Iterator over text pieces
+        """
+        file_type = file_type.lower()
+        if file_type == 'pdf':
+            for position, (_, page_text) in enumerate(TextExtractor.iter_pdf_pages(file_path, progress)):
+                yield page_text if position == 0 else "\n" + page_text
+        elif file_type in ['docx', 'doc']:
+            from docx import Document as DocxDocument
+            
+            paragraphs = DocxDocument(file_path).paragraphs
+            for done, paragraph in enumerate(paragraphs, start=1):
+                if paragraph.text:
+                    yield paragraph.text + "\n"
+                if progress:
+                    progress(done, len(paragraphs))
+        elif file_type == 'txt':
+            total = os.path.getsize(file_path)
+            with open(file_path, 'r', encoding=_text_file_encoding(file_path)) as file:
+                for block in iter(lambda: file.read(TEXT_BLOCK_SIZE), ''):
+                    yield block
+                    if progress:
+                        progress(file.buffer.tell(), total)
+        else:
+            raise ValueError(f"Unsupported file type: {file_type}")
+    
+    @staticmethod
+    def extract_pdf_pages(file_path: str) -> List[Tuple[int, str]]:
+        """Extract (page number, text) for every PDF page that has text, in order"""
+        return list(TextExtractor.iter_pdf_pages(file_path))
+    
+    @staticmethod
+    def iter_pdf_pages(file_path: str, progress: Optional[ProgressCallback] = None) -> Iterator[Tuple[int, str]]:
+        """
+        Yield (page number, text) for every PDF page that has text, in order
+        
+        Long PDFs are split into page ranges that worker processes extract in
+        parallel, each opening the file on its own. Only a few ranges are in
+        flight ahead of the consumer, so memory does not grow with page count.
+        """
+        import PyPDF2
+        
+        with open(file_path, 'rb') as file:
+            page_count = len(PyPDF2.PdfReader(file).pages)
+        
+        workers = _pdf_worker_count()
+        if workers < 2 or page_count < settings.PDF_PARALLEL_MIN_PAGES:
+            for page in _iter_page_range(file_path, 0, page_count):
+                yield page
+                if progress:
+                    progress(page[0], page_count)
+            return
+        
+        # A few ranges per worker evens out pages of very different density
+        range_size = max(1, -(-page_count // (workers * 4)))
+        ranges = iter([(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)])
+        in_flight = deque()
+        position = 0  # Pages before this one have been yielded
+        try:
+            pool = _pdf_pool(workers)
+            
+            def fill():
+                for start, end in ranges:
+                    in_flight.append((end, pool.submit(_extract_page_range, file_path, start, end)))
+                    if len(in_flight) >= workers * 2:
+                        break
+            
+            fill()
+            while in_flight:
+                end, future = in_flight.popleft()
+                pages = future.result()
+                fill()
+                yield from pages
+                position = end
+                if progress:
+                    progress(end, page_count)
+        except BrokenExecutor as e:
+            logger.warning(f"PDF worker pool unavailable, extracting {file_path} serially from page {position + 1}: {e}")
+            shutdown_pdf_pool()
+            for page in _iter_page_range(file_path, position, page_count):
+                yield page
+                if progress:
+                    progress(page[0], page_count)
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+    
     @staticmethod
     def _extract_from_pdf(file_path: str) -> str:
         """Extract text from PDF file"""
-        text = ""
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
+            pages = TextExtractor.extract_pdf_pages(file_path)
         except Exception as e:
             logger.error(f"Error reading PDF {file_path}: {e}")
             return ""
-        return text.strip()
+        return "\n".join(text for _, text in pages).strip()
     
     @staticmethod
     def _extract_from_docx(file_path: str) -> str:
         """Extract text from DOCX file"""
         text = ""
         try:
+            from docx import Document as DocxDocument
+            
             doc = DocxDocument(file_path)
             for paragraph in doc.paragraphs:
                 if paragraph.text:
@@ -0,0 +1,332 @@
+import logging
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import ChunkDeletion, DocumentChunk, Embedding
+from app.services.id_watermark import IdWatermark
+
+logger = logging.getLogger(__name__)
+
+_engine_lock = threading.Lock()
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Return float32 rows scaled to unit length (zero rows stay zero)"""
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without a full sort"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class BaseChunkIndex(ABC):
+    """
+    Database synchronisation shared by the local chunk index engines
+
+    Subclasses implement the abstract storage and search methods; vectors are
+    always cosine-scored.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.dimension: Optional[int] = None
+        self._embedding_mark = IdWatermark()
+        self._deletion_mark = IdWatermark()
+
+    @abstractmethod
+    def _reset(self, dimension: Optional[int]):
+        """Drop every vector; dimension None means the next add() decides it"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of vectors held"""
+
+    @abstractmethod
+    def add(self, chunk_ids: Iterable[int], document_ids: Iterable[int], vectors) -> int:
+        """Add or replace vectors for chunks; returns how many were added"""
+
+    @abstractmethod
+    def remove_chunks(self, chunk_ids: Iterable[int]) -> int:
+        """Drop the given chunks; returns how many were held"""
+
+    @abstractmethod
+    def remove_document(self, document_id: int) -> int:
+        """Drop every chunk of a document; returns how many were held"""
+
+    def persist(self):
+        """Write the index to disk (no-op for purely in-memory engines)"""
+
+    @abstractmethod
+    def search_batch(self, query_vectors, top_k: int = 10, document_ids: Optional[List[int]] = None) -> List[List[Tuple[int, int, float]]]:
+        """Per query row, (chunk_id, document_id, cosine score) tuples, best first"""
+
+    def search(self, query_vector, top_k: int = 10, document_ids: Optional[List[int]] = None) -> List[Tuple[int, int, float]]:
+        """
+        Nearest chunks to one query
+
+        Returns (chunk_id, document_id, cosine score) tuples, best first.
+        """
+        return self.search_batch(normalize_rows(query_vector), top_k, document_ids)[0]
+
+    # ---------- database sync ----------
+    def _load_rows(self, db: Session) -> int:
+        """Add embeddings not read yet, including ones an older transaction committed late"""
+        rows = (
+            db.query(Embedding.id, Embedding.chunk_id, DocumentChunk.document_id, Embedding.vector_data)
+            .join(DocumentChunk, DocumentChunk.id == Embedding.chunk_id)
+            .filter(self._embedding_mark.pending(Embedding.id), Embedding.vector_data.isnot(None))
+            .order_by(Embedding.id)
+            .all()
+        )
+        if not rows:
+            self._embedding_mark.advance([])
+            return 0
+
+        # Group by dimension so a stray row from another model does not poison the matrix
+        vectors = [np.frombuffer(row.vector_data, dtype="<f4") for row in rows]
+        dimension = self.dimension or vectors[0].shape[0]
+        keep = [i for i, vec in enumerate(vectors) if vec.shape[0] == dimension]
+        if len(keep) < len(rows):
+            logger.warning(f"Ignoring {len(rows) - len(keep)} stored vectors with a dimension other than {dimension}")
+
+        added = self.add(
+            [rows[i].chunk_id for i in keep],
+            [rows[i].document_id for i in keep],
+            np.vstack([vectors[i] for i in keep]) if keep else np.zeros((0, dimension), dtype=np.float32),
+        )
+        self._embedding_mark.advance(row.id for row in rows)
+        return added
+
+    def _apply_deletions(self, db: Session) -> int:
+        """Drop chunks deleted since the last sync, as recorded in the deletion log"""
+        rows = (
+            db.query(ChunkDeletion.id, ChunkDeletion.chunk_id)
+            .filter(self._deletion_mark.pending(ChunkDeletion.id))
+            .order_by(ChunkDeletion.id)
+            .all()
+        )
+        removed = self.remove_chunks([row.chunk_id for row in rows]) if rows else 0
+        self._deletion_mark.advance(row.id for row in rows)
+        if removed:
+            logger.info(f"Dropped {removed} chunks deleted elsewhere from the chunk vector index")
+        return removed
+
+    def load_from_db(self, db: Session) -> int:
+        """(Re)build the index from every stored embedding"""
+        with self._lock:
+            self._reset(dimension=None)
+            self._embedding_mark = IdWatermark()
+            # Read first, then replay: deletions logged while loading still apply
+            deletion_id = db.query(func.max(ChunkDeletion.id)).scalar() or 0
+            loaded = self._load_rows(db)
+            self._deletion_mark = IdWatermark(deletion_id)
+            self._apply_deletions(db)
+            self.loaded = True
+            logger.info(f"Chunk vector index loaded with {loaded} vectors")
+            self.persist()
+            return loaded
+
+    def refresh(self, db: Session) -> int:
+        """
+        Bring the index up to date with the embeddings table
+
+        Replays the chunk deletion log and picks up rows committed by other
+        workers since the last sync, re-reading ids skipped while their batch
+        was still open. Both are primary-key range reads, so a search never
+        scans the embeddings table. Returns the number of vectors added.
+        """
+        if not self.loaded:
+            return self.load_from_db(db)
+
+        with self._lock:
+            self._apply_deletions(db)
+            return self._load_rows(db)
+
+
+class ChunkVectorIndex(BaseChunkIndex):
+    """
+    Resident brute-force index over all chunk embeddings
+
+    Vectors are kept pre-normalized in one float32 matrix with parallel
+    chunk_id/document_id arrays, so a query is one matrix-vector product plus
+    an argpartition. Writers never mutate rows a reader may be looking at:
+    appends fill unused capacity and removals build new arrays.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        super().__init__()
+        self._initial_capacity = initial_capacity
+        self._reset(dimension=None)
+
+    def _reset(self, dimension: Optional[int]):
+        self.dimension = dimension
+        capacity = self._initial_capacity if dimension else 0
+        self._vectors = np.zeros((capacity, dimension or 0), dtype=np.float32)
+        self._chunk_ids = np.zeros(capacity, dtype=np.int64)
+        self._document_ids = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ---------- writes ----------
+    def add(self, chunk_ids: Iterable[int], document_ids: Iterable[int], vectors) -> int:
+        """Add (or replace) vectors for the given chunks"""
+        chunk_ids = np.asarray(list(chunk_ids), dtype=np.int64)
+        document_ids = np.asarray(list(document_ids), dtype=np.int64)
+        if chunk_ids.size == 0:
+            return 0
+        matrix = normalize_rows(vectors)
+
+        with self._lock:
+            if self.dimension is None:
+                self._reset(dimension=matrix.shape[1])
+            if matrix.shape[1] != self.dimension:
+                logger.warning(
+                    f"Skipping {len(chunk_ids)} vectors of dimension {matrix.shape[1]} "
+                    f"(index dimension is {self.dimension})"
+                )
+                return 0
+
+            self.remove_chunks(chunk_ids)
+
+            needed = self._size + len(chunk_ids)
+            if needed > self._vectors.shape[0]:
+                self._grow(needed)
+
+            end = self._size + len(chunk_ids)
+            self._vectors[self._size:end] = matrix
+            self._chunk_ids[self._size:end] = chunk_ids
+            self._document_ids[self._size:end] = document_ids
+            self._size = end
+            return len(chunk_ids)
+
+    def _grow(self, needed: int):
+        capacity = max(needed, 2 * self._vectors.shape[0], self._initial_capacity)
+        vectors = np.zeros((capacity, self.dimension), dtype=np.float32)
+        chunk_ids = np.zeros(capacity, dtype=np.int64)
+        document_ids = np.zeros(capacity, dtype=np.int64)
+        vectors[:self._size] = self._vectors[:self._size]
+        chunk_ids[:self._size] = self._chunk_ids[:self._size]
+        document_ids[:self._size] = self._document_ids[:self._size]
+        self._vectors, self._chunk_ids, self._document_ids = vectors, chunk_ids, document_ids
+
+    def _keep(self, keep: np.ndarray) -> int:
+        removed = int(self._size - keep.sum())
+        if removed:
+            # Copy survivors into fresh arrays so in-flight searches keep a consistent view
+            vectors = self._vectors[:self._size][keep]
+            chunk_ids = self._chunk_ids[:self._size][keep]
+            document_ids = self._document_ids[:self._size][keep]
+            self._size = len(chunk_ids)
+            self._vectors, self._chunk_ids, self._document_ids = vectors, chunk_ids, document_ids
+            if self._vectors.shape[0] < self._initial_capacity:
+                self._grow(self._initial_capacity)
+        return removed
+
+    def remove_chunks(self, chunk_ids: Iterable[int]) -> int:
+        """Drop the given chunks from the index"""
+        chunk_ids = np.asarray(list(chunk_ids), dtype=np.int64)
+        with self._lock:
+            if self._size == 0 or chunk_ids.size == 0:
+                return 0
+            return self._keep(~np.isin(self._chunk_ids[:self._size], chunk_ids))
+
+    def remove_document(self, document_id: int) -> int:
+        """Drop every chunk belonging to a document"""
+        with self._lock:
+            if self._size == 0:
+                return 0
+            return self._keep(self._document_ids[:self._size] != document_id)
+
+    # ---------- reads ----------
+    def search_batch(self, query_vectors, top_k: int = 10, document_ids: Optional[List[int]] = None) -> List[List[Tuple[int, int, float]]]:
+        """
+        Score every indexed chunk against several queries with one matrix product
+
+        Returns one list of (chunk_id, document_id, cosine score) tuples per
+        query, best first.
+        """
+        queries = normalize_rows(query_vectors)
+        with self._lock:
+            size = self._size
+            vectors = self._vectors
+            chunk_ids = self._chunk_ids
+            doc_ids = self._document_ids
+        if size == 0:
+            return [[] for _ in queries]
+
+        if queries.shape[1] != vectors.shape[1]:
+            logger.warning(f"Query dimension {queries.shape[1]} does not match index dimension {vectors.shape[1]}")
+            return [[] for _ in queries]
+
+        if document_ids:
+            rows = np.flatnonzero(np.isin(doc_ids[:size], np.asarray(document_ids, dtype=np.int64)))
+            scores = queries @ vectors[rows].T
+        else:
+            rows = np.arange(size)
+            scores = queries @ vectors[:size].T
+
+        results = []
+        for query_scores in scores:
+            best = top_k_indices(query_scores, top_k)
+            results.append([
+                (int(chunk_ids[rows[i]]), int(doc_ids[rows[i]]), float(query_scores[i]))
+                for i in best
+            ])
+        return results
+
+
+# Shared index for the whole process
+chunk_index = ChunkVectorIndex()
+_engine_index: Optional[BaseChunkIndex] = None
+_engine_unavailable = False
+
+
+def _open_engine(engine: str) -> BaseChunkIndex:
+    if engine == "faiss":
+        from app.services.faiss_index import FaissVectorIndex
+
+        return FaissVectorIndex.open(settings.FAISS_INDEX_PATH)
+    if engine == "mmap":
+        from app.services.vector_segments import MmapVectorIndex
+
+        return MmapVectorIndex.open(str(Path(settings.FAISS_INDEX_PATH) / "segments"))
+    raise ValueError(f"Unknown local index engine: {engine}")
+
+
+def get_chunk_index() -> BaseChunkIndex:
+    """Return the process-wide local index for the configured engine"""
+    global _engine_index, _engine_unavailable
+    if settings.LOCAL_INDEX_ENGINE == "numpy" or _engine_unavailable:
+        return chunk_index
+
+    if _engine_index is None:
+        with _engine_lock:
+            if _engine_index is None and not _engine_unavailable:
+                try:
+                    _engine_index = _open_engine(settings.LOCAL_INDEX_ENGINE)
+                except (ImportError, ValueError) as e:
+                    logger.warning(f"Local index engine {settings.LOCAL_INDEX_ENGINE} unavailable, using the NumPy chunk index instead: {e}")
+                    _engine_unavailable = True
+                    return chunk_index
+    return _engine_index
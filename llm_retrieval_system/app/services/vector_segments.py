@@ -0,0 +1,442 @@
+"""
+Append-only, memory-mapped embedding segments
+
+Layout under <FAISS_INDEX_PATH>/segments:
+
+    manifest.json         segment list, dimension, tombstones, last synced embedding id
+    seg-000001.f32        raw little-endian float32 rows (pre-normalized)
+    seg-000001.ids.npy    int64 array of (chunk_id, document_id) per row
+
+Segments are opened with np.memmap, so every worker on the host shares the
+same page cache and boots without copying vectors. Deletions are recorded as
+tombstones; `python -m app.services.vector_segments compact` rewrites the live
+rows into a single segment.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.id_watermark import IdWatermark
+from app.services.vector_index import BaseChunkIndex, normalize_rows, top_k_indices
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "manifest.lock"
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+class SegmentStore:
+    """On-disk segment files plus the manifest that ties them together"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread_lock = threading.RLock()
+
+    # ---------- manifest ----------
+    @contextmanager
+    def locked(self):
+        """Exclusive lock across threads and (where supported) worker processes"""
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.directory / LOCK_FILE, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def manifest_mtime(self) -> float:
+        try:
+            return (self.directory / MANIFEST_FILE).stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def read_manifest(self) -> Optional[dict]:
+        try:
+            with open(self.directory / MANIFEST_FILE) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write_manifest(self, manifest: dict):
+        manifest["version"] = manifest.get("version", 0) + 1
+        tmp_path = self.directory / f"{MANIFEST_FILE}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.directory / MANIFEST_FILE)
+
+    @staticmethod
+    def empty_manifest(dimension: Optional[int]) -> dict:
+        return {
+            "version": 0,
+            "dimension": dimension,
+            "next_segment": 1,
+            "segments": [],
+            "tombstones": {},
+            "last_embedding_id": 0,
+            "embedding_gaps": [],
+            "last_deletion_id": 0,
+            "deletion_gaps": [],
+        }
+
+    # ---------- segment files ----------
+    def _vector_path(self, name: str) -> Path:
+        return self.directory / f"{name}.f32"
+
+    def _ids_path(self, name: str) -> Path:
+        return self.directory / f"{name}.ids.npy"
+
+    def write_segment(self, manifest: dict, chunk_ids: np.ndarray, document_ids: np.ndarray, vectors: np.ndarray) -> dict:
+        """Write a new immutable segment and register it in the (caller-locked) manifest"""
+        seq = manifest["next_segment"]
+        name = f"seg-{seq:06d}"
+
+        with open(self._vector_path(name), "wb") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        np.save(self._ids_path(name), np.stack([chunk_ids, document_ids], axis=1).astype(np.int64))
+
+        segment = {"name": name, "seq": seq, "rows": int(len(chunk_ids))}
+        manifest["segments"].append(segment)
+        manifest["next_segment"] = seq + 1
+        return segment
+
+    def open_segment(self, segment: dict, dimension: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Map a segment read-only; no vector bytes are copied"""
+        vectors = np.memmap(self._vector_path(segment["name"]), dtype=VECTOR_DTYPE, mode="r", shape=(segment["rows"], dimension))
+        ids = np.load(self._ids_path(segment["name"]), mmap_mode="r")
+        return vectors, ids
+
+    def delete_segment_files(self, segment: dict):
+        # Workers that still map the old files keep their view until they reload
+        for path in (self._vector_path(segment["name"]), self._ids_path(segment["name"])):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _Segment:
+    """A mapped segment plus its live-row mask"""
+
+    def __init__(self, meta: dict, vectors: np.ndarray, ids: np.ndarray):
+        self.meta = meta
+        self.vectors = vectors
+        self.chunk_ids = ids[:, 0]
+        self.document_ids = ids[:, 1]
+        self.live = np.ones(meta["rows"], dtype=bool)
+
+
+class MmapVectorIndex(BaseChunkIndex):
+    """
+    Chunk index served straight from memory-mapped segment files
+
+    Writes go through the manifest lock so any worker can append; readers
+    notice a newer manifest by its mtime and map just the new segments.
+    A tombstone {chunk_id: seq} hides that chunk in segments up to seq, so a
+    chunk re-added in a later segment stays visible.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.store = SegmentStore(directory)
+        self._segments: Dict[str, _Segment] = {}
+        self._manifest = SegmentStore.empty_manifest(None)
+        self._manifest_mtime = -1
+        self._live_rows = 0
+
+    @classmethod
+    def open(cls, directory: str) -> "MmapVectorIndex":
+        """Map an existing segment store, or return an empty one to be built from the database"""
+        instance = cls(directory)
+        instance.reload_if_changed()
+        if instance._manifest["segments"] or instance._manifest["last_embedding_id"]:
+            # Rows embedded after the last append are picked up by refresh()
+            instance.loaded = True
+            logger.info(f"Mapped {len(instance._segments)} embedding segments ({len(instance)} live vectors) from {directory}")
+        return instance
+
+    def __len__(self) -> int:
+        return self._live_rows
+
+    # ---------- manifest sync ----------
+    def reload_if_changed(self, force: bool = False):
+        """Re-read the manifest if another worker (or we) changed it"""
+        mtime = self.store.manifest_mtime()
+        if not force and mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            manifest = self.store.read_manifest() or SegmentStore.empty_manifest(None)
+            self._apply_manifest(manifest)
+            self._manifest_mtime = mtime
+
+    def _apply_manifest(self, manifest: dict):
+        dimension = manifest["dimension"]
+        segments = {}
+        for meta in manifest["segments"]:
+            segment = self._segments.get(meta["name"])
+            if segment is None:
+                segment = _Segment(meta, *self.store.open_segment(meta, dimension))
+            segments[meta["name"]] = segment
+
+        tombstones = {int(k): v for k, v in manifest["tombstones"].items()}
+        live_rows = 0
+        if tombstones:
+            tomb_ids = np.fromiter(tombstones.keys(), dtype=np.int64, count=len(tombstones))
+            tomb_seqs = np.fromiter(tombstones.values(), dtype=np.int64, count=len(tombstones))
+            order = np.argsort(tomb_ids)
+            tomb_ids, tomb_seqs = tomb_ids[order], tomb_seqs[order]
+        for segment in segments.values():
+            segment.live = np.ones(segment.meta["rows"], dtype=bool)
+            if tombstones:
+                pos = np.searchsorted(tomb_ids, segment.chunk_ids)
+                pos = np.minimum(pos, len(tomb_ids) - 1)
+                hit = tomb_ids[pos] == segment.chunk_ids
+                segment.live[hit & (tomb_seqs[pos] >= segment.meta["seq"])] = False
+            live_rows += int(segment.live.sum())
+
+        self._segments = segments
+        self._manifest = manifest
+        self.dimension = dimension
+        self._embedding_mark = IdWatermark(manifest["last_embedding_id"], manifest.get("embedding_gaps"))
+        self._deletion_mark = IdWatermark(manifest.get("last_deletion_id", 0), manifest.get("deletion_gaps"))
+        self._live_rows = live_rows
+
+    @contextmanager
+    def _edit_manifest(self):
+        """Lock, load the latest manifest, let the caller change it, then publish"""
+        with self._lock, self.store.locked():
+            manifest = self.store.read_manifest() or SegmentStore.empty_manifest(self.dimension)
+            self._apply_manifest(manifest)
+            yield manifest
+            self.store.write_manifest(manifest)
+            self._apply_manifest(manifest)
+            self._manifest_mtime = self.store.manifest_mtime()
+
+    # ---------- writes ----------
+    def _reset(self, dimension: Optional[int]):
+        with self._lock, self.store.locked():
+            old = self.store.read_manifest()
+            manifest = SegmentStore.empty_manifest(dimension)
+            if old:
+                manifest["next_segment"] = old["next_segment"]
+                manifest["version"] = old["version"]
+            self.store.write_manifest(manifest)
+            self._apply_manifest(manifest)
+            self._manifest_mtime = self.store.manifest_mtime()
+            for segment in (old or {}).get("segments", []):
+                self.store.delete_segment_files(segment)
+
+    def add(self, chunk_ids: Iterable[int], document_ids: Iterable[int], vectors) -> int:
+        """Append the chunks as a new segment; older copies of the same chunks are tombstoned"""
+        chunk_ids = np.asarray(list(chunk_ids), dtype=np.int64)
+        document_ids = np.asarray(list(document_ids), dtype=np.int64)
+        if chunk_ids.size == 0:
+            return 0
+        matrix = normalize_rows(vectors)
+
+        with self._edit_manifest() as manifest:
+            if manifest["dimension"] is None:
+                manifest["dimension"] = matrix.shape[1]
+            if matrix.shape[1] != manifest["dimension"]:
+                logger.warning(
+                    f"Skipping {len(chunk_ids)} vectors of dimension {matrix.shape[1]} "
+                    f"(index dimension is {manifest['dimension']})"
+                )
+                return 0
+
+            # Hide older copies of re-added chunks
+            replaced = self._live_chunks(lambda s: np.isin(s.chunk_ids, chunk_ids))
+            segment = self.store.write_segment(manifest, chunk_ids, document_ids, matrix)
+            for chunk_id in replaced:
+                manifest["tombstones"][str(chunk_id)] = segment["seq"] - 1
+
+        self._maybe_compact()
+        return len(chunk_ids)
+
+    def _maybe_compact(self):
+        total_rows = sum(segment.meta["rows"] for segment in self._segments.values())
+        if (
+            len(self._segments) > settings.VECTOR_SEGMENT_MAX_COUNT
+            or total_rows - len(self) > settings.VECTOR_SEGMENT_MAX_DEAD_RATIO * max(total_rows, 1)
+        ):
+            self.compact()
+
+    def _tombstone(self, chunk_ids: List[int]) -> int:
+        if not chunk_ids:
+            return 0
+        with self._edit_manifest() as manifest:
+            seq = manifest["next_segment"] - 1
+            for chunk_id in chunk_ids:
+                manifest["tombstones"][str(chunk_id)] = seq
+        self._maybe_compact()
+        return len(chunk_ids)
+
+    def _live_chunks(self, predicate) -> List[int]:
+        found = []
+        for segment in self._segments.values():
+            rows = np.flatnonzero(segment.live & predicate(segment))
+            found.extend(segment.chunk_ids[rows].tolist())
+        return found
+
+    def remove_chunks(self, chunk_ids: Iterable[int]) -> int:
+        """Tombstone the given chunks"""
+        wanted = np.asarray(list(chunk_ids), dtype=np.int64)
+        self.reload_if_changed()
+        with self._lock:
+            present = self._live_chunks(lambda s: np.isin(s.chunk_ids, wanted))
+        return self._tombstone(sorted(set(present)))
+
+    def remove_document(self, document_id: int) -> int:
+        """Tombstone every chunk belonging to a document"""
+        self.reload_if_changed()
+        with self._lock:
+            present = self._live_chunks(lambda s: s.document_ids == document_id)
+        return self._tombstone(sorted(set(present)))
+
+    def compact(self) -> int:
+        """Rewrite all live rows into one segment and drop tombstones"""
+        with self._edit_manifest() as manifest:
+            old_segments = list(manifest["segments"])
+            parts = [
+                (segment.chunk_ids[segment.live], segment.document_ids[segment.live], segment.vectors[segment.live])
+                for segment in self._segments.values()
+                if segment.live.any()
+            ]
+            manifest["segments"] = []
+            manifest["tombstones"] = {}
+            if parts:
+                self.store.write_segment(
+                    manifest,
+                    np.concatenate([p[0] for p in parts]),
+                    np.concatenate([p[1] for p in parts]),
+                    np.vstack([p[2] for p in parts]),
+                )
+        for segment in old_segments:
+            self.store.delete_segment_files(segment)
+        logger.info(f"Compacted {len(old_segments)} embedding segments into {len(self._segments)} ({len(self)} live vectors)")
+        return len(self)
+
+    # ---------- reads ----------
+    def search_batch(self, query_vectors, top_k: int = 10, document_ids: Optional[List[int]] = None) -> List[List[Tuple[int, int, float]]]:
+        """
+        Score every live row of every segment against several queries
+
+        Returns one list of (chunk_id, document_id, cosine score) tuples per
+        query, best first.
+        """
+        self.reload_if_changed()
+        queries = normalize_rows(query_vectors)
+        with self._lock:
+            segments = list(self._segments.values())
+            dimension = self.dimension
+        candidates = [[] for _ in queries]
+        if not segments:
+            return candidates
+
+        if queries.shape[1] != dimension:
+            logger.warning(f"Query dimension {queries.shape[1]} does not match index dimension {dimension}")
+            return candidates
+
+        wanted = np.asarray(document_ids, dtype=np.int64) if document_ids else None
+        for segment in segments:
+            mask = segment.live
+            if wanted is not None:
+                mask = mask & np.isin(segment.document_ids, wanted)
+            rows = np.flatnonzero(mask)
+            if rows.size == 0:
+                continue
+            vectors = segment.vectors if rows.size == segment.meta["rows"] else segment.vectors[rows]
+            scores = queries @ vectors.T
+            for query_candidates, query_scores in zip(candidates, scores):
+                for i in top_k_indices(query_scores, top_k):
+                    row = rows[i]
+                    query_candidates.append((int(segment.chunk_ids[row]), int(segment.document_ids[row]), float(query_scores[i])))
+
+        for query_candidates in candidates:
+            query_candidates.sort(key=lambda c: c[2], reverse=True)
+            del query_candidates[top_k:]
+        return candidates
+
+    # ---------- database sync ----------
+    @staticmethod
+    def _merge_sync_position(manifest: dict, embedding_mark: IdWatermark, deletion_mark: IdWatermark) -> dict:
+        """Manifest sync fields covering what the manifest and the given marks have read"""
+        embeddings = IdWatermark(manifest["last_embedding_id"], manifest.get("embedding_gaps")).merge(embedding_mark)
+        deletions = IdWatermark(manifest.get("last_deletion_id", 0), manifest.get("deletion_gaps")).merge(deletion_mark)
+        return {
+            "last_embedding_id": embeddings.last_id,
+            "embedding_gaps": embeddings.gaps,
+            "last_deletion_id": deletions.last_id,
+            "deletion_gaps": deletions.gaps,
+        }
+
+    def _publish_sync_position(self):
+        """Share the sync position, gaps included, with every worker mapping this store"""
+        embedding_mark, deletion_mark = self._embedding_mark, self._deletion_mark
+        merged = self._merge_sync_position(self._manifest, embedding_mark, deletion_mark)
+        if all(self._manifest.get(key) == value for key, value in merged.items()):
+            return
+        with self._edit_manifest() as manifest:
+            # Editing reloads the marks from disk, so merge the ones captured above
+            manifest.update(self._merge_sync_position(manifest, embedding_mark, deletion_mark))
+
+    def _load_rows(self, db: Session) -> int:
+        added = super()._load_rows(db)
+        self._publish_sync_position()
+        return added
+
+    def _apply_deletions(self, db: Session) -> int:
+        removed = super()._apply_deletions(db)
+        self._publish_sync_position()
+        return removed
+
+    def refresh(self, db: Session) -> int:
+        self.reload_if_changed()
+        return super().refresh(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or compact memory-mapped embedding segments")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("--path", default=str(Path(settings.FAISS_INDEX_PATH) / "segments"))
+    args = parser.parse_args()
+
+    index = MmapVectorIndex.open(args.path)
+    if args.command == "compact":
+        index.compact()
+    print(json.dumps({
+        "path": args.path,
+        "segments": len(index._segments),
+        "live_vectors": len(index),
+        "tombstones": len(index._manifest["tombstones"]),
+        "dimension": index.dimension,
+        "last_embedding_id": index._embedding_mark.last_id,
+        "embedding_gaps": len(index._embedding_mark.gaps),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,208 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+import backoff
+
+from app.core.config import settings
+from app.services import pinecone_service
+
+logger = logging.getLogger(__name__)
+
+# Pinecone rejects upsert requests over 2 MB and deletes of more than 1000 ids
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+MAX_DELETE_IDS = 1000
+# JSON size allowance per vector value (sign, digits, exponent, separator)
+BYTES_PER_VALUE = 12
+# Per-batch records kept for stats()
+RECENT_BATCHES = 500
+# Client errors worth retrying: request timeout and rate limiting
+RETRYABLE_STATUSES = {408, 429}
+
+
+def _vector_bytes(vector: Dict) -> int:
+    """Rough request size of one vector; errs high so batches stay under the limit"""
+    return (
+        len(vector["values"]) * BYTES_PER_VALUE
+        + len(vector["id"])
+        + len(json.dumps(vector.get("metadata") or {}))
+        + 32
+    )
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """
+    True for errors a retry cannot fix: 4xx responses other than 408/429 (bad
+    dimension, auth, missing index) and requests rejected before sending
+
+    Pinecone client versions name the HTTP status `status_code` or `status`.
+    """
+    if isinstance(error, (ValueError, TypeError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in RETRYABLE_STATUSES
+
+
+def upsert_batches(vectors: Sequence[Dict], max_vectors: int, max_bytes: int = MAX_REQUEST_BYTES) -> List[List[Dict]]:
+    """Split vectors into batches of at most max_vectors and about max_bytes each"""
+    batches = []
+    batch, size = [], 0
+    for vector in vectors:
+        vector_size = _vector_bytes(vector)
+        if batch and (len(batch) >= max_vectors or size + vector_size > max_bytes):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(vector)
+        size += vector_size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class VectorSync:
+    """
+    Keeps Pinecone in step with the embeddings table
+
+    Upserts are split into size-bounded batches sent concurrently from a small
+    thread pool; deletes go out in id batches. Each request is retried with
+    exponential backoff unless the error is permanent, and every batch's latency, attempts and outcome are
+    recorded for stats(). Nothing is sent when Pinecone is not configured.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        max_tries: Optional[int] = None,
+        backoff_factor: Optional[float] = None,
+        index_getter: Optional[Callable] = None,
+    ):
+        self.batch_size = batch_size or settings.PINECONE_UPSERT_BATCH_SIZE
+        self.max_workers = max_workers or settings.PINECONE_UPSERT_WORKERS
+        self.max_tries = max_tries or settings.PINECONE_MAX_TRIES
+        self.backoff_factor = settings.PINECONE_BACKOFF_SECONDS if backoff_factor is None else backoff_factor
+        # Looked up at call time: the client connects lazily (and tests swap in a fake)
+        self._index_getter = index_getter or (lambda: pinecone_service.get_index())
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._batches = deque(maxlen=RECENT_BATCHES)
+        self._totals = {"upserted": 0, "deleted": 0, "failed_batches": 0, "retries": 0}
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pinecone")
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    # ---------- requests ----------
+    def _send(self, operation: str, call: Callable, count: int) -> bool:
+        """Run one request with retries and record how it went"""
+        attempts = [0]
+
+        def attempt():
+            attempts[0] += 1
+            call()
+
+        retrying = backoff.on_exception(
+            backoff.expo,
+            Exception,
+            max_tries=self.max_tries,
+            giveup=is_permanent_error,
+            factor=self.backoff_factor,
+            jitter=backoff.full_jitter,
+            logger=None,
+        )(attempt)
+
+        started = time.perf_counter()
+        try:
+            retrying()
+            ok = True
+        except Exception as e:
+            logger.error(f"Pinecone {operation} of {count} vectors failed after {attempts[0]} attempts: {e}")
+            ok = False
+        seconds = time.perf_counter() - started
+
+        with self._lock:
+            self._batches.append({"operation": operation, "vectors": count, "seconds": seconds, "attempts": attempts[0], "ok": ok})
+            self._totals["retries"] += attempts[0] - 1
+            if ok:
+                self._totals["upserted" if operation == "upsert" else "deleted"] += count
+            else:
+                self._totals["failed_batches"] += 1
+        return ok
+
+    def _run(self, operation: str, batches: List, request: Callable) -> bool:
+        if len(batches) == 1:
+            return self._send(operation, lambda: request(batches[0]), len(batches[0]))
+        futures = [
+            self._pool().submit(self._send, operation, lambda batch=batch: request(batch), len(batch))
+            for batch in batches
+        ]
+        return all([future.result() for future in futures])
+
+    # ---------- sync API ----------
+    def upsert(self, vectors: Sequence[Dict], namespace: Optional[str] = None) -> bool:
+        """
+        Upsert vectors ({'id', 'values', 'metadata'}); returns True when every batch landed
+
+        Failed batches are logged and counted in stats(), not raised: search
+        falls back to the local index for queries Pinecone cannot answer.
+        """
+        index = self._index_getter()
+        if index is None:
+            return False
+        if not vectors:
+            return True
+        namespace = pinecone_service.NAMESPACE if namespace is None else namespace
+        batches = upsert_batches(vectors, self.batch_size)
+        return self._run("upsert", batches, lambda batch: index.upsert(vectors=batch, namespace=namespace))
+
+    def delete(self, ids: Sequence[str], namespace: Optional[str] = None) -> bool:
+        """Delete vectors by id (ids that do not exist are ignored by Pinecone)"""
+        index = self._index_getter()
+        if index is None or not ids:
+            return True
+        namespace = pinecone_service.NAMESPACE if namespace is None else namespace
+        ids = list(ids)
+        batches = [ids[i : i + MAX_DELETE_IDS] for i in range(0, len(ids), MAX_DELETE_IDS)]
+        return self._run("delete", batches, lambda batch: index.delete(ids=batch, namespace=namespace))
+
+    def delete_chunks(self, chunk_ids: Sequence[int], namespace: Optional[str] = None) -> bool:
+        """Delete the vectors of the given chunks"""
+        return self.delete([f"chunk-{chunk_id}" for chunk_id in chunk_ids], namespace=namespace)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            batches = list(self._batches)
+            totals = dict(self._totals)
+        latencies = sorted(batch["seconds"] for batch in batches)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 4)
+
+        return {
+            "enabled": self._index_getter() is not None,
+            "batch_size": self.batch_size,
+            "workers": self.max_workers,
+            **totals,
+            "recent_batches": len(batches),
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "latency_max": round(latencies[-1], 4) if latencies else 0.0,
+        }
+
+
+# Shared sync for the whole process
+vector_sync = VectorSync()
@@ -0,0 +1,91 @@
+"""
+Benchmark chunk + embedding persistence: ORM objects vs. the bulk writer
+
+Usage: python benchmarks/bench_bulk_insert.py [--url postgresql://...] [--chunks 20000] [--batch 1000]
+Reports rows/sec (chunks plus embeddings) for each path. Without --url a
+throwaway SQLite file is used; on PostgreSQL embeddings go in through COPY.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.database import Base
+from app.models import Document, DocumentChunk, Embedding
+from app.services.bulk_writer import insert_chunks, insert_embeddings
+from app.services.embedding_service import pack_vector
+
+TEXT = "The insured is covered for hospitalisation expenses subject to the policy terms and conditions. " * 8
+
+
+def orm_batch(db, document_id, start, vectors):
+    chunks = [
+        DocumentChunk(document_id=document_id, chunk_index=start + i, chunk_text=TEXT, start_char=0, end_char=len(TEXT))
+        for i in range(len(vectors))
+    ]
+    db.add_all(chunks)
+    db.flush()
+    db.add_all([
+        Embedding(chunk_id=chunk.id, pinecone_id=f"chunk-{chunk.id}", vector_data=pack_vector(vec), dimension=len(vec), model_name="bench", status="completed")
+        for chunk, vec in zip(chunks, vectors)
+    ])
+    db.commit()
+
+
+def bulk_batch(db, document_id, start, vectors):
+    chunk_ids = insert_chunks(db, [
+        {"document_id": document_id, "chunk_index": start + i, "chunk_text": TEXT, "start_char": 0, "end_char": len(TEXT)}
+        for i in range(len(vectors))
+    ])
+    insert_embeddings(db, [
+        {"chunk_id": chunk_id, "pinecone_id": f"chunk-{chunk_id}", "vector_data": pack_vector(vec), "dimension": len(vec), "model_name": "bench", "status": "completed"}
+        for chunk_id, vec in zip(chunk_ids, vectors)
+    ])
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.url or f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        vectors = np.random.default_rng(0).standard_normal((args.chunks, args.dim)).astype(np.float32)
+
+        for label, write in (("ORM add_all", orm_batch), ("bulk writer", bulk_batch)):
+            db = Session()
+            document = Document(filename=f"bench-{label}.txt", file_type="txt", content="")
+            db.add(document)
+            db.commit()
+            started = time.perf_counter()
+            for start in range(0, args.chunks, args.batch):
+                write(db, document.id, start, vectors[start:start + args.batch])
+            elapsed = time.perf_counter() - started
+            print(f"{label:>12}: {args.chunks} chunks in {elapsed:.2f}s, {2 * args.chunks / elapsed:,.0f} rows/sec")
+
+            # Clean up with set-based deletes so the next run starts from the same table sizes
+            chunk_ids = select(DocumentChunk.id).where(DocumentChunk.document_id == document.id)
+            db.execute(delete(Embedding).where(Embedding.chunk_id.in_(chunk_ids)))
+            db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document.id))
+            db.execute(delete(Document).where(Document.id == document.id))
+            db.commit()
+            db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark character vs. token-aware chunking
+
+Usage: python benchmarks/bench_chunking.py [--file policy.txt] [--tokenizer model] [--no-encode]
+Reports chunk counts, chunking time, how many tokens the embedding model
+would truncate away and the time to encode every chunk. Needs
+sentence-transformers (or tiktoken for an encoding name).
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.services.chunk_tokenizer import load_chunk_tokenizer
+from app.services.chunking_service import ChunkingService
+from app.services.model_registry import model_registry
+
+WORDS = (
+    "the insured person hospitalisation expenses room rent policy period waiting "
+    "pre-existing disease cover sum insured claim cashless network provider "
+    "maternity cataract surgery ayush treatment deductible co-payment renewal"
+).split()
+
+
+def synthetic_text(sentences: int) -> str:
+    rng = random.Random(42)
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 40))).capitalize() + rng.choice([".", ".", "!", "?"])
+        for _ in range(sentences)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--file", help="Text file to chunk (default: synthetic policy text)")
+    parser.add_argument("--sentences", type=int, default=20_000)
+    parser.add_argument("--tokenizer", default=settings.CHUNK_TOKENIZER)
+    parser.add_argument("--overlap-tokens", type=int, default=settings.CHUNK_OVERLAP_TOKENS)
+    parser.add_argument("--no-encode", action="store_true", help="Skip encoding the chunks with the model")
+    args = parser.parse_args()
+
+    text = Path(args.file).read_text(encoding="utf-8") if args.file else synthetic_text(args.sentences)
+    tokenizer = load_chunk_tokenizer(args.tokenizer)
+    if tokenizer is None:
+        sys.exit(f"Tokenizer {args.tokenizer!r} is not available")
+    print(f"{len(text):,} characters, token budget {tokenizer.max_tokens}")
+
+    services = {
+        "chars": ChunkingService(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP),
+        "tokens": ChunkingService(tokenizer=tokenizer, overlap_tokens=args.overlap_tokens),
+    }
+    model = None if args.no_encode else model_registry.get(settings.LOCAL_EMBEDDING_MODEL)
+    for mode, service in services.items():
+        started = time.perf_counter()
+        chunks = service.chunk_text(text)
+        chunk_seconds = time.perf_counter() - started
+
+        counts = tokenizer.count_tokens(chunks)
+        truncated = sum(max(count - tokenizer.max_tokens, 0) for count in counts)
+        over = sum(count > tokenizer.max_tokens for count in counts)
+        line = (
+            f"{mode:>6}: {len(chunks):6d} chunks in {chunk_seconds:.2f}s, "
+            f"tokens/chunk median {statistics.median(counts):.0f} max {max(counts)}, "
+            f"{over} chunks over budget ({truncated:,} tokens never embedded)"
+        )
+        if model is not None:
+            started = time.perf_counter()
+            model.encode(chunks, batch_size=64, convert_to_tensor=False)
+            line += f", encode {time.perf_counter() - started:.2f}s"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
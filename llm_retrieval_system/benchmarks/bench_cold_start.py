@@ -0,0 +1,103 @@
+"""
+Benchmark cold start: importing app.main and time to the first healthy /health
+
+Usage: python benchmarks/bench_cold_start.py [--runs 5] [--warm-up] [--top 10]
+Every run is a fresh interpreter. The second phase imports the app, runs the
+startup hooks and sends GET /health in process (no socket), so it measures
+what uvicorn adds to a worker's boot. Runs without a database or network
+unless configured otherwise. Exits non-zero over budget.
+Target: import under 1.0 s, first healthy response under 2.0 s (model warm-up off).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+IMPORT_ONLY = """
+import time
+started = time.perf_counter()
+import app.main
+print(time.perf_counter() - started)
+"""
+
+FIRST_HEALTHY = """
+import asyncio, time
+started = time.perf_counter()
+import httpx
+from app.main import app
+
+async def boot():
+    await app.router.startup()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        while (await client.get("/health")).status_code != 200:
+            await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await app.router.shutdown()
+    return elapsed
+
+print(asyncio.run(boot()))
+"""
+
+
+def run(code: str, env: dict) -> float:
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env: dict, top: int):
+    """Cumulative -X importtime per package, heaviest first"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=ROOT, env=env, capture_output=True, text=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        if name == "app.main":
+            continue
+        root = name.split(".")[0] if not name.startswith("app.") else ".".join(name.split(".")[:3])
+        packages[root] = max(packages.get(root, 0.0), int(fields[1]) / 1e6)
+    return sorted(packages.items(), key=lambda item: -item[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm-up", action="store_true", help="load the embedding model before /health turns healthy")
+    parser.add_argument("--top", type=int, default=10, help="show the slowest top-level imports")
+    parser.add_argument("--import-budget", type=float, default=1.0)
+    parser.add_argument("--healthy-budget", type=float, default=2.0)
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "USE_DATABASE": os.environ.get("USE_DATABASE", "false"),
+        "VECTOR_BACKEND": os.environ.get("VECTOR_BACKEND", "local"),
+        "WARM_UP_EMBEDDING_MODEL": "true" if args.warm_up else "false",
+    }
+    run(IMPORT_ONLY, env)  # Compile bytecode once so every measured run starts equal
+
+    imports = [run(IMPORT_ONLY, env) for _ in range(args.runs)]
+    healthy = [run(FIRST_HEALTHY, env) for _ in range(args.runs)]
+
+    import_p50 = statistics.median(imports)
+    healthy_p50 = statistics.median(healthy)
+    print(f"import app.main     p50 {import_p50:.3f}s  max {max(imports):.3f}s  (budget {args.import_budget:.1f}s)")
+    print(f"first healthy /health p50 {healthy_p50:.3f}s  max {max(healthy):.3f}s  (budget {args.healthy_budget:.1f}s)")
+    if args.top:
+        print("slowest top-level imports:")
+        for name, seconds in slowest_imports(env, args.top):
+            print(f"  {seconds:7.3f}s  {name}")
+
+    over = import_p50 > args.import_budget or healthy_p50 > args.healthy_budget
+    if over:
+        print("OVER BUDGET")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
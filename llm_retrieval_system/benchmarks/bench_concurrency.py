@@ -0,0 +1,140 @@
+"""
+Benchmark document and query routes under concurrent clients
+
+Usage: python benchmarks/bench_concurrency.py [--url postgresql://...] [--latency-ms 2] [--requests 400]
+Sends GET /documents, GET /documents/{id} and POST /hackrx/run through the
+app in process (no socket) at increasing client counts and reports
+requests/sec and p50 latency. Every /hackrx/run asks new questions, so it
+runs retrieval rather than being served from the answer cache; without a
+Gemini key the LLM step returns its fallback answer immediately. Without --url a throwaway SQLite file is used; --latency-ms adds a
+simulated network round trip to every SQLite statement in the driver thread,
+which is what concurrent clients overlap on a real database server.
+Target: requests/sec grows with clients up to the connection pool size.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+HACKRX_EVERY = 5  # One request in this many is POST /hackrx/run
+
+
+def seed(url: str, documents: int, chunks: int):
+    from sqlalchemy import create_engine, delete
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core.database import Base
+    from app.models import Document, DocumentChunk
+    from app.services.bulk_writer import insert_chunks
+
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(delete(DocumentChunk))
+        conn.execute(delete(Document))
+        conn.execute(Document.__table__.insert(), [
+            {"id": i, "filename": f"policy-{i}.pdf", "file_type": "pdf", "content": "Clause text. " * 800}
+            for i in range(1, documents + 1)
+        ])
+    db = sessionmaker(bind=engine)()
+    insert_chunks(db, [
+        {"document_id": d, "chunk_index": i, "chunk_text": "Clause text. " * 80, "start_char": 0, "end_char": 0}
+        for d in range(1, documents + 1)
+        for i in range(chunks)
+    ])
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+async def run_level(client, requests, clients: int):
+    latencies = []
+    queue = list(requests)
+
+    async def worker():
+        while queue:
+            method, path, body = queue.pop()
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, statistics.median(latencies)
+
+
+async def bench(args, requests):
+    import httpx
+    from sqlalchemy import event
+
+    from app.api.hackrx_routes import HACKRX_TOKEN
+    from app.core import database
+    from app.main import app
+
+    # /hackrx/run searches on a sync session in a worker thread
+    database.init_database()
+    database.init_async_database()
+    if args.latency_ms and database.async_engine.dialect.name == "sqlite":
+        # SQLite's trace hook runs in aiosqlite's connection thread, so the delay
+        # holds one connection like a network round trip would, not the event loop
+        def add_latency(dbapi_connection, _):
+            dbapi_connection.run_async(
+                lambda conn: conn.set_trace_callback(lambda sql: time.sleep(args.latency_ms / 1000))
+            )
+
+        event.listen(database.async_engine.sync_engine, "connect", add_latency)
+
+    headers = {"Authorization": f"Bearer {HACKRX_TOKEN}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers) as client:
+        await run_level(client, requests[:20], 1)  # Open pool connections, load the search indexes, warm the route code
+        print(f"{'clients':>8} {'req/s':>10} {'p50 ms':>10}")
+        for level, clients in enumerate(args.clients):
+            # Fresh questions at every level, so no answer comes from the cache
+            batch = [
+                (method, path, body and {**body, "questions": [f"{q} (run {level})" for q in body["questions"]]})
+                for method, path, body in requests
+            ]
+            rps, p50 = await run_level(client, batch, clients)
+            print(f"{clients:>8} {rps:>10.1f} {p50 * 1000:>10.2f}")
+    await database.dispose_async_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="sync SQLAlchemy URL; the async driver is derived from it")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated round trip per query")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{Path(tempfile.mkdtemp()) / 'bench.db'}"
+    # Settings are read when the app is imported
+    os.environ.update({"USE_DATABASE": "true", "DATABASE_URL": url, "WARM_UP_EMBEDDING_MODEL": "false"})
+    seed(url, args.documents, args.chunks)
+
+    requests = []
+    for i in range(args.requests):
+        document_id = i % args.documents + 1
+        if i % HACKRX_EVERY == 0:
+            questions = [f"What is the grace period in clause {i}?", f"Is room rent capped for request {i}?"]
+            requests.append(("POST", "/hackrx/run", {"documents": [f"document-{document_id}"], "questions": questions}))
+        elif i % 4 == 0:
+            requests.append(("GET", "/api/v1/documents/?limit=50", None))
+        else:
+            requests.append(("GET", f"/api/v1/documents/{document_id}?chunks_limit=20", None))
+    asyncio.run(bench(args, requests))
+
+
+if __name__ == "__main__":
+    main()
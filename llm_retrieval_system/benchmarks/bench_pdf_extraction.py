@@ -0,0 +1,85 @@
+"""
+Benchmark page-level PDF extraction, serial vs. the process pool
+
+Usage: python benchmarks/bench_pdf_extraction.py [--pages 300] [--workers 4]
+Generates a synthetic text PDF; parallel extraction should scale close to
+linearly with cores.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.services import text_extractor
+from app.services.text_extractor import TextExtractor, shutdown_pdf_pool
+
+LINE = "The insured is covered for hospitalisation expenses subject to the policy terms {page}-{line}."
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 45):
+    """Write a minimal multi-page PDF with one Helvetica text block per page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        body = "BT /F1 9 Tf 40 800 Td 11 TL " + " ".join(
+            f"({LINE.format(page=page, line=line)}) '" for line in range(lines_per_page)
+        ) + " ET"
+        stream = body.encode()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def timed(label: str, path: str) -> str:
+    started = time.perf_counter()
+    text = TextExtractor._extract_from_pdf(path)
+    print(f"{label}: {time.perf_counter() - started:.2f}s, {len(text)} characters")
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "policy.pdf")
+        write_pdf(path, args.pages)
+        print(f"{args.pages} pages, {args.workers} workers")
+
+        settings.PDF_EXTRACTION_WORKERS = 1
+        serial = timed("serial", path)
+
+        settings.PDF_EXTRACTION_WORKERS = args.workers
+        text_extractor._pdf_pool(args.workers)  # Start the workers outside the timing
+        timed("pool (warm-up)", path)
+        parallel = timed("pool", path)
+        shutdown_pdf_pool()
+
+        assert parallel == serial, "parallel extraction must match serial output"
+
+
+if __name__ == "__main__":
+    main()
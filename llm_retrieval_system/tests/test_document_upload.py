@@ -1,6 +1,7 @@
 import sys
 import requests
 import json
+import time
 from pathlib import Path
 
 # Add project to path
@@ -37,8 +38,17 @@ def test_document_upload():
         print("Upload Response:")
         print(json.dumps(response.json(), indent=2))
         
-        if response.status_code == 200:
-            document_id = response.json()["document_id"]
+        if response.status_code == 202:
+            # Processing runs in the background; poll the ingestion job until it settles
+            job_url = f"{base_url}{response.json()['status_url']}"
+            for _ in range(60):
+                job = requests.get(job_url).json()
+                if job["status"] in ("completed", "failed"):
+                    break
+                time.sleep(1)
+            print("\nIngestion Job:")
+            print(json.dumps(job, indent=2))
+            document_id = job["document_id"]
             
             # Test document retrieval
             response = requests.get(f"{base_url}/api/v1/documents/{document_id}")
@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.database import Base
+from app.models import Document, DocumentChunk, Embedding, Query
+from app.services.answer_cache import AnswerCache, corpus_version, document_scope
+
+
+def _session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([Document(filename="policy.pdf", file_type="pdf"), Document(filename="terms.pdf", file_type="pdf")])
+    db.commit()
+    return db
+
+
+def test_near_duplicate_questions_hit_within_the_same_scope():
+    db = _session()
+    cache = AnswerCache(threshold=0.95)
+    cache.store(db, "m", "What is the grace period?", [1.0, 0.0, 0.1], "Thirty days.", document_ids=[1], source_document_ids=[1])
+
+    assert cache.lookup(db, "m", [1.0, 0.01, 0.1], document_ids=[1])["answer"] == "Thirty days."
+    assert cache.lookup(db, "m", [0.0, 1.0, 0.0], document_ids=[1]) is None
+    assert cache.lookup(db, "m", [1.0, 0.0, 0.1], document_ids=[1, 2]) is None
+    assert cache.lookup(db, "other-model", [1.0, 0.0, 0.1], document_ids=[1]) is None
+
+    # A cold cache reloads the bucket from the queries table
+    assert AnswerCache().lookup(db, "m", [1.0, 0.0, 0.1], document_ids=[1]) is not None
+    db.commit()  # Committing the hit counters is up to the caller
+    assert db.query(Query).one().hit_count == 2
+    assert document_scope([2, 1, 2]) == ",1,2,"
+
+
+def test_new_upload_changes_corpus_version_and_invalidation_drops_answers():
+    db = _session()
+    cache = AnswerCache()
+    cache.store(db, "m", "grace period?", [1.0, 0.0], "Thirty days.", source_document_ids=[1])
+    cache.store(db, "m", "room rent?", [0.0, 1.0], "One percent.", source_document_ids=[2])
+    assert cache.lookup(db, "m", [1.0, 0.0]) is not None
+
+    db.add(Document(filename="policy.pdf", file_type="pdf"))
+    db.commit()
+    assert cache.lookup(db, "m", [1.0, 0.0]) is None
+
+    assert cache.invalidate_documents(db, [1]) == 1
+    assert [row.response for row in db.query(Query).all()] == ["One percent."]
+
+
+def test_chunks_committed_after_the_document_change_corpus_version():
+    db = _session()
+    cache = AnswerCache()
+    db.add(DocumentChunk(document_id=1, chunk_index=0, chunk_text="Grace period is thirty days."))
+    db.commit()
+    version = corpus_version(db, [1])
+    cache.store(db, "m", "grace period?", [1.0, 0.0], "Thirty days.", document_ids=[1], source_document_ids=[1])
+    assert cache.lookup(db, "m", [1.0, 0.0], document_ids=[1]) is not None
+
+    # The ingest of document 1 is still committing chunks and embeddings
+    chunk = DocumentChunk(document_id=1, chunk_index=1, chunk_text="Room rent is capped.")
+    db.add(chunk)
+    db.commit()
+    assert cache.lookup(db, "m", [1.0, 0.0], document_ids=[1]) is None
+    db.add(Embedding(chunk_id=chunk.id, pinecone_id="chunk-2"))
+    db.commit()
+    assert cache.lookup(db, "m", [1.0, 0.0], document_ids=[1]) is None
+    # Other scopes are unaffected
+    assert corpus_version(db, [2]) == "1:2:0:0"
+
+    # An answer is stored under the version its context was read at
+    cache.store(db, "m", "room rent?", [0.0, 1.0], "Capped.", document_ids=[1], source_document_ids=[1], version=version)
+    assert cache.lookup(db, "m", [0.0, 1.0], document_ids=[1]) is None
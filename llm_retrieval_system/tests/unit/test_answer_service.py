@@ -0,0 +1,86 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.services.answer_service import NO_CONTEXT_ANSWER, TIMEOUT_ANSWER, generate_answers
+
+
+class StubLLM:
+    """Blocking LLM stand-in that sleeps for a per-question latency"""
+
+    def __init__(self, latencies):
+        self.latencies = latencies
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def generate_answer(self, query, context_chunks):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            if query == "boom":
+                raise RuntimeError("model unavailable")
+            time.sleep(self.latencies.get(query, 0.05))
+            return {"answer": f"answer to {query}", "model": "stub", "tokens_used": 1}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_answers_run_concurrently_and_keep_question_order():
+    llm = StubLLM({"q0": 0.2, "q1": 0.05, "q2": 0.1, "q3": 0.05})
+    items = [(f"q{i}", [{"chunk_text": "context"}]) for i in range(4)]
+
+    started = time.perf_counter()
+    results = asyncio.run(generate_answers(llm, items, concurrency=2, timeout=5))
+    elapsed = time.perf_counter() - started
+
+    assert [r["answer"] for r in results] == [f"answer to q{i}" for i in range(4)]
+    assert llm.peak == 2
+    assert elapsed < 0.4  # sequential would take 0.4s
+
+
+def test_slow_failed_and_empty_questions_do_not_stall_the_batch():
+    llm = StubLLM({"slow": 1.0})
+    items = [
+        ("slow", [{"chunk_text": "context"}]),
+        ("boom", [{"chunk_text": "context"}]),
+        ("no context", []),
+        ("fast", [{"chunk_text": "context"}]),
+    ]
+
+    results = asyncio.run(generate_answers(llm, items, concurrency=4, timeout=0.2))
+
+    assert results[0]["answer"] == TIMEOUT_ANSWER
+    assert "model unavailable" in results[1]["answer"]
+    assert results[2]["answer"] == NO_CONTEXT_ANSWER
+    assert results[3]["answer"] == "answer to fast"
+
+
+def test_timed_out_call_keeps_its_slot_until_the_thread_returns():
+    llm = StubLLM({"slow": 0.8, "q0": 0.05, "q1": 0.05, "q2": 0.05})
+    items = [("slow", [{"chunk_text": "context"}])] + [(f"q{i}", [{"chunk_text": "context"}]) for i in range(3)]
+
+    results = asyncio.run(generate_answers(llm, items, concurrency=2, timeout=0.3))
+
+    assert results[0]["answer"] == TIMEOUT_ANSWER
+    assert [r["answer"] for r in results[1:]] == [f"answer to q{i}" for i in range(3)]
+    assert llm.peak == 2
+
+
+def test_questions_queued_behind_hung_calls_time_out_at_the_deadline():
+    llm = StubLLM({"hung0": 1.0, "hung1": 1.0})
+    items = [(q, [{"chunk_text": "context"}]) for q in ("hung0", "hung1", "q0", "q1")]
+
+    started = time.perf_counter()
+    results = asyncio.run(generate_answers(llm, items, concurrency=2, timeout=0.3))
+    elapsed = time.perf_counter() - started
+
+    # Waiting for a slot counts against the same deadline as the call
+    assert [r["answer"] for r in results] == [TIMEOUT_ANSWER] * 4
+    assert elapsed < 0.8
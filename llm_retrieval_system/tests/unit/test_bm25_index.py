@@ -0,0 +1,120 @@
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, delete, event
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models import ChunkDeletion, Document, DocumentChunk
+from app.services.bm25_index import BM25Index, tokenize
+from app.services.search_service import fuse_rankings
+
+
+def _index():
+    index = BM25Index()
+    index.add(1, 10, "The grace period for premium payment is thirty days.")
+    index.add(2, 10, "Maternity expenses are covered after a waiting period.")
+    index.add(3, 20, "Room rent is capped at one percent of the sum insured.")
+    return index
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("The Grace-Period, under 30 days!") == ["grace", "period", "30", "days"]
+
+
+def test_search_ranks_by_bm25_and_filters_documents():
+    index = _index()
+
+    assert [chunk_id for chunk_id, _, _ in index.search("grace period")] == [1, 2]
+    assert index.search("room rent", document_ids=[10]) == []
+    assert index.search("the and of") == []
+
+
+def test_remove_document_drops_postings():
+    index = _index()
+
+    assert index.remove_document(10) == 2
+    assert len(index) == 1
+    assert index.search("period") == []
+    assert "period" not in index._postings
+
+
+def test_fusion_methods(monkeypatch):
+    dense = [(1, 10, 0.9), (2, 10, 0.5)]
+    sparse = [(2, 10, 8.0), (3, 20, 4.0)]
+
+    monkeypatch.setattr(settings, "HYBRID_FUSION", "weighted")
+    monkeypatch.setattr(settings, "HYBRID_KEYWORD_WEIGHT", 0.5)
+    weighted = fuse_rankings(dense, sparse)
+    assert [chunk_id for chunk_id, _, _, _ in weighted] == [2, 1, 3]
+    assert weighted[0][1] == 0.75
+
+    monkeypatch.setattr(settings, "HYBRID_FUSION", "rrf")
+    rrf = fuse_rankings(dense, sparse)
+    assert rrf[0][0] == 2
+
+
+def test_refresh_replays_deletions_without_counting_rows():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+
+    def add_document(texts):
+        document = Document(filename="policy.pdf", file_type="pdf", content="")
+        db.add(document)
+        db.flush()
+        db.add_all([DocumentChunk(document_id=document.id, chunk_index=i, chunk_text=text) for i, text in enumerate(texts)])
+        db.commit()
+        return document.id
+
+    first = add_document(["Grace period is thirty days.", "Room rent is capped."])
+    index = BM25Index()
+    assert index.refresh(db) == 2
+
+    # Another worker deletes a document and stores one of the same size, so the row count is unchanged
+    chunk_ids = [chunk_id for chunk_id, in db.query(DocumentChunk.id).filter(DocumentChunk.document_id == first)]
+    db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == first))
+    db.add_all([ChunkDeletion(chunk_id=chunk_id, document_id=first) for chunk_id in chunk_ids])
+    db.commit()
+    second = add_document(["Grace period is fifteen days.", "Cataract waits two years."])
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql.lower()))
+    assert index.refresh(db) == 2
+
+    assert len(index) == 2
+    assert {document_id for _, document_id, _ in index.search("grace period room rent")} == {second}
+    assert not [sql for sql in statements if "count(" in sql]
+    db.close()
+
+
+def test_refresh_picks_up_chunks_committed_out_of_id_order():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as setup:
+        setup.add_all([Document(id=1, filename="a.pdf", file_type="pdf", content=""), Document(id=2, filename="b.pdf", file_type="pdf", content="")])
+        setup.commit()
+    index = BM25Index()
+    db = Session()
+    index.refresh(db)
+
+    # Worker A was handed ids 1-2 but is still embedding; worker B commits 3-4 first
+    worker_b = Session()
+    worker_b.add_all([DocumentChunk(id=i, document_id=2, chunk_index=i, chunk_text="Room rent is capped.") for i in (3, 4)])
+    worker_b.commit()
+    assert index.refresh(db) == 2
+
+    worker_a = Session()
+    worker_a.add_all([DocumentChunk(id=i, document_id=1, chunk_index=i, chunk_text="Grace period is thirty days.") for i in (1, 2)])
+    worker_a.commit()
+    assert index.refresh(db) == 2
+    assert index.refresh(db) == 0
+
+    assert len(index) == 4
+    assert {document_id for _, document_id, _ in index.search("grace period")} == {1}
+    for session in (db, worker_a, worker_b):
+        session.close()
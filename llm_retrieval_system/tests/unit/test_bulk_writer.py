@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.database import Base
+from app.models import Document, DocumentChunk, Embedding
+from app.services.bulk_writer import _copy_value, insert_chunks, insert_embeddings
+
+
+def test_bulk_insert_returns_ids_in_row_order():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    document = Document(filename="policy.txt", file_type="txt", content="")
+    db.add(document)
+    db.commit()
+
+    rows = [{"document_id": document.id, "chunk_index": i, "chunk_text": f"clause {i}", "start_char": 10 * i, "end_char": 10 * i + 8} for i in range(5)]
+    chunk_ids = insert_chunks(db, rows)
+    insert_embeddings(db, [
+        {"chunk_id": chunk_id, "pinecone_id": f"chunk-{chunk_id}", "vector_data": b"\x00\x00\x80?", "dimension": 1, "model_name": "m", "status": "completed"}
+        for chunk_id in chunk_ids
+    ])
+    db.commit()
+
+    stored = {chunk.id: chunk.chunk_index for chunk in db.query(DocumentChunk)}
+    assert [stored[chunk_id] for chunk_id in chunk_ids] == list(range(5))
+    assert db.query(Embedding).filter(Embedding.chunk_id.in_(chunk_ids)).count() == 5
+
+
+def test_copy_values_are_escaped_for_text_format():
+    assert _copy_value(None) == "\\N"
+    assert _copy_value(b"\x01\xff") == "\\\\x01ff"
+    assert _copy_value("a\tb\\c\nd") == "a\\tb\\\\c\\nd"
+    assert _copy_value(384) == "384"
@@ -0,0 +1,88 @@
+import random
+import re
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.services.chunking_service import ChunkingService
+
+
+def test_streamed_chunks_match_chunking_the_joined_text():
+    rng = random.Random(7)
+    words = ["Grace", "period", "is", "thirty", "days.", "Room", "rent", "capped!", "Cover?", "\n\n", "  "]
+    text = " ".join(rng.choice(words) for _ in range(3000))
+    # Cut anywhere, including mid-word and mid-whitespace
+    cuts = sorted(rng.sample(range(len(text)), 40))
+    pieces = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+    service = ChunkingService(chunk_size=300, chunk_overlap=50)
+    streamed = list(service.iter_chunks(pieces))
+
+    assert [(chunk.start, chunk.end) for chunk in streamed] == service.chunk_spans(text)
+    assert [chunk.text for chunk in streamed] == service.chunk_text(text)
+    assert len(streamed) > 10
+
+
+def test_spans_cover_the_text_with_bounded_overlapping_chunks():
+    text = "Grace period is thirty days. " * 20 + "x" * 700 + ". Room rent is capped."
+    service = ChunkingService(chunk_size=200, chunk_overlap=40)
+    spans = service.chunk_spans(text)
+
+    assert all(0 < end - start <= 200 for start, end in spans)
+    assert all(text[start:end] == text[start:end].strip() for start, end in spans)
+    # Together the chunks cover every character but the single spaces between sentences
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    assert all(next_start <= end + 1 for (_, end), (next_start, _) in zip(spans, spans[1:]))
+    assert sum(next_start < end for (_, end), (next_start, _) in zip(spans, spans[1:])) > 5
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word, standing in for a model tokenizer"""
+
+    max_tokens = 12
+    batch_size = 4
+
+    def __init__(self):
+        self.calls = 0
+
+    def token_starts(self, texts):
+        self.calls += 1
+        return [[match.start() for match in re.finditer(r"\S+", text)] for text in texts]
+
+
+def test_token_mode_packs_sentences_up_to_the_token_budget():
+    tokenizer = WordTokenizer()
+    service = ChunkingService(tokenizer=tokenizer, overlap_tokens=3)
+    sentences = [f"Clause {i} covers {'very ' * (i % 4)}many things." for i in range(20)]
+    text = " ".join(sentences) + " " + "word " * 30
+    spans = service.chunk_spans(text)
+
+    words = [text[start:end].split() for start, end in spans]
+    assert all(len(chunk) <= 12 for chunk in words)
+    # Each chunk repeats the previous chunk's last three tokens
+    sentence_chunks = words[:19]
+    assert all(chunk[:3] == previous[-3:] for previous, chunk in zip(sentence_chunks, sentence_chunks[1:]))
+    # The unpunctuated tail is cut by token count, still overlapping
+    assert [len(chunk) for chunk in words[19:]] == [12, 12, 12]
+    # Sentences are tokenized in batches, not one call each
+    assert tokenizer.calls == 6
+
+    pieces = [text[i:i + 37] for i in range(0, len(text), 37)]
+    assert [(chunk.start, chunk.end) for chunk in service.iter_chunks(pieces)] == spans
+
+
+def test_processor_resolves_the_tokenizer_on_first_use(monkeypatch):
+    from app.services import document_processor
+    from app.services.document_processor import DocumentProcessor
+
+    loads = []
+    monkeypatch.setattr(document_processor.settings, "CHUNKING_MODE", "tokens")
+    monkeypatch.setattr(document_processor, "load_chunk_tokenizer", lambda: loads.append(1) or WordTokenizer())
+
+    processor = DocumentProcessor()
+    assert loads == []
+
+    assert processor.chunking_service.mode == "tokens"
+    assert processor.chunking_service is processor.chunking_service
+    assert loads == [1]
@@ -0,0 +1,117 @@
+import asyncio
+import sys
+from pathlib import Path
+
+from fastapi import Response
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.api.document_routes import delete_document, get_document, get_document_chunk, list_documents
+from app.core.database import Base
+from app.models import ChunkDeletion, Document, DocumentChunk, Embedding
+from app.services import pinecone_service
+
+
+async def _session_with_documents(chunk_counts):
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    db = async_sessionmaker(engine, expire_on_commit=False)()
+    for i, count in enumerate(chunk_counts):
+        document = Document(filename=f"policy-{i}.pdf", file_type="pdf", content="x" * 5000)
+        db.add(document)
+        await db.flush()
+        db.add_all([DocumentChunk(document_id=document.id, chunk_index=j, chunk_text="clause") for j in range(count)])
+    await db.commit()
+    db.expunge_all()
+    return engine, db
+
+
+def _record_statements(engine):
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+    return statements
+
+
+def test_listing_pages_by_id_with_grouped_counts():
+    async def check():
+        engine, db = await _session_with_documents([3, 0, 2, 1, 4])
+        statements = _record_statements(engine)
+
+        first = Response()
+        page = await list_documents(first, after_id=None, limit=2, db=db)
+        assert [(doc["id"], doc["chunks_count"]) for doc in page] == [(1, 3), (2, 0)]
+        assert first.headers["X-Next-After-Id"] == "2"
+
+        last = Response()
+        page = await list_documents(last, after_id=3, limit=2, db=db)
+        assert [(doc["id"], doc["chunks_count"]) for doc in page] == [(4, 1), (5, 4)]
+        assert "X-Next-After-Id" not in last.headers
+
+        # No paging parameters: every document, as clients written before paging expect
+        everything = Response()
+        page = await list_documents(everything, after_id=None, limit=None, db=db)
+        assert [(doc["id"], doc["chunks_count"]) for doc in page] == [(1, 3), (2, 0), (3, 2), (4, 1), (5, 4)]
+        assert "X-Next-After-Id" not in everything.headers
+
+        # One query per page, and the document text is never selected
+        assert len(statements) == 3
+        assert not any("content" in sql or "chunk_text" in sql for sql in statements)
+        await db.close()
+        await engine.dispose()
+
+    asyncio.run(check())
+
+
+def test_document_details_page_chunk_previews_cut_in_sql():
+    async def check():
+        engine, db = await _session_with_documents([5])
+        db.add(DocumentChunk(document_id=1, chunk_index=5, chunk_text="long clause " * 20))
+        await db.commit()
+        statements = _record_statements(engine)
+
+        details = await get_document(1, chunks_after=None, chunks_limit=4, db=db)
+        assert [chunk["chunk_index"] for chunk in details["chunks"]] == [0, 1, 2, 3]
+        assert details["next_chunks_after"] == 3 and details["chunks_count"] == 6
+        assert len(details["content_preview"]) == 500
+
+        details = await get_document(1, chunks_after=3, chunks_limit=4, db=db)
+        assert [chunk["chunk_index"] for chunk in details["chunks"]] == [4, 5]
+        assert details["chunks"][1]["text_preview"] == ("long clause " * 20)[:100] + "..."
+        assert details["next_chunks_after"] is None
+        assert all("substr" in sql for sql in statements if "chunk_text" in sql or "content" in sql)
+
+        chunk = await get_document_chunk(1, 5, db=db)
+        assert chunk["text"] == "long clause " * 20
+        await db.close()
+        await engine.dispose()
+
+    asyncio.run(check())
+
+
+def test_delete_removes_chunks_and_embeddings_without_loading_them(monkeypatch):
+    monkeypatch.setattr(pinecone_service, "get_index", lambda: None)
+
+    async def check():
+        engine, db = await _session_with_documents([3, 2])
+        chunk_ids = (await db.execute(select(DocumentChunk.id).where(DocumentChunk.document_id == 1))).scalars().all()
+        db.add_all([Embedding(chunk_id=chunk_id, pinecone_id=f"chunk-{chunk_id}") for chunk_id in chunk_ids])
+        await db.commit()
+        statements = _record_statements(engine)
+
+        deleted = await delete_document(1, db=db)
+        assert (deleted["filename"], deleted["chunks_deleted"]) == ("policy-0.pdf", 3)
+        assert not any("chunk_text" in sql for sql in statements)
+
+        remaining = (await db.execute(select(DocumentChunk.document_id, func.count()).group_by(DocumentChunk.document_id))).all()
+        assert [tuple(row) for row in remaining] == [(2, 2)]
+        assert (await db.execute(select(func.count(Embedding.id)))).scalar() == 0
+        logged = (await db.execute(select(ChunkDeletion.chunk_id, ChunkDeletion.document_id))).all()
+        assert sorted(tuple(row) for row in logged) == [(chunk_id, 1) for chunk_id in sorted(chunk_ids)]
+        await db.close()
+        await engine.dispose()
+
+    asyncio.run(check())
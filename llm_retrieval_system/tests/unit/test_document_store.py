@@ -0,0 +1,61 @@
+import asyncio
+import hashlib
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.config import settings
+from app.services.document_store import ExtractionWriter, FileTooLargeError, iter_extraction, stream_to_disk
+
+
+class AsyncSource:
+    """Minimal async reader standing in for an UploadFile"""
+
+    def __init__(self, data: bytes):
+        self._buffer = io.BytesIO(data)
+        self.reads = []
+
+    async def read(self, size: int = -1) -> bytes:
+        chunk = self._buffer.read(size)
+        self.reads.append(len(chunk))
+        return chunk
+
+
+def test_upload_is_copied_in_chunks_and_hashed(tmp_path):
+    data = bytes(range(256)) * 100
+    source = AsyncSource(data)
+
+    size, sha256 = asyncio.run(stream_to_disk(source, tmp_path / "doc.pdf", max_size=len(data), chunk_size=4096))
+
+    assert size == len(data)
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    assert (tmp_path / "doc.pdf").read_bytes() == data
+    assert max(source.reads) == 4096
+
+
+def test_oversized_upload_is_aborted_early_and_cleaned_up(tmp_path):
+    source = AsyncSource(b"x" * 100_000)
+
+    with pytest.raises(FileTooLargeError):
+        asyncio.run(stream_to_disk(source, tmp_path / "big.pdf", max_size=10_000, chunk_size=4096))
+
+    assert list(tmp_path.iterdir()) == []
+    assert len(source.reads) == 3
+
+
+def test_extraction_cache_is_keyed_by_hash_type_and_extractor_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DOCUMENT_STORE_PATH", str(tmp_path))
+    text = "Grace period is thirty days. " * 1000
+
+    with ExtractionWriter("ab" * 32, "pdf", "1") as cache:
+        cache.write(text)
+
+    assert "".join(iter_extraction("ab" * 32, "pdf", "1")) == text
+    assert iter_extraction("ab" * 32, "pdf", "2") is None
+    assert iter_extraction("cd" * 32, "pdf", "1") is None
+    stored = next((tmp_path / "extracted").rglob("*.gz"))
+    assert stored.stat().st_size < len(text) / 10
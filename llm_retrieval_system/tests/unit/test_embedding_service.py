@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.database import Base
+from app.models import Document, DocumentChunk, Embedding
+from app.services.embedding_service import EmbeddingService, EmbeddingUnavailableError, unpack_vector
+
+
+class StubRegistry:
+    def __init__(self, model=None):
+        self.model = model
+
+    def get(self, model_name=None):
+        return self.model
+
+
+def _session_with_chunks(count=3):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    document = Document(filename="policy.pdf", file_type="pdf", content="")
+    db.add(document)
+    db.flush()
+    db.add_all([DocumentChunk(document_id=document.id, chunk_index=i, chunk_text=f"clause {i}") for i in range(count)])
+    db.commit()
+    return db, document.id
+
+
+def test_fallback_vectors_are_not_stored_and_get_backfilled():
+    db, document_id = _session_with_chunks()
+
+    unavailable = EmbeddingService(db, registry=StubRegistry())
+    assert unavailable.embed(["clause"]).shape == (1, 384)  # Queries still get a placeholder
+    with pytest.raises(EmbeddingUnavailableError):
+        unavailable.generate_for_document(document_id)
+    db.rollback()
+    assert db.query(Embedding).count() == 0
+
+    model = SimpleNamespace(encode=lambda texts, convert_to_tensor=False: [[float(len(text)), 1.0] for text in texts])
+    assert EmbeddingService(db, registry=StubRegistry(model)).generate_for_document(document_id) == 3
+
+    rows = db.query(Embedding).all()
+    assert {row.status for row in rows} == {"completed"}
+    assert all(np.array_equal(unpack_vector(row.vector_data), [8.0, 1.0]) for row in rows)
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+pytest.importorskip("faiss")
+
+from app.core.config import settings
+from app.services.faiss_index import FaissVectorIndex
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((400, 16)).astype(np.float32)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_add_remove_and_reload(tmp_path, monkeypatch, vectors, index_type):
+    monkeypatch.setattr(settings, "FAISS_NLIST", 4)
+    index = FaissVectorIndex(str(tmp_path), index_type)
+    index.add(range(1, 401), [i % 5 for i in range(400)], vectors)
+
+    assert index.search(vectors[10], top_k=1)[0][0] == 11
+    assert all(doc_id == 2 for _, doc_id, _ in index.search(vectors[10], top_k=5, document_ids=[2]))
+
+    assert index.remove_document(0) == 80
+    assert 11 not in [chunk_id for chunk_id, _, _ in index.search(vectors[10], top_k=5)]
+
+    index.persist()
+    reloaded = FaissVectorIndex.open(str(tmp_path), index_type)
+
+    assert reloaded.loaded
+    assert len(reloaded) == 320
+    assert reloaded.search(vectors[21], top_k=1)[0][0] == 22
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.services.id_watermark import IdWatermark
+
+
+def test_skipped_ids_stay_pending_until_read_or_timed_out():
+    mark = IdWatermark(timeout=60)
+    mark.advance([1, 2, 6, 9], now=0)
+    assert (mark.last_id, [gap[:2] for gap in mark.gaps]) == (9, [[3, 5], [7, 8]])
+
+    # Late commits fill part of a gap; the rest stays pending
+    mark.advance([4, 7, 8, 10], now=30)
+    assert (mark.last_id, [gap[:2] for gap in mark.gaps]) == (10, [[3, 3], [5, 5]])
+
+    # Ids that never show up (rolled back) are given up on after the timeout
+    mark.advance([], now=61)
+    assert mark.gaps == []
+
+
+def test_merge_keeps_only_ids_neither_mark_has_read():
+    first = IdWatermark(10, [[3, 5, 0]])
+    second = IdWatermark(6, [[4, 4, 5]])
+
+    merged = first.merge(second)
+    assert merged.last_id == 10
+    assert merged.gaps == [[4, 4, 0]]
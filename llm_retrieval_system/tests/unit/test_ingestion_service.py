@@ -0,0 +1,161 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.database import Base
+from app.models import Document, DocumentChunk, Embedding
+from app.services.ingestion_service import STAGES, IngestionQueue
+
+
+class StubProcessor:
+    """Records the stages it runs instead of extracting and embedding for real"""
+
+    def __init__(self, embed_fails=False):
+        self.calls = []
+        self.embed_fails = embed_fails
+
+    def stream_text(self, file_path, filename, file_type, content_hash=None, progress=None):
+        self.calls.append("extract")
+        progress(1, 1)
+        return iter(["Grace period is thirty days. ", "Room rent is capped."])
+
+    def create_document(self, db, filename, file_type, content_hash=None):
+        document = Document(filename=filename, file_type=file_type, content="", content_hash=content_hash)
+        db.add(document)
+        db.flush()
+        return document
+
+    def invalidate_previous_copies(self, db, document):
+        pass
+
+    def ingest(self, db, document, pieces, progress=None):
+        self.calls.append("ingest")
+        chunks = [DocumentChunk(document_id=document.id, chunk_index=i, chunk_text=text) for i, text in enumerate(pieces)]
+        db.add_all(chunks)
+        db.flush()
+        if not self.embed_fails:
+            db.add_all([Embedding(chunk_id=chunk.id, pinecone_id=f"chunk-{chunk.id}") for chunk in chunks])
+        db.commit()
+        progress(len(chunks), 0 if self.embed_fails else len(chunks))
+        return len(chunks), 0 if self.embed_fails else len(chunks)
+
+    def embed(self, db, document_id, progress=None):
+        self.calls.append("embed")
+        progress(2, 2)
+        return 2
+
+    def index(self, db):
+        self.calls.append("index")
+
+
+def _queue(processor):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return IngestionQueue(processor=processor, max_workers=1, session_factory=sessionmaker(bind=engine))
+
+
+def test_job_runs_every_stage_and_records_progress():
+    processor = StubProcessor()
+    queue = _queue(processor)
+    db = queue._session()
+    job = queue.create_job(db, "documents/policy.txt", "policy.txt", "txt")
+
+    assert queue.run_job(job.id)
+    assert not queue.run_job(job.id)  # Already finished, cannot be claimed twice
+
+    db.refresh(job)
+    assert processor.calls == ["extract", "ingest", "index"]  # Nothing left for the embed stage to backfill
+    assert (job.status, job.stage, job.progress) == ("completed", "done", 1.0)
+    assert set(job.timings) == {"ingest", "index"}
+    assert job.document_id is not None and job.chunks_created == 2 and job.embeddings_created == 2
+
+
+def test_embed_stage_backfills_vectors_the_stream_missed():
+    processor = StubProcessor(embed_fails=True)
+    queue = _queue(processor)
+    db = queue._session()
+    job = queue.create_job(db, "documents/policy.txt", "policy.txt", "txt")
+
+    assert queue.run_job(job.id)
+
+    db.refresh(job)
+    assert processor.calls == ["extract", "ingest", "embed", "index"]
+    assert set(job.timings) == set(STAGES)
+    assert job.chunks_created == 2 and job.embeddings_created == 2
+
+
+def test_resume_requeues_stale_jobs_and_skips_finished_stages():
+    processor = StubProcessor()
+    queue = _queue(processor)
+    db = queue._session()
+    job = queue.create_job(db, "documents/policy.txt", "policy.txt", "txt")
+    assert queue.run_job(job.id)
+
+    # Simulate a worker that died while backfilling embeddings
+    job.status, job.stage, job.embeddings_created = "running", "embed", 0
+    job.heartbeat_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    db.commit()
+    submitted = []
+    queue.submit = submitted.append
+    processor.calls.clear()
+
+    assert queue.resume() == 1
+    assert queue.run_job(submitted[0])
+    assert processor.calls == ["embed", "index"]
+    db.refresh(job)
+    assert job.attempts == 2
+
+
+def test_job_for_already_stored_bytes_reuses_the_document():
+    processor = StubProcessor()
+    queue = _queue(processor)
+    db = queue._session()
+    first = queue.create_job(db, "store/ab/abc", "policy.pdf", "pdf", content_hash="abc")
+    second = queue.create_job(db, "store/ab/abc", "policy copy.pdf", "pdf", content_hash="abc")
+
+    assert queue.run_job(first.id)
+    processor.calls.clear()
+    assert queue.run_job(second.id)
+
+    db.refresh(first)
+    db.refresh(second)
+    assert processor.calls == []
+    assert second.document_id == first.document_id
+    assert db.query(Document).count() == 1
+
+
+def test_ingest_resumes_after_the_chunks_already_stored():
+    from app.services.chunking_service import ChunkingService
+    from app.services.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor()
+    processor.chunking_service = ChunkingService(chunk_size=40, chunk_overlap=5)
+    db = _queue(processor)._session()
+    document = processor.create_document(db, "policy.txt", "txt")
+    db.commit()
+    pages = ["Grace period is thirty days. Room rent ", "is capped at one percent. Cataract cover ", "waits two years."]
+
+    def interrupted():
+        yield from pages[:2]
+        raise OSError("worker lost")
+
+    batches = []
+    with pytest.raises(OSError):
+        processor.ingest(db, document, interrupted(), embed=False, batch_size=1, progress=lambda c, e: batches.append(c))
+    assert batches == [1]  # Committed as soon as it was cut; the next chunk was still open
+    # The rerun reads the whole text again and only stores what is new
+    assert processor.ingest(db, document, iter(pages), embed=False, batch_size=1) == (2, 0)
+
+    chunks = db.query(DocumentChunk).order_by(DocumentChunk.chunk_index).all()
+    assert [chunk.chunk_index for chunk in chunks] == [0, 1, 2]
+    text = "".join(pages)
+    assert [chunk.chunk_text for chunk in chunks] == processor.chunking_service.chunk_text(text)
+    assert all(text[chunk.start_char:chunk.end_char] == chunk.chunk_text for chunk in chunks)
+    assert db.get(Document, document.id).content == text
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.services.model_registry import ModelRegistry
+
+
+class FakeModel:
+    def __init__(self, name, fail_encode=False):
+        self.name = name
+        self.fail_encode = fail_encode
+
+    def encode(self, texts, convert_to_tensor=False):
+        if self.fail_encode:
+            raise RuntimeError("CUDA out of memory")
+        return [[0.0] * 4 for _ in texts]
+
+
+@pytest.fixture
+def sentence_transformers(monkeypatch):
+    """Install a stand-in sentence_transformers module; models named 'broken' fail to load"""
+    module = types.ModuleType("sentence_transformers")
+    options = {"fail_encode": False}
+
+    def SentenceTransformer(name):
+        if name == "broken":
+            raise OSError("model not found")
+        return FakeModel(name, **options)
+
+    module.SentenceTransformer = SentenceTransformer
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    return options
+
+
+def test_load_then_warm_up_reaches_ready(sentence_transformers):
+    registry = ModelRegistry()
+    assert registry.status() == {}
+
+    model = registry.get("mini")
+    assert isinstance(model, FakeModel)
+    assert registry.get("mini") is model
+    assert registry.status()["mini"]["state"] == "loaded"
+    assert not registry.is_ready("mini")
+
+    assert registry.warm_up("mini")
+    assert registry.status()["mini"]["state"] == "ready"
+    assert registry.is_ready("mini")
+
+
+def test_load_failure_is_failed_and_not_retried(sentence_transformers):
+    registry = ModelRegistry()
+    assert registry.get("broken") is None
+    assert registry.status()["broken"]["state"] == "failed"
+    assert "model not found" in registry.status()["broken"]["error"]
+    assert not registry.warm_up("broken")
+
+
+def test_warm_up_encode_failure_marks_model_failed(sentence_transformers):
+    sentence_transformers["fail_encode"] = True
+    registry = ModelRegistry()
+
+    assert not registry.warm_up("mini")
+    status = registry.status()["mini"]
+    assert status["state"] == "failed"
+    assert "out of memory" in status["error"]
+    assert not registry.is_ready("mini")
+
+
+@pytest.mark.parametrize(
+    "state, warm_up, expected, code",
+    [
+        ("ready", True, "healthy", 200),
+        ("failed", True, "degraded", 200),
+        ("loading", True, "starting", 503),
+        ("loaded", True, "starting", 503),
+        (None, True, "starting", 503),
+        (None, False, "healthy", 200),
+        ("loading", False, "healthy", 200),
+    ],
+)
+def test_health_status_follows_model_state(monkeypatch, state, warm_up, expected, code):
+    from app import main
+
+    registry = ModelRegistry()
+    if state:
+        registry._status[main.settings.LOCAL_EMBEDDING_MODEL] = {"state": state, "warm": state == "ready"}
+    monkeypatch.setattr(main, "model_registry", registry)
+    monkeypatch.setattr(main.settings, "WARM_UP_EMBEDDING_MODEL", warm_up)
+
+    response = asyncio.run(main.health_check())
+    body = json.loads(response.body)
+    assert response.status_code == code
+    assert body["status"] == expected
+    assert body["embedding_model_ready"] == (state == "ready")
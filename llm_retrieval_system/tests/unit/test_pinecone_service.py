@@ -0,0 +1,282 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.database import Base
+from app.models import Document, DocumentChunk
+from app.services import pinecone_service
+from app.services.search_service import SearchService
+from app.services.vector_sync import VectorSync, upsert_batches
+
+
+class FakeIndex:
+    """In-process stand-in for a Pinecone index: cosine scores, $eq/$in metadata filters, namespaces"""
+
+    def __init__(self, failures=0, latency=0.0):
+        self.namespaces = {}
+        self.queries = []
+        self.requests = []
+        self.failures = failures  # Requests that raise before any succeeds, like throttling
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _request(self, kind, size):
+        with self._lock:
+            self.requests.append((kind, size))
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("429 Too Many Requests")
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+
+    def upsert(self, vectors, namespace=""):
+        self._request("upsert", len(vectors))
+        for vector in vectors:
+            self.namespaces.setdefault(namespace, {})[vector["id"]] = vector
+
+    def delete(self, ids, namespace=""):
+        self._request("delete", len(ids))
+        for vector_id in ids:
+            self.namespaces.get(namespace, {}).pop(vector_id, None)
+
+    def _matches_filter(self, metadata, metadata_filter):
+        for field, condition in (metadata_filter or {}).items():
+            value = metadata.get(field)
+            if isinstance(condition, dict):
+                if "$in" in condition and value not in condition["$in"]:
+                    return False
+                if "$eq" in condition and value != condition["$eq"]:
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    def query(self, vector, top_k, include_metadata=False, namespace="", filter=None):
+        self.queries.append({"namespace": namespace, "filter": filter})
+        query = np.asarray(vector) / np.linalg.norm(vector)
+        scored = []
+        for item in self.namespaces.get(namespace, {}).values():
+            if self._matches_filter(item["metadata"], filter):
+                values = np.asarray(item["values"])
+                score = float(query @ values / np.linalg.norm(values))
+                scored.append(SimpleNamespace(id=item["id"], score=score, metadata=item["metadata"]))
+        scored.sort(key=lambda match: -match.score)
+        return SimpleNamespace(matches=scored[:top_k])
+
+
+@pytest.fixture
+def fake_index(monkeypatch):
+    index = FakeIndex()
+    monkeypatch.setattr(pinecone_service, "get_index", lambda: index)
+    return index
+
+
+def _vector(document_id, chunk_index):
+    # Every chunk points nearly the same way, so unfiltered results mix documents
+    return [1.0, 0.01 * document_id, 0.001 * chunk_index]
+
+
+def _search_service(documents=3, chunks=4):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    vectors = []
+    for d in range(documents):
+        document = Document(filename=f"policy-{d}.pdf", file_type="pdf", content="")
+        db.add(document)
+        db.flush()
+        for i in range(chunks):
+            chunk = DocumentChunk(document_id=document.id, chunk_index=i, chunk_text=f"document {document.id} clause {i}")
+            db.add(chunk)
+            db.flush()
+            vectors.append({
+                "id": f"chunk-{chunk.id}",
+                "values": _vector(document.id, i),
+                "metadata": {"document_id": document.id, "chunk_index": i},
+            })
+    db.commit()
+    service = SearchService.__new__(SearchService)
+    service.db = db
+    service.embedding_service = SimpleNamespace(embed_queries=lambda queries: np.array([[1.0, 0.0, 0.0]] * len(queries)))
+    return service, vectors
+
+
+def test_document_filter_uses_in_over_distinct_ids():
+    assert pinecone_service.document_filter(None) is None
+    assert pinecone_service.document_filter([]) is None
+    assert pinecone_service.document_filter([3, "1", 3]) == {"document_id": {"$in": [1, 3]}}
+
+
+def test_search_filters_pinecone_matches_by_document(fake_index):
+    service, vectors = _search_service()
+    assert VectorSync(max_workers=1, backoff_factor=0).upsert(vectors)
+
+    results = service.batch_semantic_search(["grace period", "room rent"], top_k=3, document_ids=[2])
+
+    assert fake_index.queries[0]["filter"] == {"document_id": {"$in": [2]}}
+    for query_results in results:
+        assert len(query_results) == 3  # top_k is not spent on other documents
+        assert {result["document_id"] for result in query_results} == {2}
+
+    unfiltered = service.semantic_search("grace period", top_k=3)
+    assert fake_index.queries[-1]["filter"] is None
+    assert len(unfiltered) == 3
+
+
+def test_vectors_are_written_and_queried_in_the_configured_namespace(fake_index, monkeypatch):
+    service, vectors = _search_service(documents=1)
+    monkeypatch.setattr(pinecone_service, "NAMESPACE", "tenant-a")
+    assert VectorSync(max_workers=1, backoff_factor=0).upsert(vectors)
+    assert set(fake_index.namespaces) == {"tenant-a"}
+
+    assert len(service.semantic_search("grace period", top_k=2)) == 2
+    assert fake_index.queries[-1]["namespace"] == "tenant-a"
+
+    other = pinecone_service.query_vector([1.0, 0.0, 0.0], top_k=2, namespace="tenant-b")
+    assert other.matches == []
+
+
+def _vectors(count, dimension=3):
+    return [{"id": f"chunk-{i}", "values": [0.5] * dimension, "metadata": {"document_id": 1}} for i in range(count)]
+
+
+def test_upserts_are_split_by_count_and_request_size():
+    assert [len(batch) for batch in upsert_batches(_vectors(250), max_vectors=100)] == [100, 100, 50]
+    # 1536 values at ~12 bytes each: about 110 fit under the 2 MB request limit
+    batches = upsert_batches(_vectors(250, dimension=1536), max_vectors=1000)
+    assert len(batches) == 3 and sum(len(batch) for batch in batches) == 250
+
+
+def test_batches_are_sent_concurrently_and_retried(fake_index):
+    fake_index.failures, fake_index.latency = 2, 0.05
+    sync = VectorSync(batch_size=10, max_workers=4, max_tries=3, backoff_factor=0)
+
+    assert sync.upsert(_vectors(80))
+    sync.shutdown()
+
+    assert len(fake_index.namespaces[""]) == 80
+    assert 1 < fake_index.max_in_flight <= 4
+    stats = sync.stats()
+    assert (stats["upserted"], stats["retries"], stats["failed_batches"], stats["recent_batches"]) == (80, 2, 0, 8)
+    assert stats["latency_max"] >= 0.05
+
+
+def test_batch_that_keeps_failing_is_reported_not_raised(fake_index):
+    fake_index.failures = 10
+    sync = VectorSync(batch_size=10, max_tries=3, backoff_factor=0)
+
+    assert not sync.upsert(_vectors(5))
+    assert len(fake_index.requests) == 3
+    assert sync.stats()["failed_batches"] == 1
+
+
+def test_client_errors_are_not_retried(fake_index):
+    class ApiError(Exception):
+        def __init__(self, status):
+            super().__init__(f"HTTP {status}")
+            self.status = status
+
+    def reject(status):
+        def upsert(vectors, namespace=""):
+            fake_index.requests.append(("upsert", len(vectors)))
+            raise ApiError(status)
+        return upsert
+
+    sync = VectorSync(batch_size=10, max_tries=3, backoff_factor=0)
+    for status, attempts in ((400, 1), (401, 1), (429, 3), (503, 3)):
+        fake_index.requests.clear()
+        fake_index.upsert = reject(status)
+        assert not sync.upsert(_vectors(5))
+        assert len(fake_index.requests) == attempts, status
+    assert sync.stats()["retries"] == 4
+
+
+def test_deleting_chunks_removes_their_vectors(fake_index):
+    sync = VectorSync(batch_size=10, max_workers=2, backoff_factor=0)
+    assert sync.upsert(_vectors(30))
+
+    assert sync.delete_chunks(range(0, 30, 2))
+    sync.shutdown()
+
+    assert sorted(fake_index.namespaces[""], key=lambda vector_id: int(vector_id[6:])) == [f"chunk-{i}" for i in range(1, 30, 2)]
+    assert sync.stats()["deleted"] == 15
+
+
+def test_ingest_upserts_only_after_the_batch_commits(fake_index, monkeypatch, tmp_path):
+    from app.models import Embedding
+    from app.services.chunking_service import ChunkingService
+    from app.services.document_processor import DocumentProcessor
+    from app.services.model_registry import model_registry
+
+    model = SimpleNamespace(encode=lambda texts, convert_to_tensor=False: [[1.0, 0.0, 0.0]] * len(texts))
+    monkeypatch.setattr(model_registry, "get", lambda model_name=None: model)
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    committed = []
+    upsert = fake_index.upsert
+
+    def checked_upsert(vectors, namespace=""):
+        # A second connection only sees rows the ingest transaction committed
+        with Session() as other:
+            committed.append(other.query(Embedding).filter(Embedding.pinecone_id.in_([v["id"] for v in vectors])).count())
+        upsert(vectors, namespace)
+
+    fake_index.upsert = checked_upsert
+    processor = DocumentProcessor()
+    processor.chunking_service = ChunkingService(chunk_size=40, chunk_overlap=5)
+    db = Session()
+    document = processor.create_document(db, "policy.txt", "txt")
+    db.commit()
+
+    stored, embedded = processor.ingest(db, document, iter(["Grace period is thirty days. Room rent is capped at one percent."]), batch_size=1)
+
+    assert stored == embedded == len(committed) == len(fake_index.namespaces[""])
+    assert committed == [1] * stored
+    db.close()
+    engine.dispose()
+
+
+def test_sync_is_a_no_op_without_pinecone(monkeypatch):
+    monkeypatch.setattr(pinecone_service, "get_index", lambda: None)
+    sync = VectorSync()
+    assert not sync.upsert(_vectors(3))
+    assert sync.delete_chunks([1, 2])
+    assert sync.stats()["enabled"] is False
+
+
+@pytest.mark.parametrize("chunking_mode", ["chars", "tokens"])
+def test_importing_the_app_loads_no_heavy_clients(chunking_mode):
+    # Fresh interpreter: what an app worker pays before serving its first request
+    check = (
+        "import sys, app.main; "
+        "from app.services.model_registry import model_registry; "
+        "loaded = [m for m in ('pinecone', 'google.generativeai', 'sentence_transformers', 'tiktoken', 'PyPDF2', 'docx') if m in sys.modules]; "
+        "print(loaded + list(model_registry.status()))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", check],
+        cwd=Path(__file__).parent.parent.parent,
+        env={**os.environ, "CHUNKING_MODE": chunking_mode, "WARM_UP_EMBEDDING_MODEL": "false"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.config import settings
+from app.services.embedding_service import EmbeddingService
+from app.services.model_registry import ModelRegistry
+from app.services.query_cache import QueryEmbeddingCache, normalize_query
+
+
+class CountingModel:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, convert_to_tensor=False):
+        self.encoded.extend(texts)
+        return np.asarray([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_normalized_queries_share_an_entry_and_lru_evicts_oldest():
+    cache = QueryEmbeddingCache(max_entries=2)
+    cache.put("m", "What is  the Grace period?", [1, 0])
+    cache.put("m", "second", [0, 1])
+
+    assert normalize_query("  what is the\tgrace PERIOD? ") == "what is the grace period?"
+    assert cache.get("m", "what is the grace period?") is not None
+    assert cache.get("other-model", "second") is None
+
+    cache.put("m", "third", [1, 1])
+    assert cache.get("m", "second") is None
+    assert cache.stats()["size"] == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "queries.sqlite3")
+    QueryEmbeddingCache(disk_path=path).put("m", "grace period", [0.5, 2.0])
+
+    cache = QueryEmbeddingCache(disk_path=path)
+
+    assert list(cache.get("m", "Grace Period")) == [0.5, 2.0]
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.get("m", "grace period") is not None
+    assert cache.stats()["hits"] == 1
+
+
+def test_embed_queries_only_encodes_misses_once():
+    model = CountingModel()
+    registry = ModelRegistry()
+    registry._models[settings.LOCAL_EMBEDDING_MODEL] = model
+    service = EmbeddingService(None, registry=registry, query_cache=QueryEmbeddingCache())
+
+    first = service.embed_queries(["grace period", "room rent", "Grace  period"])
+    second = service.embed_queries(["room rent"])
+
+    assert model.encoded == ["grace period", "room rent"]
+    assert first.shape == (3, 2)
+    assert np.array_equal(first[0], first[2])
+    assert np.array_equal(second[0], first[1])
@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.database import Base
+from app.models import Document, DocumentChunk
+from app.services.search_service import SearchService
+
+
+def _search_service():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    for name in ("policy.pdf", "claims.pdf"):
+        document = Document(filename=name, file_type="pdf", content="")
+        db.add(document)
+        db.flush()
+        db.add_all([DocumentChunk(document_id=document.id, chunk_index=i, chunk_text=f"{name} clause {i}") for i in range(3)])
+    db.commit()
+    service = SearchService.__new__(SearchService)  # No embedding model needed to enrich matches
+    service.db = db
+    return engine, service
+
+
+def test_pinecone_matches_are_enriched_in_one_query_in_match_order():
+    engine, service = _search_service()
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+
+    results = service._enrich_pinecone_matches([
+        [SimpleNamespace(id="chunk-5", score=0.9), SimpleNamespace(id="chunk-2", score=0.8), SimpleNamespace(id="chunk-99", score=0.7)],
+        [{"id": "chunk-1", "score": 0.6}, {"id": "not-a-chunk", "score": 0.5}],
+        [SimpleNamespace(id="chunk-42", score=0.4)],
+        [],
+    ])
+
+    assert len(statements) == 1
+    assert [(r["chunk_id"], r["score"], r["document_filename"]) for r in results[0]] == [
+        (5, 0.9, "claims.pdf"), (2, 0.8, "policy.pdf")
+    ]
+    assert [r["chunk_text"] for r in results[1]] == ["policy.pdf clause 0"]
+    assert results[2] is None and results[3] is None  # Left to the local index
@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.config import settings
+from app.services.text_extractor import TextExtractor, shutdown_pdf_pool
+from benchmarks.bench_pdf_extraction import write_pdf
+
+
+def test_parallel_pdf_extraction_keeps_page_order(tmp_path, monkeypatch):
+    path = str(tmp_path / "policy.pdf")
+    write_pdf(path, pages=12, lines_per_page=3)
+
+    monkeypatch.setattr(settings, "PDF_EXTRACTION_WORKERS", 1)
+    serial = TextExtractor.extract_pdf_pages(path)
+
+    monkeypatch.setattr(settings, "PDF_EXTRACTION_WORKERS", 2)
+    monkeypatch.setattr(settings, "PDF_PARALLEL_MIN_PAGES", 4)
+    try:
+        parallel = TextExtractor.extract_pdf_pages(path)
+    finally:
+        shutdown_pdf_pool()
+
+    assert [number for number, _ in serial] == list(range(1, 13))
+    assert "11-2" in serial[11][1]
+    assert parallel == serial
+    assert TextExtractor.extract_text(path, "pdf") == "\n".join(text for _, text in serial).strip()
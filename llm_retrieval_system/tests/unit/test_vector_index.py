@@ -0,0 +1,151 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, delete, event
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.core.database import Base
+from app.models import ChunkDeletion, Document, DocumentChunk, Embedding
+from app.services.embedding_service import pack_vector
+from app.services.vector_index import ChunkVectorIndex, top_k_indices
+from app.services.vector_segments import MmapVectorIndex
+
+
+def _index_with(vectors, document_ids):
+    index = ChunkVectorIndex(initial_capacity=2)
+    index.add(range(1, len(vectors) + 1), document_ids, np.asarray(vectors, dtype=np.float32))
+    return index
+
+
+def test_search_returns_best_matches_first():
+    index = _index_with([[1, 0], [0, 1], [1, 1]], [10, 10, 20])
+
+    results = index.search([1, 0.1], top_k=2)
+
+    assert [chunk_id for chunk_id, _, _ in results] == [1, 3]
+    assert results[0][1] == 10
+    assert abs(results[0][2] - 0.995) < 1e-3
+
+
+def test_search_filters_by_document():
+    index = _index_with([[1, 0], [0, 1], [1, 1]], [10, 10, 20])
+
+    results = index.search([1, 0], top_k=5, document_ids=[20])
+
+    assert [chunk_id for chunk_id, _, _ in results] == [3]
+
+
+def test_remove_document_and_replace_chunk():
+    index = _index_with([[1, 0], [0, 1], [1, 1]], [10, 10, 20])
+
+    assert index.remove_document(10) == 2
+    index.add([3], [20], np.asarray([[0, 1]], dtype=np.float32))
+
+    assert len(index) == 1
+    assert index.search([0, 1], top_k=1)[0][2] > 0.99
+
+
+def test_top_k_indices_matches_full_sort():
+    scores = np.random.default_rng(0).standard_normal(1000).astype(np.float32)
+
+    assert list(top_k_indices(scores, 7)) == list(np.argsort(-scores)[:7])
+
+
+def test_search_batch_matches_single_searches():
+    index = _index_with([[1, 0], [0, 1], [1, 1]], [10, 10, 20])
+    queries = np.asarray([[1, 0.1], [0, 1], [1, 1]], dtype=np.float32)
+
+    batched = index.search_batch(queries, top_k=2, document_ids=[10, 20])
+
+    for results, query in zip(batched, queries):
+        single = index.search(query, top_k=2, document_ids=[10, 20])
+        assert [r[:2] for r in results] == [r[:2] for r in single]
+        assert np.allclose([r[2] for r in results], [r[2] for r in single], atol=1e-6)
+    assert [chunk_id for chunk_id, _, _ in batched[1]] == [2, 3]
+
+
+def _add_document(db, vectors):
+    document = Document(filename="policy.pdf", file_type="pdf", content="")
+    db.add(document)
+    db.flush()
+    for i, vector in enumerate(vectors):
+        chunk = DocumentChunk(document_id=document.id, chunk_index=i, chunk_text=f"clause {i}")
+        db.add(chunk)
+        db.flush()
+        db.add(Embedding(chunk_id=chunk.id, pinecone_id=f"chunk-{chunk.id}", vector_data=pack_vector(vector), dimension=len(vector)))
+    db.commit()
+    return document.id
+
+
+def test_refresh_replays_deletions_without_counting_rows():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    first = _add_document(db, [[1, 0], [0, 1]])
+    index = ChunkVectorIndex()
+    assert index.refresh(db) == 2
+
+    # Another worker deletes a document and stores one of the same size, so the row count is unchanged
+    chunk_ids = [chunk_id for chunk_id, in db.query(DocumentChunk.id).filter(DocumentChunk.document_id == first)]
+    db.execute(delete(Embedding).where(Embedding.chunk_id.in_(chunk_ids)))
+    db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == first))
+    db.add_all([ChunkDeletion(chunk_id=chunk_id, document_id=first) for chunk_id in chunk_ids])
+    db.commit()
+    second = _add_document(db, [[1, 1], [1, -1]])
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql.lower()))
+    assert index.refresh(db) == 2
+    assert index.refresh(db) == 0
+
+    assert len(index) == 2
+    assert {document_id for _, document_id, _ in index.search([1, 0], top_k=5)} == {second}
+    assert not [sql for sql in statements if "count(" in sql]
+    db.close()
+
+
+@pytest.mark.parametrize("engine_name", ["numpy", "mmap", "faiss"])
+def test_refresh_picks_up_embeddings_committed_out_of_id_order(tmp_path, engine_name):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as setup:
+        setup.add(Document(id=1, filename="policy.pdf", file_type="pdf", content=""))
+        setup.add_all([DocumentChunk(id=i, document_id=1, chunk_index=i, chunk_text=f"clause {i}") for i in range(1, 5)])
+        setup.commit()
+
+    def open_index():
+        if engine_name == "faiss":
+            faiss_index = pytest.importorskip("app.services.faiss_index")
+            return faiss_index.FaissVectorIndex.open(str(tmp_path), "flat")
+        return ChunkVectorIndex() if engine_name == "numpy" else MmapVectorIndex.open(str(tmp_path))
+
+    def embeddings(ids):
+        return [Embedding(id=i, chunk_id=i, pinecone_id=f"chunk-{i}", vector_data=pack_vector([1.0, float(i)]), dimension=2) for i in ids]
+
+    index = open_index()
+    db = Session()
+    index.refresh(db)
+
+    # Worker A was handed embedding ids 1-2 but has not committed; worker B commits 3-4 first
+    worker_b = Session()
+    worker_b.add_all(embeddings([3, 4]))
+    worker_b.commit()
+    assert index.refresh(db) == 2
+
+    if engine_name != "numpy":
+        index.persist()
+        index = open_index()  # The gap is persisted, so it survives a restart
+
+    worker_a = Session()
+    worker_a.add_all(embeddings([1, 2]))
+    worker_a.commit()
+    assert index.refresh(db) == 2
+    assert index.refresh(db) == 0
+    assert len(index) == 4
+    for session in (db, worker_a, worker_b):
+        session.close()
@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.services.vector_segments import MmapVectorIndex
+
+
+def _vectors(rows=300, dim=8):
+    return np.random.default_rng(0).standard_normal((rows, dim)).astype(np.float32)
+
+
+def test_workers_share_appends_and_tombstones(tmp_path):
+    vectors = _vectors()
+    writer = MmapVectorIndex.open(str(tmp_path))
+    reader = MmapVectorIndex.open(str(tmp_path))
+
+    writer.add(range(1, 301), [1] * 50 + [2] * 250, vectors)
+    assert reader.search(vectors[5], top_k=1)[0][0] == 6
+    assert len(reader) == 300
+
+    assert writer.remove_document(1) == 50
+    assert 6 not in [chunk_id for chunk_id, _, _ in reader.search(vectors[5], top_k=3)]
+
+    # Re-adding a tombstoned chunk makes it visible again
+    writer.add([6], [1], vectors[5:6])
+    assert reader.search(vectors[5], top_k=1)[0][:2] == (6, 1)
+    assert len(reader) == 251
+
+
+def test_compaction_keeps_live_rows(tmp_path):
+    vectors = _vectors()
+    index = MmapVectorIndex.open(str(tmp_path))
+    index.add(range(1, 151), [1] * 150, vectors[:150])
+    index.add(range(151, 301), [2] * 150, vectors[150:])
+    index.remove_chunks([1, 2, 3])
+
+    index.compact()
+    reopened = MmapVectorIndex.open(str(tmp_path))
+
+    assert len(reopened._segments) == 1
+    assert len(reopened) == 297
+    assert reopened.search(vectors[200], top_k=1, document_ids=[2])[0][0] == 201
+    assert list(tmp_path.glob("*.f32")) == [tmp_path / "seg-000003.f32"]